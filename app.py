@@ -1,26 +1,33 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+import time
+_started = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 import os
-from werkzeug.utils import secure_filename
 import sys
 from typing import Optional
 import logging
 import shutil
 import json
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+import threading
 
 # Добавляем путь к корневой директории проекта в PYTHONPATH
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from backend.src.utils.logs import configure_logging
+
+# Логирование: уровень LOG_LEVEL, записи в JSON пишет фоновый поток
+configure_logging()
+logger = logging.getLogger(__name__)
+
 from backend.src.analysis.pdf_processor import PDFProcessor
-from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.openai_client import get_openai_client
+from backend.src.analysis.office_converter import get_office_converter
+from backend.src.jobs import (JobManager, JobQueueFullError, SharedJobManager, SlideJanitor, get_state_store,
+                              remove_job_uploads)
 from dotenv import load_dotenv
 from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics, collect_timings
+from backend.src.utils.http import file_etag, new_upload_id, sse_event, upload_path
 
 load_dotenv()
 
@@ -29,15 +36,45 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max-limit
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['SLIDES_FOLDER'] = os.path.join('backend', 'output', 'slides')  # Новая конфигурация
 
-logger.info(f"Инициализация приложения. Upload folder: {app.config['UPLOAD_FOLDER']}")
+# Общее состояние экземпляров за балансировщиком (STATE_BACKEND=sqlite):
+# загрузки, слайды и задачи лежат на общем томе, любой экземпляр выполняет
+# и отдает любую колоду
+state_store = get_state_store()
+if state_store:
+    app.config['UPLOAD_FOLDER'] = str(state_store.uploads_dir)
+    app.config['SLIDES_FOLDER'] = str(state_store.slides_dir)
+
+logger.info("Инициализация приложения. Upload folder: %s", app.config['UPLOAD_FOLDER'])
 
 # Создаем необходимые папки
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['SLIDES_FOLDER'], exist_ok=True)
 
-# Создаем экземпляры классов
-pdf_processor = PDFProcessor()
-image_analyzer = ImageAnalyzer()
+# Создаем экземпляры классов. Клиент OpenAI общий для процесса и создается
+# при первом анализе, поэтому рабочий процесс запускается без импорта openai
+pdf_processor = PDFProcessor(slides_dir=app.config['SLIDES_FOLDER'])
+image_analyzer = pdf_processor.image_analyzer
+if state_store:
+    job_manager = SharedJobManager(pdf_processor, state_store)
+    job_manager.start()
+else:
+    job_manager = JobManager(pdf_processor)
+# Загрузки, не удаленные через /cleanup (вкладку закрыли до конца анализа), удаляет janitor
+slide_janitor = SlideJanitor(pdf_processor, uploads_dir=app.config['UPLOAD_FOLDER'], job_manager=job_manager)
+slide_janitor.start()
+
+# Время холодного запуска (импорт и инициализация модуля) для автомасштабирования
+startup_seconds = time.perf_counter() - _started
+metrics.set_gauge('app_startup_seconds', startup_seconds)
+logger.info("Приложение инициализировано за %.3f с", startup_seconds)
+
+# Клиент OpenAI готовим в фоне, чтобы первый анализ не ждал импорта openai
+if config.OPENAI_CLIENT_PREWARM:
+    threading.Thread(target=get_openai_client, name='openai-prewarm', daemon=True).start()
+
+# Процессы LibreOffice для конвертации PPT/PPTX тоже можно запустить заранее
+if config.OFFICE_POOL_PREWARM:
+    threading.Thread(target=lambda: get_office_converter().prewarm(), name='office-prewarm', daemon=True).start()
 
 @app.route('/')
 def index():
@@ -62,9 +99,9 @@ def upload_file():
         return jsonify({'error': 'Поддерживаются только файлы PDF, PPT и PPTX'}), 400
 
     try:
-        # Сохраняем файл
-        safe_filename = secure_filename(filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)
+        # Сохраняем файл под уникальным именем: одноименные загрузки не перезаписывают друг друга
+        file_id = new_upload_id(filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_id)
         file.save(filepath)
 
         # Получаем контекст
@@ -74,6 +111,7 @@ def upload_file():
         
         return jsonify({
             'success': True,
+            'file_id': file_id,  # Идентификатор загрузки для /analyze
             'filename': filename,  # Возвращаем оригинальное имя файла
             'message': 'Файл успешно загружен'
         })
@@ -85,86 +123,181 @@ def upload_file():
 def analyze():
     try:
         data = request.get_json()
-        filename = data.get('filename')
+        file_id = data.get('file_id')
         context = data.get('context', '')
+        # Разбивка времени по этапам в ответе (timings: true)
+        include_timings = bool(data.get('timings'))
+        # Бюджет токенов на колоду: ближе к исчерпанию слайды анализируются дешевле
+        token_budget = data.get('token_budget')
+        if token_budget is not None and (not isinstance(token_budget, int) or token_budget <= 0):
+            return jsonify({'error': 'token_budget должен быть положительным целым числом'}), 400
         
-        logger.info(f"Начинаем анализ файла: {filename}")
+        logger.info("Начинаем анализ файла: %s", file_id)
         
-        safe_filename = secure_filename(filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)
-        
-        if not os.path.exists(filepath):
+        filepath = upload_path(app.config['UPLOAD_FOLDER'], file_id)
+        if filepath is None or not os.path.exists(filepath):
             return jsonify({'error': 'Файл не найден'}), 404
         
-        # Обработка PDF и сохранение слайдов
-        logger.info("Извлечение слайдов из PDF")
-        results = pdf_processor.process_slides(filepath)
-        total_slides = len(results)
-        logger.info(f"Извлечено {total_slides} слайдов")
-        
-        # Добавляем отладочный вывод
-        logger.debug(f"Результаты анализа: {json.dumps(results, ensure_ascii=False)}")
+        # Потоковый режим: NDJSON с событиями по мере готовности слайдов
+        if data.get('stream'):
+            return Response(
+                stream_with_context(_stream_analysis(filepath, context, include_timings, token_budget)),
+                mimetype='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
         
-        # Проверяем что все файлы на месте
-        for i in range(1, total_slides + 1):
-            slide_path = os.path.join(app.config['SLIDES_FOLDER'], f'slide_{i}.png')
-            if not os.path.exists(slide_path):
-                logger.error(f"Отсутствует файл слайда: {slide_path}")
-                return jsonify({'error': 'Ошибка при сохранении слайдов'}), 500
-        
-        # Проверяем что все слайды имеют результаты
-        for i, result in enumerate(results, 1):
-            if not result.get('analysis'):
-                logger.warning(f"Отсутствует анализ для слайда {i}")
+        # Ставим задачу в очередь, анализ выполняется в фоне
+        try:
+            job = job_manager.submit(filepath, context, include_timings, token_budget)
+        except JobQueueFullError as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '10'
+            return response, 429
         
         return jsonify({
             'success': True,
-            'results': results,
+            'job_id': job.job_id,
+            'status': job.status,
+            'status_url': f"/jobs/{job.job_id}",
             'context': context
-        })
+        }), 202
 
     except Exception as e:
-        logger.error(f"Ошибка при анализе: {str(e)}")
+        logger.error("Ошибка при анализе: %s", e)
         return jsonify({'error': str(e)}), 500
 
+def _stream_analysis(filepath, context, include_timings=False, token_budget=None):
+    """Генератор строк NDJSON для потокового анализа"""
+    total_slides = 0
+    try:
+        with collect_timings() as timings:
+            for event in pdf_processor.iter_slides(filepath, context=context, token_budget=token_budget):
+                if event['event'] == 'started':
+                    total_slides = event['total_slides']
+                yield json.dumps(event, ensure_ascii=False) + '\n'
+        
+        done = {'event': 'done', 'total_slides': total_slides, 'context': context}
+        if include_timings:
+            done['timings'] = timings.to_dict()
+        yield json.dumps(done, ensure_ascii=False) + '\n'
+    
+    except Exception as e:
+        logger.error("Ошибка при потоковом анализе: %s", e)
+        yield json.dumps({'event': 'error', 'error': str(e)}, ensure_ascii=False) + '\n'
+
+@app.route('/analyze/<doc_id>/<int:slide_number>/stream')
+def stream_slide_analysis(doc_id, slide_number):
+    """
+    Потоковый анализ одного слайда (Server-Sent Events).
+    
+    Текст приходит фрагментами по мере генерации (event: delta), поэтому
+    раздел СУТЬ начинает отображаться через время до первого токена модели;
+    event: done несет итоговый анализ и ttft, который совпадает с
+    непотоковым результатом и сохраняется в кэш. Текстовый слой слайда
+    берется из анализа колоды, поэтому промпт и ключ кэша те же.
+    """
+    slide_path = pdf_processor.get_slide_path(doc_id, slide_number)
+    if slide_path is None:
+        logger.error("Слайд не найден: %s/%s", doc_id, slide_number)
+        return jsonify({'error': 'Слайд не найден'}), 404
+    page_text = pdf_processor.get_page_text(doc_id, slide_number)
+    
+    return Response(
+        stream_with_context(_stream_slide(str(slide_path), page_text)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _stream_slide(slide_path, page_text=None):
+    try:
+        for event in pdf_processor.image_analyzer.stream_image(slide_path, page_text):
+            yield sse_event(event.pop('event'), event)
+    except Exception as e:
+        logger.error("Ошибка при потоковом анализе слайда: %s", e)
+        yield sse_event('error', {'error': str(e)})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Статус задачи анализа с частичными результатами"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/test')
 def test_upload():
     logger.debug("Запрошена тестовая страница загрузки")
     return render_template('test_upload.html')
 
-@app.route('/slides/<path:filename>')
-def serve_slide(filename):
-    """Отдача изображений слайдов"""
+@app.route('/slides/<doc_id>/<int:slide_number>')
+def serve_slide(doc_id, slide_number):
+    """
+    Отдача изображений слайдов.
+    
+    ?size=thumb|preview - уменьшенная копия. Папка документа названа по хэшу
+    содержимого (или по id задачи), поэтому ответ кэшируется как неизменяемый;
+    условные запросы с If-None-Match получают 304.
+    """
     try:
-        if os.path.exists(app.config['SLIDES_FOLDER']):
-            filepath = os.path.join(app.config['SLIDES_FOLDER'], filename)
-            if os.path.exists(filepath):
-                return send_from_directory(app.config['SLIDES_FOLDER'], filename)
+        variant = request.args.get('size')
+        slide_path = pdf_processor.get_slide_path(doc_id, slide_number, None if variant == 'full' else variant)
+        if slide_path is None:
+            logger.error("Слайд не найден: %s/%s (%s)", doc_id, slide_number, variant or 'full')
+            return "Изображение не найдено", 404
         
-        logger.error(f"Файл не найден: {filepath}")
-        return "Изображение не найдено", 404
+        stat = slide_path.stat()
+        mimetype = 'image/png' if slide_path.suffix == '.png' else pdf_processor.rasterizer.variant_mime_type
+        response = send_file(
+            slide_path.resolve(),
+            mimetype=mimetype,
+            etag=file_etag(str(slide_path), stat.st_mtime_ns, stat.st_size),
+            conditional=True,
+            max_age=config.SLIDES_CACHE_MAX_AGE
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
             
     except Exception as e:
-        logger.error(f"Ошибка при отдаче слайда: {str(e)}")
+        logger.error("Ошибка при отдаче слайда: %s", e)
         return str(e), 500
 
+@app.route('/cache/stats')
+def cache_stats():
+    """Статистика кэша результатов анализа"""
+    cache = pdf_processor.image_analyzer.cache
+    if not cache:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
+
+@app.route('/stats')
+def stats():
+    """Метрики анализатора: размеры изображений в запросах, задержки и адаптивные лимиты ответа"""
+    return jsonify({**metrics.snapshot(), 'output_caps': image_analyzer.output_stats.snapshot()})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Метрики в формате Prometheus: время этапов, токены, размеры запросов"""
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/cleanup', methods=['POST'])
 def cleanup():
-    """Очистка временных файлов при закрытии приложения"""
+    """
+    Удаление загрузок задач вызывающей стороны ({"job_ids": [...]}) при закрытии страницы.
+    
+    Папка загрузок общая для всех пользователей, поэтому удаляются только
+    файлы завершенных задач из запроса; остальное удаляет SlideJanitor по TTL.
+    """
     try:
-        # Очищаем только основную папку uploads от PDF файлов
-        for file in os.listdir(app.config['UPLOAD_FOLDER']):
-            if file.lower().endswith(('.pdf', '.ppt', '.pptx')):
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], file)
-                try:
-                    os.unlink(file_path)
-                except Exception as e:
-                    logger.error(f"Ошибка при удалении файла {file_path}: {e}")
+        job_ids = (request.get_json(silent=True) or {}).get('job_ids') or []
+        if not isinstance(job_ids, list):
+            return jsonify({'error': 'job_ids должен быть списком'}), 400
+        removed = remove_job_uploads(job_manager, job_ids, app.config['UPLOAD_FOLDER'])
         
-        logger.info("Очистка временных файлов выполнена успешно")
-        return jsonify({'success': True})
+        logger.info("Очистка временных файлов выполнена успешно: удалено %s", removed)
+        return jsonify({'success': True, 'removed': removed})
     except Exception as e:
-        logger.error(f"Ошибка при очистке временных файлов: {str(e)}")
+        logger.error("Ошибка при очистке временных файлов: %s", e)
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
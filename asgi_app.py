@@ -0,0 +1,310 @@
+"""
+Асинхронный режим сервера (ASGI) с теми же маршрутами, что и app.py.
+
+Каждый анализ - корутина в цикле событий: ожидание ответов OpenAI не
+занимает поток или процесс, поэтому один рабочий процесс ведет много колод
+одновременно. Рендеринг PDF и другие операции с CPU и диском выполняются
+в пуле потоков (см. AsyncPDFProcessor).
+
+Запуск:
+    uvicorn asgi_app:app --workers 2 --port 5000
+"""
+import time
+_started = time.perf_counter()
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import shutil
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from dotenv import load_dotenv
+
+from backend.src.analysis.async_processor import AsyncPDFProcessor
+from backend.src.analysis.office_converter import get_office_converter
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.jobs import (AsyncJobManager, JobQueueFullError, SharedJobManager, SlideJanitor, get_state_store,
+                              remove_job_uploads)
+from backend.src.utils.config import config
+from backend.src.utils.logs import configure_logging
+from backend.src.utils.metrics import metrics, collect_timings
+from backend.src.utils.http import file_etag, new_upload_id, sse_event, upload_path
+
+load_dotenv()
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+UPLOAD_FOLDER = 'uploads'
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max-limit
+ALLOWED_EXTENSIONS = {'.pdf', '.ppt', '.pptx'}
+
+# Общее состояние экземпляров за балансировщиком (STATE_BACKEND=sqlite), как
+# в app.py: загрузки, слайды и задачи - в общем хранилище
+state_store = get_state_store()
+if state_store:
+    UPLOAD_FOLDER = str(state_store.uploads_dir)
+
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Рендеринг и отдача слайдов - общий с синхронным режимом PDFProcessor,
+# анализ - асинхронный анализатор с общим для процесса клиентом AsyncOpenAI
+pdf_processor = PDFProcessor(slides_dir=state_store.slides_dir if state_store else None)
+async_processor = AsyncPDFProcessor(pdf_processor)
+if state_store:
+    # Задачи из общей очереди выполняются рабочими потоками экземпляра, как в app.py;
+    # потоковый анализ (stream) остается асинхронным
+    job_manager = SharedJobManager(pdf_processor, state_store)
+else:
+    job_manager = AsyncJobManager(async_processor)
+slide_janitor = SlideJanitor(pdf_processor, uploads_dir=UPLOAD_FOLDER, job_manager=job_manager)
+
+async def index(request):
+    return FileResponse(os.path.join('templates', 'test_upload.html'), media_type='text/html')
+
+class RequestTooLargeError(Exception):
+    """Тело запроса больше MAX_CONTENT_LENGTH"""
+
+def _limit_body(request, limit: int) -> Request:
+    """
+    Запрос, чтение тела которого прерывается RequestTooLargeError после limit
+    байт, как MAX_CONTENT_LENGTH во Flask: Content-Length может не быть
+    (chunked) или он может быть неверным.
+    """
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > limit:
+                raise RequestTooLargeError(f"Тело запроса больше {limit} байт")
+        return message
+
+    return Request(request.scope, receive)
+
+async def upload_file(request):
+    too_large = JSONResponse({'error': 'Файл слишком большой'}, status_code=413)
+    if int(request.headers.get('content-length') or 0) > MAX_CONTENT_LENGTH:
+        return too_large
+
+    try:
+        form = await _limit_body(request, MAX_CONTENT_LENGTH).form()
+    except RequestTooLargeError:
+        return too_large
+    file = form.get('file')
+    if file is None or isinstance(file, str):
+        return JSONResponse({'error': 'Файл не найден'}, status_code=400)
+    if not file.filename:
+        return JSONResponse({'error': 'Файл не выбран'}, status_code=400)
+
+    filename = file.filename
+    file_ext = os.path.splitext(str(filename))[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        return JSONResponse({'error': 'Поддерживаются только файлы PDF, PPT и PPTX'}, status_code=400)
+
+    try:
+        # Уникальное имя: одноименные загрузки не перезаписывают друг друга
+        file_id = new_upload_id(filename)
+        filepath = os.path.join(UPLOAD_FOLDER, file_id)
+        # Файл формы уже во временном файле: копируем частями, не читая в память целиком
+        await asyncio.to_thread(_write_file, filepath, file.file)
+        return JSONResponse({
+            'success': True,
+            'file_id': file_id,
+            'filename': filename,
+            'message': 'Файл успешно загружен'
+        })
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+def _write_file(path: str, source):
+    source.seek(0)
+    with open(path, 'wb') as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+async def analyze(request):
+    try:
+        data = await request.json()
+        file_id = data.get('file_id')
+        context = data.get('context', '')
+        include_timings = bool(data.get('timings'))
+        token_budget = data.get('token_budget')
+        if token_budget is not None and (not isinstance(token_budget, int) or token_budget <= 0):
+            return JSONResponse({'error': 'token_budget должен быть положительным целым числом'}, status_code=400)
+
+        logger.info("Начинаем анализ файла: %s", file_id)
+
+        filepath = upload_path(UPLOAD_FOLDER, file_id)
+        if filepath is None or not os.path.exists(filepath):
+            return JSONResponse({'error': 'Файл не найден'}, status_code=404)
+
+        if data.get('stream'):
+            return StreamingResponse(
+                _stream_analysis(filepath, context, include_timings, token_budget),
+                media_type='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        try:
+            job = job_manager.submit(filepath, context, include_timings, token_budget)
+        except JobQueueFullError as e:
+            return JSONResponse({'error': str(e)}, status_code=429, headers={'Retry-After': '10'})
+
+        return JSONResponse({
+            'success': True,
+            'job_id': job.job_id,
+            'status': job.status,
+            'status_url': f"/jobs/{job.job_id}",
+            'context': context
+        }, status_code=202)
+
+    except Exception as e:
+        logger.error("Ошибка при анализе: %s", e)
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def _stream_analysis(filepath, context, include_timings=False, token_budget=None):
+    """Строки NDJSON для потокового анализа"""
+    total_slides = 0
+    try:
+        with collect_timings() as timings:
+            async for event in async_processor.iter_slides(filepath, context=context, token_budget=token_budget):
+                if event['event'] == 'started':
+                    total_slides = event['total_slides']
+                yield json.dumps(event, ensure_ascii=False) + '\n'
+
+        done = {'event': 'done', 'total_slides': total_slides, 'context': context}
+        if include_timings:
+            done['timings'] = timings.to_dict()
+        yield json.dumps(done, ensure_ascii=False) + '\n'
+
+    except Exception as e:
+        logger.error("Ошибка при потоковом анализе: %s", e)
+        yield json.dumps({'event': 'error', 'error': str(e)}, ensure_ascii=False) + '\n'
+
+async def stream_slide_analysis(request):
+    """Потоковый анализ одного слайда (Server-Sent Events), см. app.stream_slide_analysis"""
+    doc_id = request.path_params['doc_id']
+    slide_number = request.path_params['slide_number']
+    slide_path = pdf_processor.get_slide_path(doc_id, slide_number)
+    if slide_path is None:
+        logger.error("Слайд не найден: %s/%s", doc_id, slide_number)
+        return JSONResponse({'error': 'Слайд не найден'}, status_code=404)
+    page_text = await asyncio.to_thread(pdf_processor.get_page_text, doc_id, slide_number)
+
+    return StreamingResponse(
+        _stream_slide(str(slide_path), page_text),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+async def _stream_slide(slide_path, page_text=None):
+    try:
+        async for event in async_processor.image_analyzer.stream_image(slide_path, page_text):
+            yield sse_event(event.pop('event'), event)
+    except Exception as e:
+        logger.error("Ошибка при потоковом анализе слайда: %s", e)
+        yield sse_event('error', {'error': str(e)})
+
+async def job_status(request):
+    job = job_manager.get(request.path_params['job_id'])
+    if not job:
+        return JSONResponse({'error': 'Задача не найдена'}, status_code=404)
+    return JSONResponse(job.to_dict())
+
+async def serve_slide(request):
+    """Изображение слайда (?size=thumb|preview), кэшируется как неизменяемое; If-None-Match - 304"""
+    doc_id = request.path_params['doc_id']
+    slide_number = request.path_params['slide_number']
+    try:
+        variant = request.query_params.get('size')
+        slide_path = pdf_processor.get_slide_path(doc_id, slide_number, None if variant == 'full' else variant)
+        if slide_path is None:
+            logger.error("Слайд не найден: %s/%s (%s)", doc_id, slide_number, variant or 'full')
+            return PlainTextResponse("Изображение не найдено", status_code=404)
+
+        stat = slide_path.stat()
+        etag = f'"{await asyncio.to_thread(file_etag, str(slide_path), stat.st_mtime_ns, stat.st_size)}"'
+        headers = {
+            'ETag': etag,
+            'Cache-Control': f"public, max-age={config.SLIDES_CACHE_MAX_AGE}, immutable"
+        }
+        if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+            return Response(status_code=304, headers=headers)
+
+        mimetype = 'image/png' if slide_path.suffix == '.png' else pdf_processor.rasterizer.variant_mime_type
+        return FileResponse(slide_path.resolve(), media_type=mimetype, headers=headers, stat_result=stat)
+
+    except Exception as e:
+        logger.error("Ошибка при отдаче слайда: %s", e)
+        return PlainTextResponse(str(e), status_code=500)
+
+async def cache_stats(request):
+    cache = async_processor.image_analyzer.cache
+    if not cache:
+        return JSONResponse({'enabled': False})
+    return JSONResponse({'enabled': True, **await asyncio.to_thread(cache.stats)})
+
+async def stats(request):
+    return JSONResponse({**metrics.snapshot(), 'output_caps': async_processor.image_analyzer.output_stats.snapshot(),
+                         'active_decks': job_manager.active})
+
+async def prometheus_metrics(request):
+    return PlainTextResponse(metrics.prometheus(), media_type='text/plain; version=0.0.4')
+
+async def cleanup(request):
+    """Удаление загрузок завершенных задач вызывающей стороны ({"job_ids": [...]}), см. app.cleanup"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        job_ids = (data if isinstance(data, dict) else {}).get('job_ids') or []
+        if not isinstance(job_ids, list):
+            return JSONResponse({'error': 'job_ids должен быть списком'}, status_code=400)
+        removed = await asyncio.to_thread(remove_job_uploads, job_manager, job_ids, UPLOAD_FOLDER)
+        logger.info("Очистка временных файлов выполнена успешно: удалено %s", removed)
+        return JSONResponse({'success': True, 'removed': removed})
+    except Exception as e:
+        logger.error("Ошибка при очистке временных файлов: %s", e)
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    slide_janitor.start()
+    if isinstance(job_manager, SharedJobManager):
+        job_manager.start()
+    if config.OFFICE_POOL_PREWARM:
+        asyncio.get_running_loop().run_in_executor(None, get_office_converter().prewarm)
+    startup_seconds = time.perf_counter() - _started
+    metrics.set_gauge('app_startup_seconds', startup_seconds)
+    logger.info("ASGI-приложение инициализировано за %.3f с", startup_seconds)
+    yield
+    slide_janitor.stop()
+    if isinstance(job_manager, SharedJobManager):
+        # Не дожидаемся текущих задач: после истечения аренды их выполнит другой экземпляр
+        job_manager.stop(timeout=0)
+    else:
+        await job_manager.shutdown()
+
+routes = [
+    Route('/', index),
+    Route('/test', index),
+    Route('/upload', upload_file, methods=['POST']),
+    Route('/analyze', analyze, methods=['POST']),
+    Route('/analyze/{doc_id}/{slide_number:int}/stream', stream_slide_analysis),
+    Route('/jobs/{job_id}', job_status),
+    Route('/slides/{doc_id}/{slide_number:int}', serve_slide),
+    Route('/cache/stats', cache_stats),
+    Route('/stats', stats),
+    Route('/metrics', prometheus_metrics),
+    Route('/cleanup', cleanup, methods=['POST']),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
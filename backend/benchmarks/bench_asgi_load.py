@@ -0,0 +1,162 @@
+"""
+Нагрузочный тест: сколько колод одновременно ведет один рабочий процесс
+в синхронном (Flask) и асинхронном (ASGI) режимах.
+
+Синхронный путь моделирует рабочий процесс gunicorn с --threads N: каждая
+колода занимает поток запроса и еще MAX_CONCURRENT_ANALYSES потоков анализа,
+колоды сверх N ждут свободный поток. Асинхронный путь запускает все колоды
+корутинами AsyncPDFProcessor в одном цикле событий. Поддельный клиент
+OpenAI отвечает с задержкой latency; слайды заранее отрисованы, поэтому
+измеряется именно обслуживание ожидания API, а не рендеринг.
+
+Для каждого числа одновременных колод выводятся общее время, пропускная
+способность, задержка колоды (p50/p95) и пиковое число потоков процесса.
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.bench_asgi_load --decks 1 8 32 128 --slides 10 --latency 0.5 --threads 8
+"""
+import argparse
+import asyncio
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from backend.benchmarks.fake_openai import FakeOpenAIClient, FakeAsyncOpenAIClient
+from backend.src.analysis.async_image_analyzer import AsyncImageAnalyzer
+from backend.src.analysis.async_processor import AsyncPDFProcessor
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.request_scheduler import RequestScheduler
+
+
+class ThreadSampler:
+    """Пиковое число потоков процесса за время работы блока with"""
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def make_decks(directory: Path, decks: int, slides: int):
+    """Колоды из различающихся PNG, чтобы дедупликация не объединяла слайды"""
+    result = []
+    for deck in range(decks):
+        paths = []
+        for number in range(1, slides + 1):
+            path = directory / f"deck_{deck}_slide_{number}.png"
+            Image.new('RGB', (320, 180), ((deck * 7) % 256, (number * 23) % 256, 160)).save(path)
+            paths.append(path)
+        result.append(paths)
+    return result
+
+
+def make_processor(image_analyzer, decks):
+    """PDFProcessor, который вместо рендеринга отдает готовые слайды колоды по ее номеру"""
+    processor = PDFProcessor(image_analyzer=image_analyzer)
+    processor.text_layer_enabled = False
+    processor.ensure_pdf = lambda pdf_path: pdf_path
+    processor.get_page_count = lambda pdf_path: len(decks[int(pdf_path)])
+    processor.iter_pdf = lambda pdf_path, total_pages=None, doc_id=None: (
+        page for page in enumerate(decks[int(pdf_path)], 1))
+    return processor
+
+
+def percentile(values, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def run_sync(decks, latency: float, threads: int):
+    """Колоды через PDFProcessor.iter_slides в пуле из threads потоков запросов"""
+    analyzer = ImageAnalyzer(client=FakeOpenAIClient(latency=latency), cache=False,
+                             scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0))
+    processor = make_processor(analyzer, decks)
+
+    # Задержка колоды считается от поступления запроса, включая ожидание свободного потока
+    def handle(deck: int, submitted: float) -> float:
+        for _ in processor.iter_slides(str(deck), doc_id=f"sync_{deck}"):
+            pass
+        return time.perf_counter() - submitted
+
+    started = time.perf_counter()
+    with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(handle, deck, started) for deck in range(len(decks))]
+        latencies = [future.result() for future in futures]
+    return time.perf_counter() - started, latencies, sampler.peak
+
+
+def run_async(decks, latency: float, max_requests: int):
+    """Все колоды одновременно корутинами AsyncPDFProcessor в одном цикле событий"""
+    analyzer = AsyncImageAnalyzer(client=FakeAsyncOpenAIClient(latency=latency), cache=False,
+                                  scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0),
+                                  max_concurrent_requests=max_requests)
+    processor = AsyncPDFProcessor(make_processor(analyzer, decks), analyzer)
+
+    async def handle(deck: int, submitted: float) -> float:
+        async for _ in processor.iter_slides(str(deck), doc_id=f"async_{deck}"):
+            pass
+        return time.perf_counter() - submitted
+
+    async def serve():
+        return await asyncio.gather(*(handle(deck, started) for deck in range(len(decks))))
+
+    started = time.perf_counter()
+    with ThreadSampler() as sampler:
+        latencies = asyncio.run(serve())
+    return time.perf_counter() - started, latencies, sampler.peak
+
+
+def run(levels, slides: int, latency: float, threads: int, max_requests: int):
+    """Строки отчета: режим, колод, время, колод в минуту, p50, p95 и пик потоков"""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        all_decks = make_decks(Path(tmp), max(levels), slides)
+        for count in levels:
+            decks = all_decks[:count]
+            for mode, result in (('flask', lambda: run_sync(decks, latency, threads)),
+                                 ('asgi', lambda: run_async(decks, latency, max_requests))):
+                elapsed, latencies, peak_threads = result()
+                rows.append((mode, count, elapsed, count / elapsed * 60,
+                             percentile(latencies, 0.5), percentile(latencies, 0.95), peak_threads))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--decks', type=int, nargs='+', default=[1, 8, 32, 128],
+                        help='Число одновременно поступающих колод')
+    parser.add_argument('--slides', type=int, default=10, help='Слайдов в колоде')
+    parser.add_argument('--latency', type=float, default=0.5, help='Задержка одного запроса к API, сек')
+    parser.add_argument('--threads', type=int, default=8, help='Потоков запросов синхронного рабочего процесса')
+    parser.add_argument('--async-requests', type=int, default=128,
+                        help='Одновременных запросов к API асинхронного процесса (ASYNC_MAX_CONCURRENT_REQUESTS)')
+    args = parser.parse_args()
+
+    rows = run(args.decks, args.slides, args.latency, args.threads, args.async_requests)
+
+    print(f"Слайдов в колоде: {args.slides}, задержка API: {args.latency} с, "
+          f"потоков Flask: {args.threads}, запросов ASGI: {args.async_requests}")
+    print(f"{'режим':>6} {'колод':>6} {'время, с':>9} {'колод/мин':>10} {'p50, с':>8} {'p95, с':>8} {'потоков':>8}")
+    for mode, count, elapsed, per_minute, p50, p95, peak_threads in rows:
+        print(f"{mode:>6} {count:>6} {elapsed:>9.2f} {per_minute:>10.1f} {p50:>8.2f} {p95:>8.2f} {peak_threads:>8}")
+
+
+if __name__ == '__main__':
+    main()
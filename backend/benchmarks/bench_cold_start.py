@@ -0,0 +1,75 @@
+"""
+Бенчмарк холодного запуска рабочего процесса.
+
+Каждый замер - новый интерпретатор: время импорта app.py (вместе с
+инициализацией модуля), время до ответа на первый запрос и до готовности
+общего клиента OpenAI (его импорт выполняется в фоне после запуска).
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.bench_cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+# Выполняется в отдельном интерпретаторе
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+heavy = sorted(name for name in ('openai', 'pdf2image', 'PIL') if name in sys.modules)
+response = app.app.test_client().get('/stats')
+assert response.status_code == 200
+first_response = time.perf_counter()
+from backend.src.analysis.openai_client import get_openai_client
+get_openai_client()
+client_ready = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - started,
+    'first_response_seconds': first_response - started,
+    'client_ready_seconds': client_ready - started,
+    'loaded_at_import': heavy
+}))
+"""
+
+
+def measure_cold_start(runs: int = 5):
+    """Медиана и разброс по runs запускам"""
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'bench'))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _PROBE], cwd=ROOT_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    summary = {'runs': runs, 'loaded_at_import': samples[-1]['loaded_at_import']}
+    for key in ('import_seconds', 'first_response_seconds', 'client_ready_seconds'):
+        values = [sample[key] for sample in samples]
+        summary[key] = statistics.median(values)
+        summary[f"{key}_min"] = min(values)
+        summary[f"{key}_max"] = max(values)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    summary = measure_cold_start(args.runs)
+    print(f"Запусков: {summary['runs']}, загружено при импорте: {', '.join(summary['loaded_at_import']) or '-'}")
+    for key, title in (('import_seconds', 'импорт app.py'), ('first_response_seconds', 'до первого ответа'),
+                       ('client_ready_seconds', 'клиент OpenAI')):
+        print(f"{title:>18}: медиана {summary[key]:.3f} с "
+              f"(мин {summary[f'{key}_min']:.3f}, макс {summary[f'{key}_max']:.3f})")
+
+
+if __name__ == '__main__':
+    main()
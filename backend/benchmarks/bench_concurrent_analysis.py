@@ -0,0 +1,70 @@
+"""
+Бенчмарк параллельного анализа слайдов.
+
+Использует поддельный клиент OpenAI с фиксированной задержкой и показывает,
+как время анализа колоды зависит от MAX_CONCURRENT_ANALYSES.
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.bench_concurrent_analysis --slides 40 --latency 0.5
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from backend.benchmarks.fake_openai import FakeOpenAIClient
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.request_scheduler import RequestScheduler
+
+
+def _make_slides(directory: Path, count: int):
+    """Создание набора небольших тестовых изображений"""
+    paths = []
+    for idx in range(1, count + 1):
+        path = directory / f"slide_{idx}.png"
+        Image.new('RGB', (320, 180), (idx * 5 % 256, 120, 200)).save(path, "PNG")
+        paths.append(path)
+    return paths
+
+
+def run(slides: int, latency: float, levels):
+    with tempfile.TemporaryDirectory() as tmp:
+        image_paths = _make_slides(Path(tmp), slides)
+        rows = []
+        for level in levels:
+            client = FakeOpenAIClient(latency=latency)
+            # Без кэша и лимитов квоты: измеряем именно параллельность запросов
+            analyzer = ImageAnalyzer(client=client, cache=False,
+                                     scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0))
+            processor = PDFProcessor(image_analyzer=analyzer)
+            processor.max_concurrent_analyses = level
+
+            started = time.perf_counter()
+            results = processor.analyze_images(image_paths)
+            elapsed = time.perf_counter() - started
+
+            assert [r['slide_number'] for r in results] == list(range(1, slides + 1))
+            rows.append((level, elapsed, client.max_in_flight))
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slides', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.5, help='Задержка одного запроса, сек')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    print(f"Слайдов: {args.slides}, задержка запроса: {args.latency} с")
+    print(f"{'параллельность':>15} {'время, с':>10} {'ускорение':>10} {'макс. в полете':>15}")
+    rows = run(args.slides, args.latency, args.levels)
+    baseline = rows[0][1]
+    for level, elapsed, max_in_flight in rows:
+        print(f"{level:>15} {elapsed:>10.2f} {baseline / elapsed:>10.1f} {max_in_flight:>15}")
+
+
+if __name__ == '__main__':
+    main()
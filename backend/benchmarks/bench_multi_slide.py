@@ -0,0 +1,69 @@
+"""
+Бенчмарк группового анализа: несколько слайдов в одном запросе.
+
+Поддельный клиент OpenAI отвечает с задержкой latency + image_latency на
+изображение и возвращает usage, поэтому видно, как размер группы
+(ANALYSIS_BATCH_SIZE) влияет на время анализа колоды, число запросов и
+токены на слайд (системный промпт и формат ответа повторяются реже).
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.bench_multi_slide --slides 24 --latency 1.0 --image-latency 0.2
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from backend.benchmarks.bench_concurrent_analysis import _make_slides
+from backend.benchmarks.fake_openai import FakeOpenAIClient
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.request_scheduler import RequestScheduler
+from backend.src.utils.metrics import metrics
+
+
+def run(slides: int, latency: float, image_latency: float, concurrency: int, sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        image_paths = _make_slides(Path(tmp), slides)
+        rows = []
+        for size in sizes:
+            metrics.reset()
+            client = FakeOpenAIClient(latency=latency, image_latency=image_latency)
+            analyzer = ImageAnalyzer(client=client, cache=False,
+                                     scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0))
+            processor = PDFProcessor(image_analyzer=analyzer)
+            processor.max_concurrent_analyses = concurrency
+            processor.analysis_batch_size = size
+
+            started = time.perf_counter()
+            results = processor.analyze_images(image_paths)
+            elapsed = time.perf_counter() - started
+
+            assert [r['slide_number'] for r in results] == list(range(1, slides + 1))
+            counters = metrics.snapshot()['counters']
+            rows.append((size, elapsed, client.calls,
+                         counters.get('analyzer_prompt_tokens_total', 0) / slides,
+                         counters.get('analyzer_completion_tokens_total', 0) / slides))
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slides', type=int, default=24)
+    parser.add_argument('--latency', type=float, default=1.0, help='Постоянная задержка запроса, сек')
+    parser.add_argument('--image-latency', type=float, default=0.2, help='Задержка на изображение, сек')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"Слайдов: {args.slides}, задержка: {args.latency} с + {args.image_latency} с на изображение, "
+          f"параллельность: {args.concurrency}")
+    print(f"{'группа':>7} {'время, с':>9} {'с/слайд':>8} {'запросов':>9} {'prompt/слайд':>13} {'completion/слайд':>17}")
+    for size, elapsed, calls, prompt_tokens, completion_tokens in run(
+            args.slides, args.latency, args.image_latency, args.concurrency, args.sizes):
+        print(f"{size:>7} {elapsed:>9.2f} {elapsed / args.slides:>8.3f} {calls:>9} "
+              f"{prompt_tokens:>13.0f} {completion_tokens:>17.0f}")
+
+
+if __name__ == '__main__':
+    main()
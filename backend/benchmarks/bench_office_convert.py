@@ -0,0 +1,83 @@
+"""
+Бенчмарк конвертации PPT/PPTX в PDF: холодный запуск LibreOffice против
+прогретого пула OfficeConverter.
+
+- cold: soffice --headless --convert-to на каждый файл без работающего
+  процесса (профиль один и тот же, чтобы не учитывать его создание);
+- pool: OfficeConverter(size=1) после prewarm, кэш PDF сбрасывается перед
+  каждой конвертацией. Без модуля uno пул тоже вызывает soffice
+  --convert-to, и выигрыш есть, только если запуск передает задание уже
+  работающему процессу с тем же профилем. Если pool не быстрее cold,
+  установите python3-uno (пакет LibreOffice системы, не pip).
+
+Нужен установленный LibreOffice и файл презентации:
+    python -m backend.benchmarks.bench_office_convert --input deck.pptx --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from backend.src.analysis.office_converter import OfficeConverter, _import_uno
+from backend.src.utils.config import config
+
+
+def bench_cold(source: Path, runs: int, soffice: str, timeout: float):
+    """Время конвертации отдельным запуском soffice"""
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        profile = Path(tmp) / 'profile'
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([soffice, '--headless', f"-env:UserInstallation={profile.resolve().as_uri()}",
+                            '--convert-to', 'pdf', '--outdir', tmp, str(source)],
+                           stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout, check=True)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_pool(source: Path, runs: int, soffice: str, timeout: float):
+    """Время конвертации прогретым пулом; кэш PDF не используется"""
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        converter = OfficeConverter(size=1, timeout=timeout, cache_dir=tmp, soffice=soffice)
+        try:
+            converter.prewarm()
+            digest = converter.file_hash(source)
+            for _ in range(runs):
+                converter.cached_path(digest).unlink(missing_ok=True)
+                started = time.perf_counter()
+                converter.convert(source)
+                samples.append(time.perf_counter() - started)
+        finally:
+            converter.close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', type=Path, required=True, help='Файл PPT/PPTX')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--soffice', default=config.SOFFICE_PATH)
+    parser.add_argument('--timeout', type=float, default=config.OFFICE_CONVERT_TIMEOUT)
+    args = parser.parse_args()
+
+    pool_mode = 'uno' if _import_uno() is not None else 'convert-to'
+    rows = [('cold', bench_cold(args.input, args.runs, args.soffice, args.timeout)),
+            (f"pool ({pool_mode})", bench_pool(args.input, args.runs, args.soffice, args.timeout))]
+
+    print(f"Файл: {args.input.name}, конвертаций: {args.runs}")
+    print(f"{'режим':>18} {'медиана, с':>11} {'мин, с':>8} {'макс, с':>8}")
+    for mode, samples in rows:
+        print(f"{mode:>18} {statistics.median(samples):>11.2f} {min(samples):>8.2f} {max(samples):>8.2f}")
+
+    cold, pool = (statistics.median(samples) for _, samples in rows)
+    if pool_mode == 'convert-to' and pool >= cold * 0.8:
+        print("Пул без uno не быстрее холодного запуска: задание не передается работающему процессу, "
+              "установите python3-uno")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Бенчмарк рендеринга слайдов: рендеринг при 200 DPI с уменьшением LANCZOS
+против рендеринга сразу в целевом разрешении (DPI по размеру страницы).
+
+Измеряет процессорное время (включая дочерние процессы pdftoppm) и качество:
+PSNR каждого варианта относительно эталона, отрендеренного с двойным
+разрешением и уменьшенного LANCZOS до того же размера.
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.bench_render_resolution --pdf "IDENTITY TEST.pdf"
+"""
+import argparse
+import math
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import pdf2image
+from PIL import Image, ImageChops, ImageStat
+
+from backend.src.analysis.rasterizer import PDFRasterizer
+
+
+def _cpu_seconds() -> float:
+    """Процессорное время текущего процесса и завершившихся дочерних"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _psnr(image: Image.Image, reference: Image.Image) -> float:
+    diff = ImageChops.difference(image.convert('RGB'), reference.convert('RGB'))
+    mse = sum(value ** 2 for value in ImageStat.Stat(diff).rms) / 3
+    return float('inf') if mse == 0 else 20 * math.log10(255 / math.sqrt(mse))
+
+
+def _render(pdf_path: Path, total_pages: int, output_dir: Path, target_size: bool):
+    rasterizer = PDFRasterizer(workers=1, target_size=target_size)
+    cpu_started = _cpu_seconds()
+    wall_started = time.perf_counter()
+    pages = [(number, artifact.path) for number, artifact in rasterizer.iter_pages(pdf_path, total_pages, output_dir)]
+    return pages, _cpu_seconds() - cpu_started, time.perf_counter() - wall_started
+
+
+def _reference(pdf_path: Path, page_number: int, dpi: float, size) -> Image.Image:
+    """Эталон: рендеринг с двойным разрешением и уменьшение до нужного размера"""
+    image = pdf2image.convert_from_path(str(pdf_path), dpi=dpi * 2, first_page=page_number, last_page=page_number)[0]
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', default='IDENTITY TEST.pdf')
+    parser.add_argument('--quality-pages', type=int, default=3, help='Сколько страниц сравнивать с эталоном')
+    args = parser.parse_args()
+
+    pdf_path = Path(args.pdf)
+    total_pages = int(pdf2image.pdfinfo_from_path(str(pdf_path))['Pages'])
+    print(f"{pdf_path}: {total_pages} стр.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, target_size in (('200 DPI + LANCZOS', False), ('целевое разрешение', True)):
+            output_dir = Path(tmp) / ('target' if target_size else 'legacy')
+            output_dir.mkdir()
+            pages, cpu, wall = _render(pdf_path, total_pages, output_dir, target_size)
+            results[name] = pages
+            with Image.open(pages[0][1]) as first:
+                size = first.size
+            print(f"{name:>20}: CPU {cpu:6.2f} с, время {wall:6.2f} с, "
+                  f"CPU на страницу {cpu / total_pages * 1000:6.1f} мс, размер {size[0]}x{size[1]}")
+
+        dpi = PDFRasterizer(workers=1).dpi
+        print(f"\nPSNR относительно эталона ({dpi * 2} DPI + LANCZOS), дБ:")
+        for page_number in range(1, min(args.quality_pages, total_pages) + 1):
+            row = []
+            for name, pages in results.items():
+                with Image.open(pages[page_number - 1][1]) as image:
+                    reference = _reference(pdf_path, page_number, dpi, image.size)
+                    row.append(f"{name}: {_psnr(image, reference):6.2f}")
+            print(f"  слайд {page_number}: " + ", ".join(row))
+
+
+if __name__ == '__main__':
+    main()
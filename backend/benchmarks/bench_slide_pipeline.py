@@ -0,0 +1,136 @@
+"""
+Бенчмарк пути слайда от отрисованной страницы до тела запроса к API.
+
+Сравниваются два варианта для одних и тех же раскодированных страниц:
+- disk: PNG с optimize=True пишется на диск, проверяется os.path.exists,
+  читается обратно для хэша дедупликации и для анализатора;
+- memory: PNG кодируется один раз с быстрым уровнем сжатия в SlideArtifact,
+  дедупликация и анализатор берут байты из памяти, файл пишется в фоне.
+
+Для каждого слайда измеряются процессорное время и пиковый объем
+Python-аллокаций (tracemalloc; буферы изображений Pillow в него не входят)
+на пути до готового блока image_url. Запись файлов в варианте memory
+измеряется отдельно: она не задерживает анализ.
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.bench_slide_pipeline --slides 12 --compress-level 1
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from PIL import Image
+
+from backend.benchmarks.bench_text_layer import make_synthetic_slides
+from backend.src.analysis.payload_encoder import PayloadEncoder
+from backend.src.analysis.rasterizer import encode_variants, parse_variants
+from backend.src.analysis.slide_artifact import SlideArtifact, SlideWriter, slide_bytes
+from backend.src.analysis.slide_dedup import SlideFingerprint
+from backend.src.utils.config import config
+
+
+def load_pages(directory: Path, count: int):
+    """Раскодированные страницы, как после pdftoppm и уменьшения"""
+    pages = []
+    for number, path, _ in make_synthetic_slides(directory, count):
+        with Image.open(path) as image:
+            pages.append((number, image.convert('RGB')))
+    return pages
+
+
+def disk_path(page: Image.Image, number: int, output_dir: Path, encoder: PayloadEncoder, variants):
+    """Прежний путь: optimize=True на диск, проверка и повторное чтение файла"""
+    output_path = output_dir / f"slide_{number}.png"
+    page.save(str(output_path), "PNG", optimize=True)
+    for filename, data in encode_variants(page, number, variants, 'webp', 80).items():
+        (output_dir / filename).write_bytes(data)
+    if not os.path.exists(output_path):
+        raise FileNotFoundError(output_path)
+    SlideFingerprint.from_path(output_path)
+    with open(output_path, 'rb') as img_file:
+        image_bytes = img_file.read()
+    encoder.image_content(encoder.encode(image_bytes))
+    return len(image_bytes)
+
+
+def memory_path(page: Image.Image, number: int, output_dir: Path, encoder: PayloadEncoder, variants,
+                compress_level: int):
+    """Новый путь: один PNG в памяти, дедупликация и анализатор без чтения файла"""
+    buffer = io.BytesIO()
+    page.save(buffer, "PNG", compress_level=compress_level)
+    artifact = SlideArtifact(number, output_dir / f"slide_{number}.png", buffer.getvalue(), page.size,
+                             encode_variants(page, number, variants, 'webp', 80))
+    SlideFingerprint.from_path(artifact)
+    encoder.image_content(encoder.encode(slide_bytes(artifact)))
+    return artifact
+
+
+def measure(step):
+    """Процессорное время, время и пиковые Python-аллокации одного вызова"""
+    tracemalloc.reset_peak()
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    result = step()
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    return result, cpu, wall, tracemalloc.get_traced_memory()[1]
+
+
+def run(slides: int, compress_level: int):
+    """Средние на слайд: {режим: (PNG байт, CPU с, время с, пик аллокаций байт)} и CPU фоновой записи"""
+    encoder = PayloadEncoder()
+    variants = parse_variants(config.SLIDE_VARIANTS)
+    writer = SlideWriter()
+    totals = {'disk': [0, 0.0, 0.0, 0], 'memory': [0, 0.0, 0.0, 0]}
+    write_cpu = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = load_pages(Path(tmp), slides)
+        disk_dir, memory_dir = Path(tmp) / 'disk', Path(tmp) / 'memory'
+        disk_dir.mkdir()
+        memory_dir.mkdir()
+
+        tracemalloc.start()
+        try:
+            for number, page in pages:
+                size, cpu, wall, peak = measure(lambda: disk_path(page, number, disk_dir, encoder, variants))
+                for idx, value in enumerate((size, cpu, wall, peak)):
+                    totals['disk'][idx] += value
+
+                artifact, cpu, wall, peak = measure(
+                    lambda: memory_path(page, number, memory_dir, encoder, variants, compress_level))
+                for idx, value in enumerate((len(artifact.data), cpu, wall, peak)):
+                    totals['memory'][idx] += value
+
+                # Запись в фоне; здесь дожидаемся ее, чтобы учесть процессорное время
+                cpu_started = time.process_time()
+                writer.submit(artifact).result()
+                write_cpu += time.process_time() - cpu_started
+        finally:
+            tracemalloc.stop()
+            writer.close()
+
+    return {mode: tuple(value / slides for value in values) for mode, values in totals.items()}, write_cpu / slides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slides', type=int, default=12)
+    parser.add_argument('--compress-level', type=int, default=config.PNG_COMPRESS_LEVEL,
+                        help='Уровень сжатия PNG в варианте memory (PNG_COMPRESS_LEVEL)')
+    args = parser.parse_args()
+
+    rows, write_cpu = run(args.slides, args.compress_level)
+
+    print(f"Слайдов: {args.slides}, уровень сжатия PNG: {args.compress_level}, на слайд:")
+    print(f"{'режим':>7} {'PNG, КБ':>8} {'CPU, мс':>8} {'время, мс':>10} {'пик аллокаций, КБ':>18}")
+    for mode, (size, cpu, wall, peak) in rows.items():
+        print(f"{mode:>7} {size / 1024:>8.1f} {cpu * 1000:>8.1f} {wall * 1000:>10.1f} {peak / 1024:>18.1f}")
+    print(f"Фоновая запись файлов (memory): CPU {write_cpu * 1000:.1f} мс на слайд")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Набор бенчмарков для сравнения производительности между коммитами.
+
+Без обращения к OpenAI: запросы уходят на локальный FakeOpenAIServer
+(задержка, доля ошибок и длина ответа настраиваются), презентации
+генерируются synthetic_pdf. Измеряются:
+- пропускная способность растеризации (страниц в секунду);
+- пиковый RSS PDFProcessor.process_pdf (в отдельном процессе, вместе с pdftoppm);
+- сквозная задержка /analyze в потоковом режиме и через задачу;
+- холодный запуск рабочего процесса (bench_cold_start).
+
+Результаты пишутся в JSON; с --baseline выводится изменение относительно
+прошлого прогона.
+
+Запуск из корня репозитория (нужен poppler):
+    python -m backend.benchmarks.bench_suite --pages 1 20 100 --analyze-pages 20 --latency 0.5
+    python -m backend.benchmarks.bench_suite --baseline backend/benchmarks/results/abc1234.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from backend.benchmarks.bench_cold_start import measure_cold_start
+from backend.benchmarks.fake_openai_server import FakeOpenAIServer
+from backend.benchmarks.synthetic_pdf import write_synthetic_pdf
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_rasterization(pdfs, workers: int):
+    """Страниц в секунду при рендеринге колод разного размера"""
+    from backend.src.analysis.rasterizer import PDFRasterizer
+
+    rows = []
+    for pages, pdf_path in pdfs:
+        rasterizer = PDFRasterizer(workers=workers)
+        with tempfile.TemporaryDirectory() as output_dir:
+            started = time.perf_counter()
+            rendered = sum(1 for _ in rasterizer.iter_pages(pdf_path, pages, output_dir))
+            elapsed = time.perf_counter() - started
+        rasterizer.close(wait=True)
+        rows.append({'pages': pages, 'workers': rasterizer.workers, 'seconds': elapsed,
+                     'pages_per_second': rendered / elapsed})
+    return rows
+
+
+def _process_pdf_rss(pdf_path: str, slides_dir: str, result_queue):
+    """Выполняется в отдельном процессе: process_pdf и пиковый RSS процесса и его потомков"""
+    from backend.src.analysis.pdf_processor import PDFProcessor
+
+    processor = PDFProcessor(image_analyzer=object())
+    processor.slides_dir = Path(slides_dir)
+    started = time.perf_counter()
+    try:
+        processor.process_pdf(pdf_path)
+    except Exception as e:
+        result_queue.put({'error': str(e)})
+        return
+    elapsed = time.perf_counter() - started
+    processor.rasterizer.close(wait=True)
+    # ru_maxrss в Linux - килобайты, в macOS - байты
+    scale = 1 if sys.platform == 'darwin' else 1024
+    result_queue.put({
+        'seconds': elapsed,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20,
+        'peak_children_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20
+    })
+
+
+def bench_peak_rss(pdfs):
+    """Пиковый RSS process_pdf; каждый замер в чистом процессе"""
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for pages, pdf_path in pdfs:
+        result_queue = context.Queue()
+        with tempfile.TemporaryDirectory() as slides_dir:
+            process = context.Process(target=_process_pdf_rss, args=(str(pdf_path), slides_dir, result_queue))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"process_pdf завершился с кодом {process.exitcode}")
+            result = result_queue.get()
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+            rows.append({'pages': pages, **result})
+    return rows
+
+
+def bench_analyze(pdf_path: Path, pages: int, runs: int):
+    """Сквозная задержка /analyze: потоковый режим (до первого анализа и полная) и режим задачи"""
+    import app as app_module
+
+    http = app_module.app.test_client()
+    with tempfile.TemporaryDirectory() as upload_dir:
+        app_module.app.config['UPLOAD_FOLDER'] = upload_dir
+        with open(pdf_path, 'rb') as source:
+            file_id = http.post('/upload', data={'file': (source, pdf_path.name)}).get_json()['file_id']
+
+        stream_runs, job_runs = [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            first_analyzed = None
+            response = http.post('/analyze', json={'file_id': file_id, 'stream': True}, buffered=False)
+            for line in response.response:
+                event = json.loads(line)
+                if event['event'] == 'analyzed' and first_analyzed is None:
+                    first_analyzed = time.perf_counter() - started
+                elif event['event'] == 'error':
+                    raise RuntimeError(event['error'])
+            stream_runs.append({'first_analyzed_seconds': first_analyzed, 'total_seconds': time.perf_counter() - started})
+
+            started = time.perf_counter()
+            status_url = http.post('/analyze', json={'file_id': file_id}).get_json()['status_url']
+            while True:
+                job = http.get(status_url).get_json()
+                if job['status'] in ('done', 'failed'):
+                    break
+                time.sleep(0.05)
+            if job['status'] == 'failed':
+                raise RuntimeError(job['error'])
+            job_runs.append({'total_seconds': time.perf_counter() - started})
+
+    def best(rows, key):
+        return min(row[key] for row in rows)
+
+    return {
+        'pages': pages,
+        'runs': runs,
+        'stream_first_analyzed_seconds': best(stream_runs, 'first_analyzed_seconds'),
+        'stream_total_seconds': best(stream_runs, 'total_seconds'),
+        'job_total_seconds': best(job_runs, 'total_seconds'),
+        'seconds_per_slide': best(stream_runs, 'total_seconds') / pages
+    }
+
+
+def _flatten(data, prefix=''):
+    """Числовые значения результатов с путями вида rasterization.20.pages_per_second"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _flatten(value, f"{prefix}{key}.")
+    elif isinstance(data, list):
+        for row in data:
+            label = row.get('pages', '') if isinstance(row, dict) else ''
+            yield from _flatten(row, f"{prefix}{label}.")
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix.rstrip('.'), data
+
+
+def compare(results, baseline):
+    """Изменение метрик относительно прошлого прогона"""
+    old = dict(_flatten(baseline['results']))
+    print(f"\nСравнение с {baseline.get('commit')}:")
+    for name, value in _flatten(results['results']):
+        if name in old and old[name]:
+            print(f"  {name:<55} {old[name]:>10.3f} -> {value:>10.3f} ({(value - old[name]) / old[name] * 100:+.1f}%)")
+
+
+def run_suite(args):
+    results = {
+        'commit': _git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': vars(args).copy(),
+        'results': {}
+    }
+    results['params'].pop('func', None)
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(
+            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+            response_chars=args.response_chars) as server:
+        # Приложение и анализатор читают настройки из окружения при импорте
+        os.environ['OPENAI_BASE_URL'] = server.base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'bench')
+        os.environ['ANALYSIS_CACHE_ENABLED'] = 'false'
+
+        pdfs = [(pages, write_synthetic_pdf(Path(tmp) / f"deck_{pages}.pdf", pages)) for pages in args.pages]
+        sections = [
+            ('rasterization', lambda: bench_rasterization(pdfs, args.workers)),
+            ('peak_rss', lambda: bench_peak_rss(pdfs)),
+            ('analyze', lambda: bench_analyze(
+                write_synthetic_pdf(Path(tmp) / 'analyze.pdf', args.analyze_pages, seed=1), args.analyze_pages, args.runs)),
+            ('cold_start', lambda: measure_cold_start(args.runs)),
+        ]
+        for name, bench in sections:
+            if args.only and name not in args.only:
+                continue
+            print(f"{name}...", flush=True)
+            try:
+                results['results'][name] = bench()
+            except Exception as e:
+                # Например, нет poppler: остальные разделы все равно выполняются
+                results['results'][name] = {'error': str(e)}
+            print(json.dumps(results['results'][name], ensure_ascii=False, indent=2))
+
+        results['fake_server'] = {'requests': server.requests, 'errors': server.errors}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 20, 100], help='Размеры колод (до 500 стр.)')
+    parser.add_argument('--workers', type=int, default=0, help='Процессов рендеринга (0 - из конфигурации)')
+    parser.add_argument('--analyze-pages', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=3, help='Повторов замера /analyze (берется лучший)')
+    parser.add_argument('--latency', type=float, default=0.5, help='Задержка поддельного OpenAI, сек')
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--response-chars', type=int, default=600)
+    parser.add_argument('--only', nargs='+', choices=['rasterization', 'peak_rss', 'analyze', 'cold_start'])
+    parser.add_argument('--output', help='Файл результатов (по умолчанию results/<коммит>.json)')
+    parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"Результаты: {output}")
+
+    if args.baseline:
+        compare(results, json.loads(Path(args.baseline).read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
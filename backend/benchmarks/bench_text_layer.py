@@ -0,0 +1,134 @@
+"""
+Бенчмарк текстового слоя: токены изображений и задержка на слайд.
+
+Каждый слайд анализируется дважды: только по изображению (как раньше) и с
+текстовым слоем, где choose_mode выбирает text (без изображения) или
+text_low (текст и изображение низкой детализации). Поддельный клиент
+OpenAI тратит image_latency на изображение высокой детализации и
+пропорционально меньше на low, поэтому видна и экономия токенов, и
+выигрыш по задержке.
+
+По умолчанию слайды синтетические (текстовые, смешанные, графические) с
+известными рамками слов. С --pdf рендерится настоящая колода, а текстовый
+слой извлекается pdftotext (нужен poppler).
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.bench_text_layer --slides 30 --latency 0.5 --image-latency 0.4
+    python -m backend.benchmarks.bench_text_layer --pdf deck.pdf
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from backend.benchmarks.fake_openai import FakeOpenAIClient
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.request_scheduler import RequestScheduler
+from backend.src.analysis.text_layer import PageText, extract_text_layer
+from backend.src.utils.metrics import metrics
+
+SLIDE_SIZE = (1280, 720)
+WORDS = ('выручка', 'рост', 'квартал', 'клиенты', 'продукт', 'рынок', 'стратегия', 'команда',
+         'метрика', 'план', 'запуск', 'доля', 'канал', 'бюджет', 'прогноз', 'сегмент')
+
+
+def _draw_lines(draw: ImageDraw.ImageDraw, rng: random.Random, lines: int, top: int, words_per_line: int):
+    """Строки случайных слов; возвращает текст и рамки слов в долях слайда"""
+    width, height = SLIDE_SIZE
+    text_lines, boxes = [], []
+    for line in range(lines):
+        x, y = 60, top + line * 28
+        words = [rng.choice(WORDS) for _ in range(words_per_line)]
+        for word in words:
+            x1, y1, x2, y2 = draw.textbbox((x, y), word)
+            draw.text((x, y), word, fill=(20, 20, 20))
+            boxes.append((x1 / width, y1 / height, x2 / width, y2 / height))
+            x = x2 + 8
+        text_lines.append(' '.join(words))
+    return '\n'.join(text_lines), boxes
+
+
+def make_synthetic_slides(directory: Path, count: int, seed: int = 0):
+    """Слайды трех типов по очереди: текстовый, смешанный (текст и фото), графический"""
+    rng = random.Random(seed)
+    slides = []
+    for number in range(1, count + 1):
+        image = Image.new('RGB', SLIDE_SIZE, 'white')
+        draw = ImageDraw.Draw(image)
+        kind = ('text', 'mixed', 'image')[(number - 1) % 3]
+        if kind == 'text':
+            text, boxes = _draw_lines(draw, rng, 14, 60, 7)
+        elif kind == 'mixed':
+            text, boxes = _draw_lines(draw, rng, 6, 60, 5)
+            photo = Image.effect_noise((520, 360), 60).convert('RGB')
+            image.paste(photo, (700, 300))
+        else:
+            text, boxes = _draw_lines(draw, rng, 1, 40, 3)
+            for _ in range(12):
+                x, y = rng.randrange(0, 1100), rng.randrange(120, 560)
+                draw.ellipse((x, y, x + 160, y + 140), fill=tuple(rng.randrange(256) for _ in range(3)))
+        path = directory / f"slide_{number}.png"
+        image.save(path)
+        slides.append((number, path, PageText(number, text, len(text.split()), boxes)))
+    return slides
+
+
+def load_pdf_slides(pdf_path: str):
+    """Слайды настоящей колоды и их текстовый слой (нужен poppler)"""
+    from backend.src.analysis.pdf_processor import PDFProcessor
+
+    text_layer = extract_text_layer(pdf_path)
+    image_paths = PDFProcessor().process_pdf(pdf_path)
+    return [(number, path, text_layer.get(number)) for number, path in enumerate(image_paths, 1)]
+
+
+def run(slides, latency: float, image_latency: float):
+    """Строки отчета: путь, режим, слайдов, токенов изображений и средняя задержка на слайд"""
+    rows = []
+    for path_name, use_text in (('только изображение', False), ('текстовый слой', True)):
+        metrics.reset()
+        analyzer = ImageAnalyzer(client=FakeOpenAIClient(latency=latency, image_latency=image_latency), cache=False,
+                                 scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0))
+        started = time.perf_counter()
+        for _, image_path, page_text in slides:
+            analyzer.analyze_image(str(image_path), page_text if use_text else None)
+        elapsed = time.perf_counter() - started
+
+        counters = metrics.snapshot()['counters']
+        histograms = metrics.snapshot()['histograms']
+        for name, histogram in sorted(histograms.items()):
+            if name.startswith('analyzer_slide_request_seconds{mode="'):
+                mode = name[len('analyzer_slide_request_seconds{mode="'):-2]
+                rows.append((path_name, mode, histogram['count'], histogram['sum'] / histogram['count']))
+        rows.append((path_name, 'итого', len(slides), elapsed / len(slides),
+                     counters.get('analyzer_vision_tokens_total', 0),
+                     counters.get('analyzer_vision_tokens_saved_total', 0)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slides', type=int, default=30, help='Количество синтетических слайдов')
+    parser.add_argument('--pdf', help='Настоящая колода вместо синтетических слайдов')
+    parser.add_argument('--latency', type=float, default=0.5, help='Постоянная задержка запроса, сек')
+    parser.add_argument('--image-latency', type=float, default=0.4,
+                        help='Задержка на изображение высокой детализации, сек')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        slides = load_pdf_slides(args.pdf) if args.pdf else make_synthetic_slides(Path(tmp), args.slides)
+        rows = run(slides, args.latency, args.image_latency)
+
+    print(f"Слайдов: {len(slides)}, задержка: {args.latency} с + {args.image_latency} с на изображение")
+    print(f"{'путь':>20} {'режим':>9} {'слайдов':>8} {'с/слайд':>8} {'токены изобр.':>14} {'сэкономлено':>12}")
+    for row in rows:
+        path_name, mode, count, per_slide = row[:4]
+        tokens = f"{int(row[4]):>14} {int(row[5]):>12}" if len(row) > 4 else ''
+        print(f"{path_name:>20} {mode:>9} {count:>8} {per_slide:>8.3f} {tokens}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Поддельный клиент OpenAI для бенчмарков и тестов без обращения к API
+"""
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+FAKE_ANALYSIS = """СУТЬ
+Тестовое описание слайда.
+
+ТЕЗИСЫ
+- Первый важный момент
+- Второй важный момент
+- Третий важный момент
+
+АКЦЕНТЫ
+тест, слайд, анализ"""
+
+# Токены одного изображения в usage: слайд 1024x576 при detail=high (4 плитки)
+FAKE_IMAGE_TOKENS = 765
+# Изображение с detail=low - фиксированная цена
+FAKE_LOW_IMAGE_TOKENS = 85
+# Символов в одном фрагменте потокового ответа
+FAKE_STREAM_CHUNK_CHARS = 16
+
+
+class _FakeCompletions:
+    def __init__(self, owner: 'FakeOpenAIClient'):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        return self._owner._complete(kwargs)
+
+
+class FakeOpenAIClient:
+    """
+    Клиент с интерфейсом client.chat.completions.create и фиксированной задержкой.
+    
+    На запрос с несколькими изображениями отвечает разделами "=== СЛАЙД N ===";
+    номера из omit_sections в ответ не попадают. Задержка запроса - latency
+    плюс image_latency за каждое изображение (для detail=low - пропорционально
+    меньше). usage оценивается по длине текста и токенам изображений; ответ
+    длиннее max_tokens обрезается с finish_reason="length".
+    
+    С stream=True ответ отдается фрагментами: первый через ту же задержку
+    (время до первого токена), следующие - через chunk_latency; без stream
+    chunk_latency за каждый фрагмент добавляется к задержке ответа.
+    """
+    def __init__(self, latency: float = 0.0, content: str = FAKE_ANALYSIS, image_latency: float = 0.0,
+                 omit_sections=(), chunk_latency: float = 0.0):
+        self.latency = latency
+        self.content = content
+        self.image_latency = image_latency
+        self.omit_sections = set(omit_sections)
+        self.chunk_latency = chunk_latency
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+        # Статистика вызовов
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _complete(self, kwargs):
+        self._enter(kwargs)
+        if kwargs.get('stream'):
+            return _FakeStream(self, kwargs)
+        try:
+            texts, images, image_tokens = self._parse(kwargs)
+            response = self._response(kwargs, texts, images, image_tokens)
+            delay = self._delay(image_tokens) + self.chunk_latency * len(self._pieces(response))
+            if delay:
+                time.sleep(delay)
+            return response
+        finally:
+            self._leave()
+
+    def _enter(self, kwargs):
+        with self._lock:
+            self.calls += 1
+            self.requests.append(kwargs)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @staticmethod
+    def _parse(kwargs):
+        """Тексты, число изображений и их токены в запросе"""
+        texts, images, image_tokens = [], 0, 0
+        for message in kwargs.get('messages', []):
+            parts = message['content'] if isinstance(message['content'], list) else [
+                {'type': 'text', 'text': message['content']}]
+            for part in parts:
+                if part['type'] == 'image_url':
+                    images += 1
+                    image_tokens += FAKE_LOW_IMAGE_TOKENS if part['image_url'].get('detail') == 'low' \
+                        else FAKE_IMAGE_TOKENS
+                else:
+                    texts.append(part['text'])
+        return texts, images, image_tokens
+
+    def _delay(self, image_tokens: int) -> float:
+        return self.latency + self.image_latency * image_tokens / FAKE_IMAGE_TOKENS
+
+    def _response(self, kwargs, texts, images: int, image_tokens: int):
+        if images > 1:
+            content = '\n\n'.join(f"=== СЛАЙД {number} ===\n{self.content}"
+                                   for number in range(1, images + 1) if number not in self.omit_sections)
+        else:
+            content = self.content
+        finish_reason = 'stop'
+        max_tokens = kwargs.get('max_tokens')
+        if max_tokens and len(content) // 4 > max_tokens:
+            content, finish_reason = content[:max_tokens * 4], 'length'
+        usage = SimpleNamespace(prompt_tokens=sum(len(text) for text in texts) // 4 + image_tokens,
+                                completion_tokens=len(content) // 4)
+        message = SimpleNamespace(role='assistant', content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+                               usage=usage)
+
+    @staticmethod
+    def _pieces(response):
+        content = response.choices[0].message.content
+        return [content[i:i + FAKE_STREAM_CHUNK_CHARS] for i in range(0, len(content), FAKE_STREAM_CHUNK_CHARS)]
+
+    def _stream_chunks(self, kwargs):
+        """Задержки и фрагменты потокового ответа; usage - последним фрагментом без choices"""
+        texts, images, image_tokens = self._parse(kwargs)
+        response = self._response(kwargs, texts, images, image_tokens)
+        pieces = self._pieces(response)
+        for idx, piece in enumerate(pieces):
+            last = idx == len(pieces) - 1
+            delta = SimpleNamespace(role='assistant' if idx == 0 else None, content=piece)
+            choice = SimpleNamespace(index=0, delta=delta, finish_reason=response.choices[0].finish_reason if last else None)
+            yield (self._delay(image_tokens) if idx == 0 else self.chunk_latency,
+                   SimpleNamespace(choices=[choice], usage=None))
+        if (kwargs.get('stream_options') or {}).get('include_usage'):
+            yield 0.0, SimpleNamespace(choices=[], usage=response.usage)
+
+
+class _FakeStream:
+    """Потоковый ответ с интерфейсом openai.Stream: итерация по фрагментам и close()"""
+    def __init__(self, owner: 'FakeOpenAIClient', kwargs):
+        self._owner = owner
+        self._chunks = owner._stream_chunks(kwargs)
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            for delay, chunk in self._chunks:
+                if delay:
+                    time.sleep(delay)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._owner._leave()
+
+
+class _FakeAsyncStream(_FakeStream):
+    """Потоковый ответ с интерфейсом openai.AsyncStream"""
+    async def __aiter__(self):
+        try:
+            for delay, chunk in self._chunks:
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk
+        finally:
+            self._release()
+
+    def _release(self):
+        _FakeStream.close(self)
+
+    async def close(self):
+        self._release()
+
+
+class _FakeAsyncCompletions:
+    def __init__(self, owner: 'FakeAsyncOpenAIClient'):
+        self._owner = owner
+
+    async def create(self, **kwargs):
+        return await self._owner._acomplete(kwargs)
+
+
+class FakeAsyncOpenAIClient(FakeOpenAIClient):
+    """То же, что FakeOpenAIClient, с интерфейсом AsyncOpenAI: задержка не блокирует цикл событий"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions(self))
+
+    async def _acomplete(self, kwargs):
+        self._enter(kwargs)
+        if kwargs.get('stream'):
+            return _FakeAsyncStream(self, kwargs)
+        try:
+            texts, images, image_tokens = self._parse(kwargs)
+            response = self._response(kwargs, texts, images, image_tokens)
+            delay = self._delay(image_tokens) + self.chunk_latency * len(self._pieces(response))
+            if delay:
+                await asyncio.sleep(delay)
+            return response
+        finally:
+            self._leave()
+
+
+class _FakeFiles:
+    def __init__(self, owner: 'FakeBatchClient'):
+        self._owner = owner
+
+    def create(self, file, purpose: str):
+        return self._owner._store(file.read(), purpose)
+
+    def content(self, file_id: str):
+        data = self._owner.stored_files[file_id]['data']
+        return SimpleNamespace(content=data, text=data.decode('utf-8'))
+
+
+class _FakeBatches:
+    def __init__(self, owner: 'FakeBatchClient'):
+        self._owner = owner
+
+    def create(self, input_file_id: str, endpoint: str, completion_window: str, metadata=None):
+        return self._owner._create_batch(input_file_id, endpoint, metadata)
+
+    def retrieve(self, batch_id: str):
+        return self._owner.batches_by_id[batch_id]
+
+
+class FakeBatchClient:
+    """
+    Локальная заглушка Batch API: files.create, batches.create/retrieve и files.content.
+    
+    Пакет обрабатывается сразу при создании; при auto_complete=False он остается
+    in_progress до вызова complete(). custom_id из fail_ids получают ответ с ошибкой.
+    """
+    def __init__(self, content: str = FAKE_ANALYSIS, fail_ids=(), auto_complete: bool = True):
+        self.content = content
+        self.fail_ids = set(fail_ids)
+        self.auto_complete = auto_complete
+        self.stored_files = {}
+        self.batches_by_id = {}
+        self.requests = []
+        self.files = _FakeFiles(self)
+        self.batches = _FakeBatches(self)
+
+    def _store(self, data: bytes, purpose: str):
+        file_id = f"file-{len(self.stored_files) + 1}"
+        self.stored_files[file_id] = {'data': data, 'purpose': purpose}
+        return SimpleNamespace(id=file_id)
+
+    def _create_batch(self, input_file_id: str, endpoint: str, metadata):
+        batch_id = f"batch-{len(self.batches_by_id) + 1}"
+        batch = SimpleNamespace(id=batch_id, status='in_progress', input_file_id=input_file_id,
+                                endpoint=endpoint, metadata=metadata, output_file_id=None, error_file_id=None)
+        self.batches_by_id[batch_id] = batch
+        if self.auto_complete:
+            self.complete(batch_id)
+        return batch
+
+    def complete(self, batch_id: str):
+        """Обработка пакета: формирование файлов ответов и ошибок"""
+        batch = self.batches_by_id[batch_id]
+        output, errors = [], []
+        for line in self.stored_files[batch.input_file_id]['data'].decode('utf-8').splitlines():
+            request = json.loads(line)
+            self.requests.append(request)
+            if request['custom_id'] in self.fail_ids:
+                errors.append({'id': f"req-{len(self.requests)}", 'custom_id': request['custom_id'], 'response': {
+                    'status_code': 500, 'body': {'error': {'message': 'Internal error'}}}, 'error': None})
+                continue
+            body = {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.content},
+                                 'finish_reason': 'stop'}]}
+            output.append({'id': f"req-{len(self.requests)}", 'custom_id': request['custom_id'],
+                           'response': {'status_code': 200, 'body': body}, 'error': None})
+
+        encode = lambda records: ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+        batch.output_file_id = self._store(encode(output), 'batch_output').id if output else None
+        batch.error_file_id = self._store(encode(errors), 'batch_output').id if errors else None
+        batch.status = 'completed'
@@ -0,0 +1,156 @@
+"""
+Локальный HTTP-сервер, совместимый с OpenAI chat.completions, для бенчмарков.
+
+Задержка, доля ошибок и длина ответа настраиваются; приложение направляется
+на сервер через OPENAI_BASE_URL, поэтому проверяется весь путь запроса,
+включая HTTP-клиент, сериализацию и повторы.
+
+Запуск отдельно:
+    python -m backend.benchmarks.fake_openai_server --port 8089 --latency 0.5 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=test python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.benchmarks.fake_openai import FAKE_ANALYSIS, FAKE_IMAGE_TOKENS
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: 'FakeOpenAIServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+            return
+        self.server.handle_completion(self, request)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    Сервер с задержкой latency (+ случайные jitter секунд), долей ответов
+    с ошибкой error_rate (429 с Retry-After или 500) и длиной ответа response_chars.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, response_chars: int = len(FAKE_ANALYSIS), seed: int = 0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.response_chars = response_chars
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'FakeOpenAIServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-openai', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _content(self) -> str:
+        """Ответ длиной response_chars из повторов тестового анализа"""
+        repeats = self.response_chars // (len(FAKE_ANALYSIS) + 1) + 1
+        return ((FAKE_ANALYSIS + '\n') * repeats)[:max(1, self.response_chars)]
+
+    def handle_completion(self, handler: _Handler, request):
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.error_rate
+            status = self._random.choice((429, 500)) if fail else 200
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            if fail:
+                self.errors += 1
+
+        time.sleep(delay)
+        if status == 429:
+            handler._send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                               headers={'Retry-After': '0'})
+            return
+        if status == 500:
+            handler._send_json(500, {'error': {'message': 'Internal error', 'type': 'server_error'}})
+            return
+
+        images, text = 0, 0
+        for message in request.get('messages', []):
+            parts = message['content'] if isinstance(message['content'], list) else [{'type': 'text', 'text': message['content']}]
+            for part in parts:
+                if part['type'] == 'image_url':
+                    images += 1
+                else:
+                    text += len(part['text'])
+
+        if images > 1:
+            content = '\n\n'.join(f"=== СЛАЙД {number} ===\n{FAKE_ANALYSIS}" for number in range(1, images + 1))
+        else:
+            content = self._content()
+        prompt_tokens = text // 4 + FAKE_IMAGE_TOKENS * images
+        completion_tokens = len(content) // 4
+        handler._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.5, help='Задержка ответа, сек')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Случайная добавка к задержке, сек')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 429/500')
+    parser.add_argument('--response-chars', type=int, default=len(FAKE_ANALYSIS))
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.response_chars)
+    print(f"Поддельный OpenAI: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
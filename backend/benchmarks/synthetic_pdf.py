@@ -0,0 +1,84 @@
+"""
+Генерация синтетических презентаций PDF для бенчмарков.
+
+Страницы векторные (прямоугольники и текст Helvetica), как у слайдов из
+Keynote/PowerPoint, поэтому pdftoppm выполняет настоящую растеризацию.
+Файл пишется постранично и не держит страницы в памяти, так что колода
+на 500 страниц создается за доли секунды.
+
+Запуск из корня репозитория:
+    python -m backend.benchmarks.synthetic_pdf --pages 100 deck_100.pdf
+"""
+import argparse
+import random
+from pathlib import Path
+
+# Размер страницы 16:9 в пунктах
+PAGE_WIDTH, PAGE_HEIGHT = 960, 540
+
+
+def _page_content(page_number: int, rng: random.Random) -> bytes:
+    """Поток команд страницы: фон, заголовок, блоки-пункты и номер"""
+    r, g, b = (rng.random() * 0.3 + 0.7 for _ in range(3))
+    ops = [f"{r:.3f} {g:.3f} {b:.3f} rg 0 0 {PAGE_WIDTH} {PAGE_HEIGHT} re f"]
+    ops.append(f"0.1 0.15 0.4 rg 60 {PAGE_HEIGHT - 120} {rng.randint(400, 800)} 60 re f")
+    for idx in range(rng.randint(2, 5)):
+        y = PAGE_HEIGHT - 200 - idx * 70
+        gray = rng.random() * 0.5
+        ops.append(f"{gray:.3f} {gray:.3f} {gray:.3f} rg 80 {y} {rng.randint(300, 780)} 36 re f")
+    ops.append(f"BT /F1 28 Tf 1 1 1 rg 72 {PAGE_HEIGHT - 100} Td (Slide {page_number}: synthetic deck) Tj ET")
+    ops.append(f"BT /F1 14 Tf 0 0 0 rg {PAGE_WIDTH - 80} 30 Td ({page_number}) Tj ET")
+    return '\n'.join(ops).encode('ascii')
+
+
+def write_synthetic_pdf(path: str | Path, pages: int, seed: int = 0) -> Path:
+    """Запись PDF из pages страниц; одинаковый seed дает одинаковый файл"""
+    if pages < 1:
+        raise ValueError("Количество страниц должно быть не меньше 1")
+    path = Path(path)
+    rng = random.Random(seed)
+
+    # Номера объектов: 1 - каталог, 2 - дерево страниц, 3 - шрифт,
+    # далее по два объекта на страницу (страница и ее содержимое)
+    page_ids = [4 + 2 * idx for idx in range(pages)]
+    offsets = {}
+    with open(path, 'wb') as pdf:
+        def write_object(number: int, body: bytes):
+            offsets[number] = pdf.tell()
+            pdf.write(f"{number} 0 obj\n".encode('ascii') + body + b"\nendobj\n")
+
+        pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode('ascii'))
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        for page_number, page_id in enumerate(page_ids, 1):
+            content = _page_content(page_number, rng)
+            write_object(page_id, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+            ).encode('ascii'))
+            write_object(page_id + 1, f"<< /Length {len(content)} >>\nstream\n".encode('ascii')
+                         + content + b"\nendstream")
+
+        xref_offset = pdf.tell()
+        total = 3 + 2 * pages
+        pdf.write(f"xref\n0 {total + 1}\n0000000000 65535 f \n".encode('ascii'))
+        for number in range(1, total + 1):
+            pdf.write(f"{offsets[number]:010d} 00000 n \n".encode('ascii'))
+        pdf.write(f"trailer\n<< /Size {total + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('ascii'))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('output')
+    args = parser.parse_args()
+    print(write_synthetic_pdf(args.output, args.pages, args.seed))
+
+
+if __name__ == '__main__':
+    main()
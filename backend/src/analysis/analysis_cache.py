@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional, Dict, Any
+from backend.src.utils.config import config
+from backend.src.jobs.state_store import get_state_store
+
+__all__ = ['AnalysisCache', 'get_analysis_cache']
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_analysis_cache() -> 'AnalysisCache':
+    """
+    Общий для процесса экземпляр кэша (единые счетчики попаданий).
+
+    При общем хранилище состояния кэш лежит в его каталоге, чтобы
+    экземпляры не анализировали одни и те же слайды каждый сам.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            store = get_state_store()
+            _shared_cache = AnalysisCache(store.analysis_cache_path if store else None)
+        return _shared_cache
+
+class AnalysisCache:
+    """
+    Постоянный кэш результатов анализа слайдов в SQLite.
+    
+    Ключ - хэш байтов изображения слайда вместе с текстом промпта, моделью
+    и лимитом токенов, поэтому изменение любого из них дает новый ключ.
+    """
+    def __init__(self, db_path: Optional[str | Path] = None,
+                 max_entries: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = Path(db_path or config.ANALYSIS_CACHE_PATH)
+        self.max_entries = max_entries if max_entries is not None else config.ANALYSIS_CACHE_MAX_ENTRIES
+        self.max_age_seconds = (max_age_seconds if max_age_seconds is not None
+                                else config.ANALYSIS_CACHE_MAX_AGE_DAYS * 24 * 3600)
+        
+        # Счетчики
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    analysis TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_accessed ON analysis_cache(accessed_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+    
+    @staticmethod
+    def make_key(image_bytes: bytes, *parts: Any) -> str:
+        """Ключ кэша по содержимому изображения и параметрам запроса"""
+        key = hashlib.sha256(image_bytes)
+        for part in parts:
+            key.update(b'\0')
+            key.update(str(part).encode('utf-8'))
+        return key.hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Получение анализа из кэша"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT analysis, created_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                # Запись устарела
+                conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                with self._lock:
+                    self.evictions += 1
+                row = None
+            
+            if row:
+                conn.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+    
+    def set(self, key: str, analysis: str):
+        """Сохранение анализа в кэш"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, analysis, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, analysis, now, now)
+            )
+            self._evict(conn, now)
+    
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Удаление устаревших записей и вытеснение давно не использованных сверх лимита"""
+        evicted = 0
+        if self.max_age_seconds:
+            evicted += conn.execute(
+                "DELETE FROM analysis_cache WHERE created_at < ?", (now - self.max_age_seconds,)
+            ).rowcount
+        
+        if self.max_entries:
+            evicted += conn.execute("""
+                DELETE FROM analysis_cache WHERE key IN (
+                    SELECT key FROM analysis_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,)).rowcount
+        
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            self.logger.debug("Из кэша анализа вытеснено записей: %s", evicted)
+    
+    def clear(self):
+        """Полная очистка кэша"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM analysis_cache")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и размер кэша"""
+        with closing(self._connect()) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'max_age_seconds': self.max_age_seconds
+            }
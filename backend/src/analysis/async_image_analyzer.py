@@ -0,0 +1,211 @@
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator
+from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics
+from backend.src.analysis.image_analyzer import BaseImageAnalyzer
+from backend.src.analysis.openai_client import get_async_openai_client
+from backend.src.analysis.text_layer import PageText
+from backend.src.analysis.token_budget import TokenBudgetExhaustedError
+
+__all__ = ['AsyncImageAnalyzer']
+
+class AsyncImageAnalyzer(BaseImageAnalyzer):
+    """
+    Анализатор для асинхронного режима сервера на клиенте AsyncOpenAI.
+
+    Промпты, кэш, кодирование изображений, бюджет и адаптивные лимиты ответа
+    общие с ImageAnalyzer (BaseImageAnalyzer). Запрос к API ожидается в цикле
+    событий, а чтение файла, обращения к SQLite-кэшу и кодирование выполняются
+    в пуле потоков, поэтому один рабочий процесс обслуживает много колод сразу.
+    Методы запросов - те же, что у ImageAnalyzer, но корутины: analyze_image,
+    analyze_image_group, stream_image, summarize_deck и refine_slide_analysis.
+    """
+    def __init__(self, client=None, cache=None, payload_encoder=None, scheduler=None, output_stats=None,
+                 max_concurrent_requests: Optional[int] = None):
+        super().__init__(client=client, cache=cache, payload_encoder=payload_encoder,
+                         scheduler=scheduler, output_stats=output_stats)
+        # Одновременные запросы процесса: остальные ждут здесь, а не в пуле соединений клиента
+        self.max_concurrent_requests = max(1, max_concurrent_requests or config.ASYNC_MAX_CONCURRENT_REQUESTS)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_async_openai_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    async def analyze_image(self, image_path, page_text: Optional[PageText] = None):
+        """Анализ слайда (см. ImageAnalyzer.analyze_image); при ошибке - None, при исчерпанном бюджете - исключение"""
+        try:
+            self.logger.info("Анализ изображения: %s", image_path)
+            slide = await asyncio.to_thread(self._prepare_slide, image_path, page_text)
+            if 'cached' in slide:
+                return slide['cached']
+
+            started = time.perf_counter()
+            with metrics.span('api_request'):
+                response = await self._request('slide', slide['messages'], slide['max_tokens'],
+                                               slide['tokens'] + slide['max_tokens'],
+                                               model=slide['model'], reserved=slide['reserved'], slides=1)
+                if self._should_retry(slide, response):
+                    response = await self._request('slide', slide['messages'], self.max_tokens,
+                                                   slide['tokens'] + self.max_tokens, model=slide['model'])
+            latency = time.perf_counter() - started
+            return await asyncio.to_thread(self._finish_slide, slide, response.choices[0].message.content, latency)
+
+        except TokenBudgetExhaustedError:
+            raise
+        except Exception as e:
+            self.logger.error("Ошибка при анализе изображения: %s", e)
+            return None
+
+    async def stream_image(self, image_path, page_text: Optional[PageText] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Потоковый анализ слайда: события delta, reset и done (см. ImageAnalyzer.stream_image)"""
+        self.logger.info("Потоковый анализ изображения: %s", image_path)
+        slide = await asyncio.to_thread(self._prepare_slide, image_path, page_text)
+        if 'cached' in slide:
+            yield {'event': 'delta', 'text': slide['cached']}
+            yield {'event': 'done', 'analysis': slide['cached'], 'ttft': None, 'cached': True}
+            return
+
+        started = time.perf_counter()
+        ttft = None
+        reserved = slide['reserved']
+        while True:
+            state = self._stream_state()
+            estimated_tokens = slide['tokens'] + slide['max_tokens']
+            try:
+                # Слот занят, пока открыт поток: соединение с API все это время занято
+                async with self._semaphore:
+                    stream = await self.scheduler.acall(
+                        self.client.chat.completions.create,
+                        estimated_tokens=estimated_tokens,
+                        model=slide['model'],
+                        messages=slide['messages'],
+                        max_tokens=slide['max_tokens'],
+                        stream=True,
+                        stream_options={'include_usage': True}
+                    )
+                    try:
+                        async for chunk in stream:
+                            text = self._stream_chunk(state, chunk)
+                            if not text:
+                                continue
+                            if ttft is None:
+                                ttft = self._record_ttft(image_path, started)
+                            yield {'event': 'delta', 'text': text}
+                    finally:
+                        await stream.close()
+            except BaseException:
+                self._release(reserved)
+                raise
+
+            response = self._stream_response(state)
+            self._account(response, 'slide', 1, reserved, estimated_tokens)
+            if not self._should_retry(slide, response):
+                break
+            slide['max_tokens'] = self.max_tokens
+            reserved = 0
+            yield {'event': 'reset'}
+
+        latency = time.perf_counter() - started
+        analysis = await asyncio.to_thread(self._finish_slide, slide, response.choices[0].message.content, latency)
+        yield {'event': 'done', 'analysis': analysis, 'ttft': ttft, 'cached': False}
+
+    async def summarize_deck(self, analyses: Dict[int, str], context: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Сводка по колоде (см. ImageAnalyzer.summarize_deck); при ошибке - None"""
+        prompt = self._deck_summary_prompt(analyses, context)
+        try:
+            cache_key = None
+            content = None
+            if self.cache:
+                cache_key = self.cache.make_key(prompt.encode('utf-8'), self.model, self.deck_summary_max_tokens)
+                content = await asyncio.to_thread(self.cache.get, cache_key)
+            if not content:
+                max_tokens = self.output_stats.cap('deck_summary', self.deck_summary_max_tokens)
+                with metrics.span('deck_summary'):
+                    response = await self._request('deck_summary', self._text_messages(prompt), max_tokens,
+                                                   len(prompt) // 2 + max_tokens)
+                metrics.inc('deck_summary_requests_total')
+                content = response.choices[0].message.content if response.choices else None
+                if not content:
+                    self.logger.warning("Пустой ответ при сводке по колоде")
+                    return None
+                if cache_key:
+                    await asyncio.to_thread(self.cache.set, cache_key, content)
+        except Exception as e:
+            self.logger.error("Ошибка при сводке по колоде: %s", e)
+            return None
+
+        return self._apply_deck_summary(content, analyses)
+
+    async def refine_slide_analysis(self, slide_number: int, analysis: str, deck: Dict[str, Any],
+                                    context: Optional[str] = None) -> Optional[str]:
+        """Уточнение анализа слайда по сводке колоды; при ошибке - None"""
+        prompt = self._refine_prompt(slide_number, analysis, deck, context)
+        max_tokens = self.output_stats.cap('refine', self.refine_max_tokens)
+        try:
+            with metrics.span('deck_refine'):
+                response = await self._request('refine', self._text_messages(prompt), max_tokens,
+                                               len(prompt) // 2 + max_tokens)
+            refined = response.choices[0].message.content if response.choices else None
+        except Exception as e:
+            self.logger.error("Ошибка при уточнении слайда %s: %s", slide_number, e)
+            return None
+
+        if refined:
+            metrics.inc('deck_refined_slides_total')
+            self.logger.info("Анализ слайда %s уточнен по сводке колоды", slide_number)
+        return refined
+
+    async def analyze_image_group(self, image_paths) -> List[Optional[str]]:
+        """Анализ нескольких слайдов одним запросом (см. ImageAnalyzer.analyze_image_group)"""
+        analyses, cache_keys, pending = await asyncio.to_thread(self._group_from_cache, image_paths)
+
+        if len(pending) > 1:
+            try:
+                sections, degraded_model = await self._request_slide_group(
+                    [image_bytes for _, image_bytes in pending])
+                await asyncio.to_thread(self._apply_group_sections, analyses, cache_keys, pending,
+                                        sections, degraded_model)
+            except TokenBudgetExhaustedError:
+                raise
+            except Exception as e:
+                self.logger.error("Ошибка при групповом анализе %s слайдов: %s", len(pending), e)
+
+        for idx in self._group_fallbacks(image_paths, analyses, pending):
+            analyses[idx] = await self.analyze_image(image_paths[idx])
+        return analyses
+
+    async def _request_slide_group(self, images: List[bytes]):
+        """Групповой запрос; кодирование и разбор ответа - как у ImageAnalyzer"""
+        group = await asyncio.to_thread(self._prepare_slide_group, images)
+        started = time.perf_counter()
+        with metrics.span('api_request'):
+            response = await self._request('group', group['messages'], group['max_tokens'],
+                                           group['estimated_tokens'], model=group['model'],
+                                           reserved=group['reserved'], slides=len(images))
+        return self._finish_slide_group(group, response, time.perf_counter() - started)
+
+    async def _request(self, kind: str, messages: List[Dict[str, Any]], max_tokens: int, estimated_tokens: int,
+                       model: Optional[str] = None, reserved: int = 0, slides: int = 0):
+        """Запрос chat.completions через планировщик (acall) с ограничением одновременных запросов"""
+        try:
+            async with self._semaphore:
+                response = await self.scheduler.acall(
+                    self.client.chat.completions.create,
+                    estimated_tokens=estimated_tokens,
+                    model=model or self.model,
+                    messages=messages,
+                    max_tokens=max_tokens
+                )
+        except Exception:
+            self._release(reserved)
+            raise
+        self._account(response, kind, slides, reserved, estimated_tokens)
+        return response
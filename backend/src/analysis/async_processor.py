@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, AsyncIterator, List, Tuple
+from backend.src.analysis.async_image_analyzer import AsyncImageAnalyzer
+from backend.src.analysis.deck_events import DeckEvents, slide_result
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.slide_artifact import SlideArtifact
+from backend.src.analysis.token_budget import TokenBudget, TokenBudgetExhaustedError, budget_context
+from backend.src.utils.logs import log_context
+
+__all__ = ['AsyncPDFProcessor']
+
+class AsyncPDFProcessor:
+    """
+    Потоковая обработка колоды для асинхронного режима сервера.
+
+    Рендеринг, конвертация PPT/PPTX, текстовый слой и хэши дедупликации
+    берутся у PDFProcessor и выполняются в пуле потоков (сама растеризация -
+    в пуле процессов растеризатора), чтобы не блокировать цикл событий.
+    Слайды анализируются задачами цикла событий на AsyncImageAnalyzer (по
+    ANALYSIS_BATCH_SIZE слайдов в запросе); число одновременных запросов
+    одной колоды ограничено MAX_CONCURRENT_ANALYSES.
+    События те же, что у PDFProcessor.iter_slides.
+    """
+    def __init__(self, pdf_processor: Optional[PDFProcessor] = None,
+                 image_analyzer: Optional[AsyncImageAnalyzer] = None):
+        self.logger = logging.getLogger(__name__)
+        self.pdf_processor = pdf_processor or PDFProcessor()
+        self.image_analyzer = image_analyzer or AsyncImageAnalyzer()
+
+    async def iter_slides(self, pdf_path, doc_id: Optional[str] = None, context: Optional[str] = None,
+                          token_budget: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """События started, rendered, analyzed, deduplicated, summary, refined и budget (порядок - DeckEvents)"""
+        processor = self.pdf_processor
+        self.logger.info("Начинаем асинхронную обработку PDF: %s", pdf_path)
+
+        pdf_path = await asyncio.to_thread(processor.ensure_pdf, pdf_path)
+        doc_id = doc_id or await asyncio.to_thread(processor.document_id, pdf_path)
+        events = processor.deck_events(doc_id, await asyncio.to_thread(processor.get_page_count, pdf_path))
+        yield events.started()
+
+        budget = TokenBudget(token_budget) if token_budget else None
+        limit = asyncio.Semaphore(processor.max_concurrent_analyses)
+        text_layer = (asyncio.create_task(asyncio.to_thread(processor.extract_text_layer, pdf_path, doc_id))
+                      if processor.text_layer_enabled else None)
+        pages = processor.iter_pdf(pdf_path, events.total_slides, doc_id)
+        pending = set()
+        try:
+            while True:
+                page = await asyncio.to_thread(next, pages, None)
+                if page is None:
+                    break
+                slide_number, image = page
+                await asyncio.to_thread(events.add_slide, slide_number, image)
+
+                group = events.take_group()
+                if group:
+                    # Рендеринг ждет места среди задач анализа (см. PDFProcessor.max_pending_groups)
+                    while len(pending) >= processor.max_pending_groups:
+                        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            pending.discard(task)
+                            for event in events.analyzed(task.result()):
+                                yield event
+                    pending.add(self._submit_group(group, text_layer, limit, budget))
+
+                # Анализ уже запущен по байтам в памяти; rendered - когда файл готов к отдаче
+                if isinstance(image, SlideArtifact) and image.saved is not None:
+                    await asyncio.wrap_future(image.saved)
+                for event in events.rendered(slide_number):
+                    yield event
+
+                # Отдаем уже готовые анализы, не дожидаясь конца рендеринга
+                for task in [t for t in pending if t.done()]:
+                    pending.discard(task)
+                    for event in events.analyzed(task.result()):
+                        yield event
+
+            group = events.take_group(final=True)
+            if group:
+                pending.add(self._submit_group(group, text_layer, limit, budget))
+            for next_done in asyncio.as_completed(pending):
+                for event in events.analyzed(await next_done):
+                    yield event
+            pending.clear()
+
+            yield events.deduplicated()
+
+            async for event in self._deck_pass(events, context, budget):
+                yield event
+            if budget:
+                yield {'event': 'budget', **budget.to_dict()}
+        finally:
+            # Если клиент отключился, не запускаем оставшиеся запросы
+            for task in pending:
+                task.cancel()
+            if text_layer:
+                text_layer.cancel()
+            try:
+                pages.close()
+            except ValueError:
+                # Страница еще рендерится в потоке: генератор закроется сборщиком мусора
+                pass
+
+    async def _deck_pass(self, events: DeckEvents, context: Optional[str],
+                         budget: Optional[TokenBudget] = None) -> AsyncIterator[Dict[str, Any]]:
+        """События summary и refined (см. PDFProcessor._deck_pass)"""
+        analyses = events.summary_request(budget)
+        if analyses is None:
+            return
+        deck = await asyncio.create_task(self.image_analyzer.summarize_deck(analyses, context),
+                                         context=budget_context(budget))
+        if deck is None:
+            return
+        yield events.summary(deck)
+
+        tasks = [
+            (number, asyncio.create_task(
+                self.image_analyzer.refine_slide_analysis(number, analysis, deck, context),
+                context=budget_context(budget)))
+            for number, analysis in events.refine_requests(self.image_analyzer.refine_max_slides, budget)
+        ]
+        try:
+            for number, task in tasks:
+                for event in events.refined(await task, number):
+                    yield event
+        finally:
+            for _, task in tasks:
+                task.cancel()
+
+    def _submit_group(self, group: List[Tuple[int, Path]], text_layer: Optional[asyncio.Task],
+                      limit: asyncio.Semaphore, budget: Optional[TokenBudget] = None) -> asyncio.Task:
+        """Задача анализа группы; бюджет колоды она видит через контекст, в котором создана"""
+        return asyncio.create_task(self._analyze_group(group, text_layer, limit), context=budget_context(budget))
+
+    async def _analyze_group(self, group: List[Tuple[int, Path]], text_layer: Optional[asyncio.Task],
+                             limit: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        """Анализ группы слайдов одним запросом; одиночный слайд - обычным (с текстовым слоем)"""
+        if len(group) == 1:
+            slide_number, image_path = group[0]
+            return [await self._analyze_slide(slide_number, image_path, text_layer, limit)]
+
+        with log_context(doc_id=Path(group[0][1]).parent.name, slide=[slide_number for slide_number, _ in group]):
+            async with limit:
+                try:
+                    analyses = await self.image_analyzer.analyze_image_group([image_path for _, image_path in group])
+                except TokenBudgetExhaustedError as e:
+                    return [slide_result(slide_number, image_path, error=e)
+                            for slide_number, image_path in group]
+                except Exception as e:
+                    self.logger.error("Ошибка при групповом анализе слайдов: %s", e)
+                    return [slide_result(slide_number, image_path, error=e)
+                            for slide_number, image_path in group]
+            return [slide_result(slide_number, image_path, analysis)
+                    for (slide_number, image_path), analysis in zip(group, analyses)]
+
+    async def _analyze_slide(self, slide_number: int, image_path: Path, text_layer: Optional[asyncio.Task],
+                             limit: asyncio.Semaphore) -> Dict[str, Any]:
+        """Анализ одного слайда с заглушкой при ошибке"""
+        # Контекст задачи свой, поля лога не видны другим слайдам
+        with log_context(doc_id=Path(image_path).parent.name, slide=slide_number):
+            return await self._analyze_slide_in_context(slide_number, image_path, text_layer, limit)
+
+    async def _analyze_slide_in_context(self, slide_number: int, image_path: Path,
+                                        text_layer: Optional[asyncio.Task],
+                                        limit: asyncio.Semaphore) -> Dict[str, Any]:
+        async with limit:
+            try:
+                page_text = (await text_layer).get(slide_number) if text_layer else None
+                image = image_path if isinstance(image_path, SlideArtifact) else str(image_path)
+                analysis = await self.image_analyzer.analyze_image(image, page_text)
+                return slide_result(slide_number, image_path, analysis)
+            except TokenBudgetExhaustedError as e:
+                return slide_result(slide_number, image_path, error=e)
+            except Exception as e:
+                self.logger.error("Ошибка при обработке слайда %s: %s", slide_number, e)
+                return slide_result(slide_number, image_path, error=e)
@@ -0,0 +1,226 @@
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from backend.src.utils.config import config
+from backend.src.analysis.office_converter import OFFICE_EXTENSIONS
+
+__all__ = ['BatchRunner']
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+SOURCE_EXTENSIONS = ('.pdf',) + OFFICE_EXTENSIONS
+
+class BatchRunner:
+    """
+    Офлайн-анализ архива презентаций через OpenAI Batch API.
+    
+    Рабочая папка:
+    - manifest.json - колоды, слайды и ключи кэша;
+    - requests_NNN.jsonl - запросы в формате Batch API (с разбиением по размеру);
+    - batches.json - отправленные пакеты и их статусы;
+    - output_NNN.jsonl / errors_NNN.jsonl - ответы Batch API;
+    - results/<имя файла колоды>.json - итоговые результаты по каждой колоде
+      (deck.pdf и deck.pptx не перезаписывают друг друга).
+    """
+    def __init__(self, pdf_processor, image_analyzer=None, client=None):
+        self.logger = logging.getLogger(__name__)
+        self.pdf_processor = pdf_processor
+        self.image_analyzer = image_analyzer or pdf_processor.image_analyzer
+        self.client = client or self.image_analyzer.client
+        self.max_file_bytes = config.BATCH_MAX_FILE_BYTES
+        self.max_requests = config.BATCH_MAX_REQUESTS
+    
+    @staticmethod
+    def _custom_id(deck_index: int, doc_id: str, slide_number: int) -> str:
+        # Номер колоды в пакете: у одинаковых файлов doc_id совпадает, а custom_id должен быть уникальным
+        return f"{deck_index}:{doc_id}:{slide_number}"
+    
+    @staticmethod
+    def _read_json(path: Path) -> Any:
+        with open(path, encoding='utf-8') as json_file:
+            return json.load(json_file)
+    
+    @staticmethod
+    def _write_json(path: Path, data: Any):
+        with open(path, 'w', encoding='utf-8') as json_file:
+            json.dump(data, json_file, ensure_ascii=False, indent=2)
+    
+    def prepare(self, input_dir: str | Path, work_dir: str | Path) -> Dict[str, Any]:
+        """Рендеринг всех PDF и презентаций PPT/PPTX из input_dir и запись запросов Batch API"""
+        input_dir, work_dir = Path(input_dir), Path(work_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        cache = self.image_analyzer.cache
+        
+        manifest = {'created_at': time.time(), 'model': self.image_analyzer.model, 'decks': []}
+        part, part_bytes, part_requests, request_files = None, 0, 0, []
+        
+        try:
+            sources = sorted(path for path in input_dir.iterdir() if path.suffix.lower() in SOURCE_EXTENSIONS)
+            for deck_index, source in enumerate(sources):
+                # Презентации PowerPoint рендерятся из PDF, полученного пулом LibreOffice
+                pdf_path = self.pdf_processor.ensure_pdf(source)
+                doc_id = self.pdf_processor.document_id(pdf_path)
+                image_paths = self.pdf_processor.process_pdf(pdf_path, doc_id=doc_id)
+                deck = {'index': deck_index, 'source': str(source), 'doc_id': doc_id,
+                        'total_slides': len(image_paths), 'slides': []}
+                
+                for slide_number, image_path in enumerate(image_paths, 1):
+                    image_bytes = Path(image_path).read_bytes()
+                    slide = {
+                        'slide_number': slide_number,
+                        'image_path': self.pdf_processor.slide_url(doc_id, slide_number)
+                    }
+                    
+                    # Уже проанализированные слайды не отправляем повторно
+                    if cache:
+                        slide['cache_key'] = self.image_analyzer.slide_cache_key(image_bytes)
+                        cached = cache.get(slide['cache_key'])
+                        if cached:
+                            slide['analysis'] = cached
+                            deck['slides'].append(slide)
+                            continue
+                    
+                    line = json.dumps({
+                        'custom_id': self._custom_id(deck_index, doc_id, slide_number),
+                        'method': 'POST',
+                        'url': BATCH_ENDPOINT,
+                        'body': self.image_analyzer.build_slide_request(image_bytes)
+                    }, ensure_ascii=False) + '\n'
+                    line_bytes = len(line.encode('utf-8'))
+                    
+                    # Новый файл, если текущий достиг лимитов Batch API
+                    if part is None or part_requests >= self.max_requests or part_bytes + line_bytes > self.max_file_bytes:
+                        if part is not None:
+                            part.close()
+                        request_path = work_dir / f"requests_{len(request_files) + 1:03d}.jsonl"
+                        request_files.append(request_path.name)
+                        part, part_bytes, part_requests = open(request_path, 'w', encoding='utf-8'), 0, 0
+                    
+                    part.write(line)
+                    part_bytes += line_bytes
+                    part_requests += 1
+                    deck['slides'].append(slide)
+                
+                manifest['decks'].append(deck)
+                self.logger.info("Подготовлена колода %s: слайдов %s", source.name, len(image_paths))
+        finally:
+            if part is not None:
+                part.close()
+        
+        manifest['request_files'] = request_files
+        self._write_json(work_dir / 'manifest.json', manifest)
+        
+        pending = sum(1 for deck in manifest['decks'] for slide in deck['slides'] if 'analysis' not in slide)
+        self.logger.info("Колод: %s, запросов в пакете: %s, файлов: %s",
+                         len(manifest['decks']), pending, len(request_files))
+        return manifest
+    
+    def submit(self, work_dir: str | Path) -> List[Dict[str, Any]]:
+        """Загрузка файлов запросов и создание пакетов Batch API"""
+        work_dir = Path(work_dir)
+        manifest = self._read_json(work_dir / 'manifest.json')
+        batches = []
+        for request_file in manifest['request_files']:
+            with open(work_dir / request_file, 'rb') as request_stream:
+                uploaded = self.client.files.create(file=request_stream, purpose='batch')
+            batch = self.client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window='24h',
+                metadata={'request_file': request_file}
+            )
+            batches.append({'request_file': request_file, 'batch_id': batch.id, 'status': batch.status})
+            self.logger.info("Отправлен пакет %s (%s)", batch.id, request_file)
+        
+        self._write_json(work_dir / 'batches.json', batches)
+        return batches
+    
+    def fetch(self, work_dir: str | Path) -> bool:
+        """Проверка статуса пакетов и загрузка готовых ответов; True, если все пакеты завершены"""
+        work_dir = Path(work_dir)
+        batches = self._read_json(work_dir / 'batches.json')
+        
+        for idx, entry in enumerate(batches, 1):
+            batch = self.client.batches.retrieve(entry['batch_id'])
+            entry['status'] = batch.status
+            if batch.status != 'completed':
+                continue
+            
+            for file_id, prefix in ((batch.output_file_id, 'output'), (getattr(batch, 'error_file_id', None), 'errors')):
+                if file_id:
+                    target = work_dir / f"{prefix}_{idx:03d}.jsonl"
+                    target.write_bytes(self.client.files.content(file_id).content)
+                    entry[f"{prefix}_file"] = target.name
+        
+        self._write_json(work_dir / 'batches.json', batches)
+        finished = all(entry['status'] in ('completed', 'failed', 'expired', 'cancelled') for entry in batches)
+        self.logger.info("Статусы пакетов: %s", ', '.join(entry['status'] for entry in batches))
+        return finished
+    
+    def _read_responses(self, work_dir: Path) -> Dict[str, Dict[str, Any]]:
+        """Ответы Batch API по custom_id: {'analysis': ...} или {'error': ...}"""
+        responses = {}
+        for path in sorted(work_dir.glob('output_*.jsonl')) + sorted(work_dir.glob('errors_*.jsonl')):
+            with open(path, encoding='utf-8') as output_file:
+                for line in output_file:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    response = record.get('response') or {}
+                    body = response.get('body') or {}
+                    
+                    if record.get('error'):
+                        responses[record['custom_id']] = {'error': record['error'].get('message', str(record['error']))}
+                    elif response.get('status_code') != 200:
+                        message = (body.get('error') or {}).get('message', f"HTTP {response.get('status_code')}")
+                        responses[record['custom_id']] = {'error': message}
+                    else:
+                        choices = body.get('choices') or []
+                        content = choices[0]['message'].get('content') if choices else None
+                        responses[record['custom_id']] = {'analysis': content} if content else {'error': "Пустой анализ от API"}
+        return responses
+    
+    def ingest(self, work_dir: str | Path) -> Dict[str, Dict[str, Any]]:
+        """Сборка результатов по колодам из ответов Batch API"""
+        work_dir = Path(work_dir)
+        manifest = self._read_json(work_dir / 'manifest.json')
+        responses = self._read_responses(work_dir)
+        cache = self.image_analyzer.cache
+        results_dir = work_dir / 'results'
+        results_dir.mkdir(exist_ok=True)
+        
+        decks = {}
+        for deck in manifest['decks']:
+            results = []
+            for slide in deck['slides']:
+                analysis = slide.get('analysis')
+                if analysis is None:
+                    response = responses.get(self._custom_id(deck['index'], deck['doc_id'], slide['slide_number']))
+                    if response is None:
+                        analysis = "Не удалось проанализировать слайд"
+                    elif 'error' in response:
+                        analysis = f"Ошибка при анализе: {response['error']}"
+                    else:
+                        analysis = response['analysis']
+                        # Сохраняем в кэш, чтобы интерактивный анализ тех же слайдов был бесплатным
+                        if cache and slide.get('cache_key'):
+                            cache.set(slide['cache_key'], analysis)
+                
+                results.append({
+                    'slide_number': slide['slide_number'],
+                    'analysis': analysis,
+                    'image_path': slide['image_path']
+                })
+            
+            deck_result = {
+                'source': deck['source'],
+                'doc_id': deck['doc_id'],
+                'total_slides': deck['total_slides'],
+                'results': results
+            }
+            self._write_json(results_dir / f"{Path(deck['source']).name}.json", deck_result)
+            decks[deck['source']] = deck_result
+        
+        self.logger.info("Результаты %s колод сохранены в %s", len(decks), results_dir)
+        return decks
@@ -0,0 +1,179 @@
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from backend.src.analysis.slide_dedup import SlideDeduplicator
+from backend.src.analysis.token_budget import TokenBudget, TokenBudgetExhaustedError
+from backend.src.utils.metrics import metrics
+
+__all__ = ['DeckEvents', 'slide_url', 'slide_result', 'ANALYSIS_ERROR_PREFIX', 'ANALYSIS_EMPTY_PLACEHOLDER',
+           'ANALYSIS_SKIPPED_PLACEHOLDER']
+
+# Заглушки вместо анализа; в сводку по колоде не попадают
+ANALYSIS_ERROR_PREFIX = "Ошибка при анализе: "
+ANALYSIS_EMPTY_PLACEHOLDER = "Не удалось проанализировать слайд"
+ANALYSIS_SKIPPED_PLACEHOLDER = "Слайд не проанализирован: бюджет токенов колоды исчерпан"
+
+logger = logging.getLogger(__name__)
+
+def slide_url(doc_id: str, slide_number: int) -> str:
+    """Относительный URL слайда для маршрута /slides/<doc_id>/<n>"""
+    return f"slides/{doc_id}/{slide_number}"
+
+def slide_result(slide_number: int, image_path: Path, analysis: Optional[str] = None,
+                 error: Optional[Exception] = None) -> Dict[str, Any]:
+    """
+    Результат слайда; при пустом анализе или ошибке - заглушка для
+    сохранения последовательности. Слайд, не отправленный из-за
+    исчерпанного бюджета, помечается skipped.
+    """
+    url = slide_url(Path(image_path).parent.name, slide_number)
+    if isinstance(error, TokenBudgetExhaustedError):
+        logger.warning("Слайд %s пропущен: %s", slide_number, error)
+        metrics.inc('analyzer_budget_skipped_slides_total')
+        return {
+            'slide_number': slide_number,
+            'analysis': ANALYSIS_SKIPPED_PLACEHOLDER,
+            'image_path': url,
+            'skipped': True
+        }
+    if error is not None:
+        # Добавляем информацию об ошибке в результаты
+        analysis = f"{ANALYSIS_ERROR_PREFIX}{str(error)}"
+    elif analysis:
+        logger.info("Слайд %s успешно проанализирован", slide_number)
+    else:
+        logger.warning("Пустой результат анализа для слайда %s", slide_number)
+        analysis = ANALYSIS_EMPTY_PLACEHOLDER
+
+    return {
+        'slide_number': slide_number,
+        'analysis': analysis,
+        'image_path': url
+    }
+
+class DeckEvents:
+    """
+    Последовательность событий анализа колоды, общая для
+    PDFProcessor.iter_slides и AsyncPDFProcessor.iter_slides: группы слайдов
+    для запросов, дедупликация, анализ дубликатов, затем сводка по колоде,
+    уточнение несогласованных слайдов и их дубликатов.
+
+    Запросов DeckEvents не выполняет и ничего не ждет: вызывающая сторона
+    отправляет группы из take_group на анализ, результаты передает в
+    analyzed, а ответы сводки и уточнения - в summary и refined.
+    """
+    def __init__(self, doc_id: str, total_slides: int, batch_size: int = 1, dedup: bool = False,
+                 summary: bool = False, refine: bool = False):
+        self.doc_id = doc_id
+        self.total_slides = total_slides
+        self.batch_size = max(1, batch_size)
+        self.deduplicator = SlideDeduplicator() if dedup else None
+        self.summary_enabled = summary
+        self.refine_enabled = refine
+        self.deck: Optional[Dict[str, Any]] = None
+        self._group: List[Tuple[int, Any]] = []
+        self._rendering: Dict[int, Tuple[Optional[int], Path]] = {}
+        self._finished: Dict[int, Dict[str, Any]] = {}          # представитель -> результат
+        self._shared: Dict[int, List[Tuple[int, Path]]] = {}    # представитель -> дубликаты без анализа
+        self._copies: Dict[int, List[Tuple[int, Path]]] = {}    # то же, но не очищается: для событий refined
+
+    def started(self) -> Dict[str, Any]:
+        return {'event': 'started', 'doc_id': self.doc_id, 'total_slides': self.total_slides}
+
+    def add_slide(self, slide_number: int, image):
+        """
+        Учет отрисованного слайда: почти одинаковые слайды не анализируются
+        повторно, остальные копятся в группу запроса. Хэш дедупликации
+        считается здесь (CPU), поэтому асинхронный режим вызывает метод в пуле потоков.
+        """
+        representative = None
+        if self.deduplicator:
+            with metrics.span('dedup_hash'):
+                representative = self.deduplicator.add(slide_number, image)
+        # Дубликатам байты не нужны: для них храним только путь
+        image_path = Path(image)
+        if representative is None:
+            self._group.append((slide_number, image))
+        else:
+            if representative not in self._finished:
+                self._shared.setdefault(representative, []).append((slide_number, image_path))
+            self._copies.setdefault(representative, []).append((slide_number, image_path))
+        self._rendering[slide_number] = (representative, image_path)
+
+    def take_group(self, final: bool = False) -> Optional[List[Tuple[int, Any]]]:
+        """Группа слайдов для запроса, когда она набрана (final - остаток в конце колоды)"""
+        if len(self._group) >= self.batch_size or (final and self._group):
+            group, self._group = self._group, []
+            return group
+        return None
+
+    def rendered(self, slide_number: int) -> Iterator[Dict[str, Any]]:
+        """Событие rendered (файл слайда готов к отдаче) и анализ дубликата, если представитель уже готов"""
+        representative, image_path = self._rendering.pop(slide_number)
+        yield {'event': 'rendered', 'slide_number': slide_number, 'image_path': slide_url(self.doc_id, slide_number)}
+        if representative is not None and representative in self._finished:
+            yield {'event': 'analyzed', **self._shared_result(self._finished[representative], slide_number, image_path)}
+
+    def analyzed(self, results: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """События analyzed для представителей и их дубликатов"""
+        for result in results:
+            self._finished[result['slide_number']] = result
+            yield {'event': 'analyzed', **result}
+            for slide_number, image_path in self._shared.pop(result['slide_number'], []):
+                yield {'event': 'analyzed', **self._shared_result(result, slide_number, image_path)}
+
+    def deduplicated(self) -> Dict[str, Any]:
+        """Событие deduplicated: итог дедупликации колоды"""
+        shared_slides = self.deduplicator.shared if self.deduplicator else 0
+        if shared_slides:
+            metrics.inc('dedup_shared_slides_total', shared_slides)
+            logger.info("Дедупликация: %s из %s слайдов получили общий анализ", shared_slides, self.total_slides)
+        return {
+            'event': 'deduplicated',
+            'total_slides': self.total_slides,
+            'unique_slides': self.total_slides - shared_slides,
+            'shared_slides': shared_slides,
+            'saved_calls': shared_slides
+        }
+
+    def summary_request(self, budget: Optional[TokenBudget] = None) -> Optional[Dict[int, str]]:
+        """
+        Анализы для сводки по колоде (без заглушек ошибок и пустых ответов)
+        или None, если сводка выключена, анализов нет или бюджет колоды исчерпан
+        """
+        if not self.summary_enabled or (budget and budget.exhausted):
+            return None
+        analyses = {number: result['analysis'] for number, result in self._finished.items()
+                    if not result['analysis'].startswith((ANALYSIS_ERROR_PREFIX, ANALYSIS_EMPTY_PLACEHOLDER,
+                                                          ANALYSIS_SKIPPED_PLACEHOLDER))}
+        return analyses or None
+
+    def summary(self, deck: Dict[str, Any]) -> Dict[str, Any]:
+        """Событие summary; сводка нужна refine_requests"""
+        self.deck = deck
+        return {'event': 'summary', **deck}
+
+    def refine_requests(self, max_slides: int, budget: Optional[TokenBudget] = None) -> List[Tuple[int, str]]:
+        """Несогласованные слайды из сводки (номер, анализ) для уточнения, не больше max_slides"""
+        if self.deck is None or not self.refine_enabled or (budget and budget.exhausted):
+            return []
+        return [(number, self._finished[number]['analysis']) for number in self.deck['inconsistent'][:max_slides]]
+
+    def refined(self, refined: Optional[str], number: int) -> Iterator[Dict[str, Any]]:
+        """События refined для уточненного слайда и его дубликатов"""
+        if not refined:
+            return
+        result = {**self._finished[number], 'analysis': refined, 'refined': True}
+        yield {'event': 'refined', **result}
+        for slide_number, image_path in self._copies.get(number, []):
+            yield {'event': 'refined', **self._shared_result(result, slide_number, image_path), 'refined': True}
+
+    @staticmethod
+    def _shared_result(result: Dict[str, Any], slide_number: int, image_path: Path) -> Dict[str, Any]:
+        """Результат дубликата: анализ представителя с пометкой shared_with"""
+        return {
+            'slide_number': slide_number,
+            'analysis': result['analysis'],
+            'image_path': slide_url(Path(image_path).parent.name, slide_number),
+            'shared_with': result['slide_number']
+        }
@@ -1,28 +1,136 @@
+import contextvars
+import io
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Set
-import base64
-from openai import OpenAI
+from typing import List, Dict, Any, Set, Optional, Iterator, Tuple
+import time
+from contextlib import closing
+from types import SimpleNamespace
+from PIL import Image
 from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics
+from backend.src.analysis.analysis_cache import get_analysis_cache
+from backend.src.analysis.payload_encoder import PayloadEncoder, estimate_vision_tokens
+from backend.src.analysis.request_scheduler import get_request_scheduler
+from backend.src.analysis.slide_artifact import SlideArtifact, slide_bytes
+from backend.src.analysis.openai_client import get_openai_client
+from backend.src.analysis.text_layer import PageText, choose_mode, MODE_IMAGE, MODE_TEXT, MODE_TEXT_LOW
+from backend.src.analysis.token_budget import get_output_token_stats, current_budget, TokenBudgetExhaustedError
 
 __all__ = ['analyze_image']
 
+# Промпты для анализа отдельного слайда (analyze_image)
+SLIDE_SYSTEM_PROMPT = "Вы - эксперт по анализу дизайна и визуальных материалов."
+SLIDE_ANALYSIS_PROMPT = """Проанализируйте этот слайд и опишите его содержание в следующем формате:
+
+СУТЬ
+Краткое описание того, что показано на слайде.
+
+ТЕЗИСЫ
+- Первый важный момент
+- Второй важный момент
+- Третий важный момент
+
+АКЦЕНТЫ
+Ключевые слова через запятую"""
+
+# Текстовый слой слайда, добавляемый к промпту (режимы text и text_low)
+SLIDE_TEXT_LAYER_PROMPT = """Текст слайда, извлеченный из PDF (блоки разделены пустой строкой):
+
+{text}"""
+SLIDE_TEXT_ONLY_NOTE = "Изображение не приложено: слайд почти целиком состоит из этого текста."
+
+# Промпт для анализа нескольких слайдов одним запросом (analyze_image_group)
+SLIDE_GROUP_PROMPT = """Ниже {count} слайдов, пронумерованных от 1 до {count} в порядке изображений.
+Проанализируйте каждый слайд отдельно. Ответ по каждому слайду начните со строки-разделителя
+=== СЛАЙД N ===
+где N - номер слайда, и опишите слайд в следующем формате:
+
+СУТЬ
+Краткое описание того, что показано на слайде.
+
+ТЕЗИСЫ
+- Первый важный момент
+- Второй важный момент
+- Третий важный момент
+
+АКЦЕНТЫ
+Ключевые слова через запятую"""
+
+# Разделитель ответов по слайдам в ответе на групповой запрос
+SLIDE_SECTION_PATTERN = re.compile(r'^\s*=+\s*СЛАЙД\s+(\d+)\s*=+\s*$', re.MULTILINE)
+
+# Сводка по колоде: один запрос по готовым анализам всех слайдов
+DECK_SUMMARY_PROMPT = """Ниже анализ слайдов одной презентации. Аудитория: {context}
+
+{slides}
+
+Определите общие темы и ключевые концепции всей презентации с точки зрения этой аудитории
+и найдите слайды, анализ которых расходится с остальными (разные термины для одного понятия,
+несовпадающие цифры или выводы). Ответ дайте строго в формате:
+
+ТЕМЫ: тема1, тема2
+КОНЦЕПЦИИ: концепция1, концепция2
+{summary_line}НЕСОГЛАСОВАННЫЕ: номера слайдов через запятую или «нет»"""
+DECK_SUMMARY_LINE = "РЕЗЮМЕ: два-три предложения о презентации в целом\n"
+DECK_FIELD_PATTERN = re.compile(r'^\s*(ТЕМЫ|КОНЦЕПЦИИ|РЕЗЮМЕ|НЕСОГЛАСОВАННЫЕ)\s*:\s*(.*)$',
+                                re.MULTILINE | re.IGNORECASE)
+
+# Уточнение анализа слайда, отмеченного в сводке как несогласованный (без изображения)
+DECK_REFINE_PROMPT = """Анализ слайда {slide_number} расходится с остальной презентацией. Аудитория: {context}
+Темы презентации: {themes}
+Ключевые концепции: {concepts}
+
+Согласуйте термины и выводы анализа с презентацией, не добавляя фактов, которых в нем нет.
+Сохраните формат (СУТЬ, ТЕЗИСЫ, АКЦЕНТЫ) и верните только исправленный анализ.
+
+{analysis}"""
+
 def analyze_image(img, context):
     analyzer = ImageAnalyzer()
     analyzer.initialize_context(context, 1)  # Один слайд
     return analyzer._analyze_single_slide(img, 1)  # Передаем номер слайда
 
-class ImageAnalyzer:
+class BaseImageAnalyzer:
     """
-    Класс для анализа изображений презентации с учетом контекста
+    Общая часть синхронного и асинхронного анализаторов без запросов к API:
+    промпты, кэш, кодирование изображений, бюджет колоды и адаптивные
+    лимиты ответа. Запросы выполняют ImageAnalyzer и AsyncImageAnalyzer.
     """
-    def __init__(self):
+    def __init__(self, client=None, cache=None, payload_encoder: Optional[PayloadEncoder] = None,
+                 scheduler=None, output_stats=None):
         self.logger = logging.getLogger(__name__)
-        self.client = OpenAI()
+        # Клиент можно передать извне (например, тестовый); по умолчанию
+        # используется общий клиент процесса, создаваемый при первом запросе
+        self._client = client
         
-        # Параметры для API запросов
+        # Общий планировщик запросов: лимиты, повторы и выключатель
+        self.scheduler = scheduler or get_request_scheduler()
+        
+        # Параметры для API запросов. max_tokens - потолок: фактический лимит
+        # ответа берется из наблюдаемой длины ответов (output_stats)
         self.model = config.OPENAI_MODEL
         self.max_tokens = config.MAX_TOKENS
+        self.output_stats = output_stats or get_output_token_stats()
+        # Дешевый режим при исчерпании бюджета колоды: detail=low и (опционально) другая модель
+        self.degraded_model = config.DEGRADED_OPENAI_MODEL or self.model
+        self.group_max_tokens = config.ANALYSIS_BATCH_MAX_TOKENS
+        self.text_layer_max_chars = config.TEXT_LAYER_MAX_CHARS
+        self.deck_summary_max_tokens = config.DECK_SUMMARY_MAX_TOKENS
+        self.deck_summary_slide_chars = config.DECK_SUMMARY_SLIDE_CHARS
+        self.deck_summary_text = config.DECK_SUMMARY_TEXT
+        self.refine_max_tokens = config.DECK_REFINE_MAX_TOKENS
+        self.refine_max_slides = config.DECK_REFINE_MAX_SLIDES
+        
+        # Кэш результатов анализа: None - общий для процесса, False - без кэша
+        if cache is None and config.ANALYSIS_CACHE_ENABLED:
+            cache = get_analysis_cache()
+        self.cache = cache
+        
+        # Кодирование изображений для API
+        self.payload_encoder = payload_encoder or PayloadEncoder()
         
         # Контекст презентации
         self.presentation_context = {
@@ -35,22 +143,434 @@ class ImageAnalyzer:
         # Добавляем атрибут для хранения текущих изображений
         self.current_images = []
     
+    def _deck_summary_prompt(self, analyses: Dict[int, str], context: Optional[str] = None) -> str:
+        if context is not None:
+            self.presentation_context['general_context'] = context
+        audience = self.presentation_context['general_context'] or "общая аудитория"
+        slides = '\n\n'.join(f"=== СЛАЙД {number} ===\n{analyses[number][:self.deck_summary_slide_chars]}"
+                              for number in sorted(analyses))
+        return DECK_SUMMARY_PROMPT.format(
+            context=audience, slides=slides, summary_line=DECK_SUMMARY_LINE if self.deck_summary_text else '')
+    
+    def _apply_deck_summary(self, content: str, analyses: Dict[int, str]) -> Dict[str, Any]:
+        """Разбор сводки и обновление presentation_context"""
+        deck = self.parse_deck_summary(content, analyses)
+        self.presentation_context['current_themes'].update(deck['themes'])
+        self.presentation_context['key_concepts'].update(deck['concepts'])
+        self.logger.info("Сводка по колоде: тем %s, концепций %s, несогласованных слайдов %s",
+                         len(deck['themes']), len(deck['concepts']), len(deck['inconsistent']))
+        return deck
+    
+    @staticmethod
+    def _text_messages(prompt: str) -> List[Dict[str, Any]]:
+        return [
+            {"role": "system", "content": SLIDE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    @staticmethod
+    def parse_deck_summary(content: str, analyses: Dict[int, Any]) -> Dict[str, Any]:
+        """Разбор ответа сводки; несогласованными считаются только слайды из analyses"""
+        fields = {name.upper(): value.strip() for name, value in DECK_FIELD_PATTERN.findall(content)}
+        
+        def split(value: str) -> List[str]:
+            return [item.strip() for item in value.split(',') if item.strip()]
+        
+        inconsistent = []
+        for number in re.findall(r'\d+', fields.get('НЕСОГЛАСОВАННЫЕ', '')):
+            if int(number) in analyses and int(number) not in inconsistent:
+                inconsistent.append(int(number))
+        return {
+            'themes': split(fields.get('ТЕМЫ', '')),
+            'concepts': split(fields.get('КОНЦЕПЦИИ', '')),
+            'summary': fields.get('РЕЗЮМЕ') or None,
+            'inconsistent': inconsistent
+        }
+    
+    def _refine_prompt(self, slide_number: int, analysis: str, deck: Dict[str, Any],
+                       context: Optional[str] = None) -> str:
+        return DECK_REFINE_PROMPT.format(
+            slide_number=slide_number,
+            context=context or self.presentation_context['general_context'] or "общая аудитория",
+            themes=', '.join(deck['themes']) or '-',
+            concepts=', '.join(deck['concepts']) or '-',
+            analysis=analysis
+        )
+    
+    def _estimate_tokens(self, prompt: str, payload, max_tokens: int) -> int:
+        """Оценка токенов запроса для лимита TPM: текст, изображение и максимум ответа"""
+        return len(prompt) // 2 + estimate_vision_tokens(payload.size, self.payload_encoder.detail) + max_tokens
+    
+    def _record_payload_metrics(self, payload, request_image_bytes: int, latency: float):
+        """Учет размера отправленного изображения и задержки запроса"""
+        metrics.inc('analyzer_requests_total')
+        metrics.inc('analyzer_source_image_bytes_total', payload.source_bytes)
+        metrics.inc('analyzer_payload_bytes_total', request_image_bytes)
+        metrics.observe('analyzer_payload_bytes', request_image_bytes,
+                        buckets=(50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000))
+        metrics.observe('analyzer_request_seconds', latency)
+        self.logger.debug(
+            "Изображение для API: %sx%s %s, %s байт в запросе (исходный PNG %s байт), задержка %.2f с",
+            payload.size[0], payload.size[1], payload.mime_type, request_image_bytes, payload.source_bytes, latency
+        )
+    
+    def slide_cache_key(self, image_bytes: bytes, *extra_parts: Any) -> str:
+        """Ключ кэша: содержимое слайда, промпт, модель, параметры изображения для API и режим"""
+        return self.cache.make_key(
+            image_bytes, SLIDE_SYSTEM_PROMPT, SLIDE_ANALYSIS_PROMPT, self.model, self.max_tokens,
+            *self.payload_encoder.cache_key_parts(), *extra_parts
+        )
+    
+    def build_slide_messages(self, image_content: Optional[Dict[str, Any]],
+                             text: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Сообщения запроса на анализ слайда: изображение и/или текстовый слой"""
+        content = [{"type": "text", "text": SLIDE_ANALYSIS_PROMPT}]
+        if text is not None:
+            content.append({"type": "text", "text": SLIDE_TEXT_LAYER_PROMPT.format(text=text)})
+            if image_content is None:
+                content.append({"type": "text", "text": SLIDE_TEXT_ONLY_NOTE})
+        if image_content is not None:
+            content.append(image_content)
+        return [
+            {"role": "system", "content": SLIDE_SYSTEM_PROMPT},
+            {"role": "user", "content": content}
+        ]
+    
+    def build_slide_request(self, image_bytes: bytes) -> Dict[str, Any]:
+        """Тело запроса chat.completions для слайда (используется и в Batch API)"""
+        payload = self.payload_encoder.encode(image_bytes)
+        return {
+            "model": self.model,
+            "messages": self.build_slide_messages(self.payload_encoder.image_content(payload)),
+            "max_tokens": self.max_tokens
+        }
+    
+    @staticmethod
+    def _stream_state() -> Dict[str, Any]:
+        return {'parts': [], 'finish_reason': None, 'usage': None}
+    
+    @staticmethod
+    def _stream_chunk(state: Dict[str, Any], chunk) -> Optional[str]:
+        """Учет фрагмента потока; возвращает его текст"""
+        if getattr(chunk, 'usage', None):
+            state['usage'] = chunk.usage
+        if not chunk.choices:
+            return None
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            state['finish_reason'] = choice.finish_reason
+        text = getattr(choice.delta, 'content', None)
+        if text:
+            state['parts'].append(text)
+        return text
+    
+    @staticmethod
+    def _stream_response(state: Dict[str, Any]):
+        """Ответ, собранный из потока, в виде непотокового ответа chat.completions"""
+        message = SimpleNamespace(role='assistant', content=''.join(state['parts']))
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason=state['finish_reason'])],
+                               usage=state['usage'])
+    
+    def _record_ttft(self, image_path, started: float) -> float:
+        """Время до первого токена ответа"""
+        ttft = time.perf_counter() - started
+        metrics.observe('analyzer_ttft_seconds', ttft)
+        self.logger.info("Первый токен анализа %s через %.2f с", image_path, ttft)
+        return ttft
+    
+    def _prepare_slide(self, image_path, page_text: Optional[PageText] = None) -> Dict[str, Any]:
+        """
+        Все до запроса к API: байты слайда, выбор режима, кэш, резерв в
+        бюджете и кодирование. image_path - путь к PNG или SlideArtifact
+        (тогда файл не читается). Возвращает {'cached': анализ} при
+        попадании в кэш, иначе параметры запроса для _request и _finish_slide.
+        """
+        image_bytes = slide_bytes(image_path)
+        
+        mode = choose_mode(page_text, image_bytes) if page_text is not None else MODE_IMAGE
+        text = page_text.text[:self.text_layer_max_chars] if mode != MODE_IMAGE else None
+        
+        # Проверяем кэш: ключ зависит от содержимого слайда, промпта, параметров модели и режима
+        cache_key = None
+        if self.cache:
+            with metrics.span('cache_lookup'):
+                cache_key = self.slide_cache_key(image_bytes, *((mode, text) if text is not None else ()))
+                cached = self.cache.get(cache_key)
+            if cached:
+                self.logger.info("Анализ найден в кэше: %s", image_path)
+                return {'cached': cached}
+        
+        # Оценка запроса до кодирования: размер изображения для API по заголовку PNG
+        if isinstance(image_path, SlideArtifact):
+            size = self.payload_encoder.fitted_size(image_path.size)
+        else:
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                size = self.payload_encoder.fitted_size(image.size)
+        prompt_tokens = len(SLIDE_SYSTEM_PROMPT + SLIDE_ANALYSIS_PROMPT + (text or '')) // 2
+        vision_tokens = self._vision_tokens(mode, size)
+        max_tokens = self.output_stats.cap('slide', self.max_tokens)
+        
+        # Бюджет колоды: близко к исчерпанию слайд уходит в дешевый режим
+        degraded, reserved = self._reserve(
+            prompt_tokens + vision_tokens + max_tokens,
+            prompt_tokens + self._vision_tokens(mode, size, degraded=True) + max_tokens)
+        model = self.degraded_model if degraded else self.model
+        try:
+            if degraded:
+                vision_tokens = self._vision_tokens(mode, size, degraded=True)
+                degraded_key = cache_key and self.slide_cache_key(
+                    image_bytes, *((mode, text) if text is not None else ()), 'degraded', model)
+                cached = degraded_key and self.cache.get(degraded_key)
+                if cached:
+                    self._release(reserved)
+                    return {'cached': cached}
+                cache_key = degraded_key
+                self.logger.info("Бюджет колоды почти исчерпан: %s анализируется в дешевом режиме", image_path)
+            
+            # Отдельная уменьшенная копия слайда для API (в режиме text не нужна)
+            payload = image_content = None
+            if mode != MODE_TEXT:
+                with metrics.span('payload_encode'):
+                    payload = self.payload_encoder.encode(image_bytes)
+                with metrics.span('base64'):
+                    image_content = self.payload_encoder.image_content(
+                        payload, detail='low' if mode == MODE_TEXT_LOW or degraded else None)
+        except Exception:
+            # Запрос не будет отправлен: резерв не должен занимать бюджет до конца колоды
+            self._release(reserved)
+            raise
+        self._record_vision_tokens(mode, size, vision_tokens)
+        
+        return {
+            'image_path': image_path,
+            'mode': mode,
+            'messages': self.build_slide_messages(image_content, text),
+            'tokens': prompt_tokens + vision_tokens,
+            'max_tokens': max_tokens,
+            'model': model,
+            'reserved': reserved,
+            'cache_key': cache_key,
+            'payload': payload,
+            'request_image_bytes': len(image_content["image_url"]["url"]) if image_content else 0
+        }
+    
+    def _should_retry(self, slide: Dict[str, Any], response) -> bool:
+        """Ответ обрезан по адаптивному лимиту, который ниже потолка"""
+        if not (self._truncated(response) and slide['max_tokens'] < self.max_tokens):
+            return False
+        metrics.inc('analyzer_truncated_retries_total')
+        self.logger.warning("Ответ для %s обрезан на %s токенах, повторяем", slide['image_path'], slide['max_tokens'])
+        return True
+    
+    def _finish_slide(self, slide: Dict[str, Any], analysis: Optional[str], latency: float) -> Optional[str]:
+        """Метрики запроса и сохранение анализа в кэш"""
+        if slide['payload'] is not None:
+            self._record_payload_metrics(slide['payload'], slide['request_image_bytes'], latency)
+        else:
+            metrics.inc('analyzer_requests_total')
+        metrics.observe('analyzer_slide_request_seconds', latency, labels={'mode': slide['mode']})
+        
+        if analysis:
+            self.logger.info("Получен анализ длиной %s символов (режим %s)", len(analysis), slide['mode'])
+            if slide['cache_key']:
+                self.cache.set(slide['cache_key'], analysis)
+        else:
+            self.logger.warning("Получен пустой анализ")
+        return analysis
+    
+    def _vision_tokens(self, mode: str, size, degraded: bool = False) -> int:
+        """Токены изображения в запросе: режим text без изображения, text_low и дешевый режим - detail=low"""
+        if mode == MODE_TEXT:
+            return 0
+        return estimate_vision_tokens(size, 'low' if mode == MODE_TEXT_LOW or degraded else self.payload_encoder.detail)
+    
+    def _record_vision_tokens(self, mode: str, size, sent: int):
+        """Учет токенов изображения в запросе и экономии относительно режима только-изображение"""
+        image_only = estimate_vision_tokens(size, self.payload_encoder.detail)
+        metrics.inc('analyzer_slides_total', labels={'mode': mode})
+        metrics.inc('analyzer_vision_tokens_total', sent)
+        metrics.inc('analyzer_vision_tokens_saved_total', image_only - sent)
+    
+    def _group_from_cache(self, image_paths: List[Path]):
+        """Анализы группы из кэша, ключи кэша и [(индекс, байты)] слайдов для запроса"""
+        analyses: List[Optional[str]] = [None] * len(image_paths)
+        cache_keys: List[Optional[str]] = [None] * len(image_paths)
+        pending = []
+        
+        for idx, image_path in enumerate(image_paths):
+            image_bytes = slide_bytes(image_path)
+            if self.cache:
+                cache_keys[idx] = self.slide_cache_key(image_bytes)
+                analyses[idx] = self.cache.get(cache_keys[idx])
+            if not analyses[idx]:
+                pending.append((idx, image_bytes))
+        return analyses, cache_keys, pending
+    
+    def _apply_group_sections(self, analyses: List[Optional[str]], cache_keys: List[Optional[str]],
+                              pending: List[Tuple[int, bytes]], sections: Dict[int, str],
+                              degraded_model: Optional[str]):
+        """Разделы ответа - в анализы группы и в кэш"""
+        for position, (idx, image_bytes) in enumerate(pending, 1):
+            analysis = sections.get(position)
+            if analysis:
+                analyses[idx] = analysis
+                if cache_keys[idx]:
+                    self.cache.set(self.slide_cache_key(image_bytes, 'degraded', degraded_model)
+                                   if degraded_model else cache_keys[idx], analysis)
+    
+    def _group_fallbacks(self, image_paths: List[Path], analyses: List[Optional[str]],
+                         pending: List[Tuple[int, bytes]]) -> List[int]:
+        """Индексы слайдов группы, которые нужно проанализировать отдельно"""
+        fallbacks = [idx for idx, _ in pending if not analyses[idx]]
+        if len(pending) > 1:
+            for idx in fallbacks:
+                metrics.inc('analyzer_group_fallbacks_total')
+                self.logger.warning("Раздел слайда %s не найден в ответе, повторяем отдельно", image_paths[idx])
+        return fallbacks
+    
+    def _prepare_slide_group(self, images: List[bytes]) -> Dict[str, Any]:
+        """Все до группового запроса: кодирование, лимит ответа и резерв в бюджете колоды"""
+        with metrics.span('payload_encode'):
+            payloads = [self.payload_encoder.encode(image_bytes) for image_bytes in images]
+        prompt = SLIDE_GROUP_PROMPT.format(count=len(images))
+        # Лимит ответа - наблюдаемая длина ответа на слайд, умноженная на число слайдов
+        max_tokens = min(self.output_stats.cap('group', self.max_tokens) * len(images), self.group_max_tokens)
+        
+        prompt_tokens = len(SLIDE_SYSTEM_PROMPT + prompt) // 2 + max_tokens
+        degraded, reserved = self._reserve(
+            prompt_tokens + sum(estimate_vision_tokens(payload.size, self.payload_encoder.detail) for payload in payloads),
+            prompt_tokens + sum(estimate_vision_tokens(payload.size, 'low') for payload in payloads))
+        detail = 'low' if degraded else None
+        try:
+            with metrics.span('base64'):
+                image_contents = [self.payload_encoder.image_content(payload, detail=detail) for payload in payloads]
+        except Exception:
+            self._release(reserved)
+            raise
+        
+        content = [{"type": "text", "text": prompt}]
+        for number, image_content in enumerate(image_contents, 1):
+            content.append({"type": "text", "text": f"Слайд {number}:"})
+            content.append(image_content)
+        
+        return {
+            'messages': [
+                {"role": "system", "content": SLIDE_SYSTEM_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            'max_tokens': max_tokens,
+            'estimated_tokens': prompt_tokens + sum(
+                estimate_vision_tokens(payload.size, detail or self.payload_encoder.detail) for payload in payloads),
+            'model': self.degraded_model if degraded else self.model,
+            'degraded': degraded,
+            'reserved': reserved,
+            'payloads': payloads,
+            'image_contents': image_contents
+        }
+    
+    def _finish_slide_group(self, group: Dict[str, Any], response, latency: float) -> Tuple[Dict[int, str], Optional[str]]:
+        """Метрики группового запроса и разбор ответа по слайдам"""
+        payloads = group['payloads']
+        for payload, image_content in zip(payloads, group['image_contents']):
+            self._record_payload_metrics(payload, len(image_content["image_url"]["url"]), latency / len(payloads))
+        metrics.inc('analyzer_group_requests_total')
+        
+        if not response.choices or not response.choices[0].message.content:
+            raise ValueError("Пустой ответ от API")
+        sections = self.split_slide_sections(response.choices[0].message.content, len(payloads))
+        return sections, group['model'] if group['degraded'] else None
+    
+    @staticmethod
+    def split_slide_sections(content: str, count: int) -> Dict[int, str]:
+        """Разбор ответа на разделы по слайдам; номера вне диапазона и пустые разделы отбрасываются"""
+        sections = {}
+        matches = list(SLIDE_SECTION_PATTERN.finditer(content))
+        for match, following in zip(matches, matches[1:] + [None]):
+            number = int(match.group(1))
+            end = following.start() if following else len(content)
+            text = content[match.end():end].strip()
+            if 1 <= number <= count and text and number not in sections:
+                sections[number] = text
+        return sections
+    
+    def _account(self, response, kind: str, slides: int, reserved: int, estimated_tokens: int):
+        """Учет usage ответа и замена резерва в бюджете колоды фактическим расходом"""
+        used = self._record_usage(response, slides, kind)
+        self._settle(reserved, used if used is not None else estimated_tokens)
+    
+    @staticmethod
+    def _reserve(full_estimate: int, cheap_estimate: int):
+        """Резерв в бюджете колоды: (дешевый ли режим, зарезервировано токенов)"""
+        budget = current_budget()
+        if budget is None:
+            return False, 0
+        degraded, reserved = budget.reserve(full_estimate, cheap_estimate)
+        if degraded:
+            metrics.inc('analyzer_degraded_requests_total')
+            metrics.inc('analyzer_budget_saved_tokens_total', full_estimate - cheap_estimate)
+        return degraded, reserved
+    
+    @staticmethod
+    def _settle(reserved: int, used: int):
+        budget = current_budget()
+        if budget is not None:
+            budget.settle(reserved, used)
+    
+    @staticmethod
+    def _release(reserved: int):
+        budget = current_budget()
+        if budget is not None:
+            budget.release(reserved)
+    
+    @staticmethod
+    def _truncated(response) -> bool:
+        return bool(response.choices) and getattr(response.choices[0], 'finish_reason', None) == 'length'
+    
+    def _record_usage(self, response, slides: int, kind: str) -> Optional[int]:
+        """Учет токенов из usage ответа (если API его вернул); возвращает prompt + completion"""
+        usage = getattr(response, 'usage', None)
+        if not usage:
+            return None
+        metrics.inc('analyzer_prompt_tokens_total', usage.prompt_tokens)
+        metrics.inc('analyzer_completion_tokens_total', usage.completion_tokens)
+        metrics.inc('analyzer_usage_slides_total', slides)
+        
+        # Длина ответа на слайд для адаптивного лимита; обрезанный ответ -
+        # нижняя оценка, она сдвигает перцентиль вверх
+        if self._truncated(response):
+            metrics.inc('analyzer_truncated_responses_total')
+        self.output_stats.record(kind, usage.completion_tokens // max(1, slides))
+        return usage.prompt_tokens + usage.completion_tokens
+
+class ImageAnalyzer(BaseImageAnalyzer):
+    """
+    Класс для анализа изображений презентации с учетом контекста
+    """
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_openai_client()
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
     def initialize_context(self, context: str, total_slides: int):
         """Инициализация контекста презентации"""
         self.presentation_context['general_context'] = context
         self.presentation_context['total_slides'] = total_slides
         self.presentation_context['current_themes'] = set()
         self.presentation_context['key_concepts'] = set()
-        self.logger.info(f"Инициализирован контекст презентации. Всего слайдов: {total_slides}")
+        self.logger.info("Инициализирован контекст презентации. Всего слайдов: %s", total_slides)
     
     def _analyze_single_slide(self, image_path: Path, slide_number: int) -> str:
         """Анализ одного слайда с учетом контекста"""
         try:
-            self.logger.info(f"Начинаем анализ слайда {slide_number}")
+            self.logger.info("Начинаем анализ слайда %s", slide_number)
             
-            # Кодируем изображение в base64
-            with open(image_path, 'rb') as img_file:
-                base64_image = base64.b64encode(img_file.read()).decode('utf-8')
+            # Кодируем изображение для API
+            payload = self.payload_encoder.encode(slide_bytes(image_path))
             
             # Формируем промпт с учетом контекста
             context = self.presentation_context['general_context'] or "общая аудитория"
@@ -72,23 +592,21 @@ class ImageAnalyzer:
 Ключевые слова через запятую. Важные слова выделите тегами <blue>слово</blue>."""
 
             # Запрос к API
-            response = self.client.chat.completions.create(
-                model=self.model,
+            max_tokens = self.output_stats.cap('slide', self.max_tokens)
+            response = self._request(
+                'slide',
                 messages=[
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
+                            self.payload_encoder.image_content(payload)
                         ]
                     }
                 ],
-                max_tokens=self.max_tokens
+                max_tokens=max_tokens,
+                estimated_tokens=self._estimate_tokens(prompt, payload, max_tokens),
+                slides=1
             )
             
             if not response.choices:
@@ -101,7 +619,7 @@ class ImageAnalyzer:
             return analysis
             
         except Exception as e:
-            self.logger.error(f"Ошибка при анализе слайда: {str(e)}", exc_info=True)
+            self.logger.error("Ошибка при анализе слайда: %s", e, exc_info=True)
             raise
     
     def _generate_analysis_prompt(self, slide_number: int) -> str:
@@ -129,79 +647,36 @@ class ImageAnalyzer:
 - Выделять ключевые слова знаком (!)
 - Адаптировать язык под аудиторию"""
 
-    def _update_context_from_analysis(self, analysis: str):
-        """Обновление контекста на основе анализа слайда"""
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{
-                    "role": "user",
-                    "content": f"""
-Представьте, что вы часть этой аудитории: {self.presentation_context['general_context']}
-
-Что для них реально важно в этом объяснении? 
-Какие темы и идеи они бы выделили, используя свой язык?
-
-Верните строго в формате:
-Темы: тема1, тема2
-Концепции: концепция1, концепция2
-
-Текст: {analysis}
-
-Важно:
-- Использовать их реальный язык и выражения
-- Выделять то, что важно именно для них
-- Сохранять их настоящий стиль общения"""
-                }],
-                max_tokens=100
-            )
-            
-            if not response.choices or not response.choices[0].message.content:
-                self.logger.warning("Пустой ответ при извлечении контекста")
-                return
-            
-            # Парсим ответ
-            result = response.choices[0].message.content
-            
-            # Извлекаем темы и концепции
-            themes = set()
-            concepts = set()
-            
-            for line in result.split('\n'):
-                if line.startswith('Темы:'):
-                    themes = {theme.strip() for theme in line.replace('Темы:', '').split(',') if theme.strip()}
-                elif line.startswith('Концепции:'):
-                    concepts = {concept.strip() for concept in line.replace('Концепции:', '').split(',') if concept.strip()}
-            
-            # Обновляем контекст
-            self.presentation_context['current_themes'].update(themes)
-            self.presentation_context['key_concepts'].update(concepts)
-            
-            self.logger.debug(f"Обновлен контекст: темы={themes}, концепции={concepts}")
-            
-        except Exception as e:
-            self.logger.error(f"Ошибка при обновлении контекста: {str(e)}", exc_info=True)
-    
-    def analyze_slides(self, image_paths: List[Path]) -> Dict[str, Any]:
-        """Анализ набора слайдов"""
+    def analyze_slides(self, image_paths: List[Path], refine: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Анализ набора слайдов в две фазы: все слайды параллельно с контекстом
+        аудитории, затем один запрос сводки по колоде (темы, концепции,
+        резюме). Слайды, отмеченные в сводке как несогласованные, уточняются
+        (refine, по умолчанию DECK_REFINE_ENABLED) отдельным дешевым текстовым запросом.
+        """
         try:
             # Сохраняем текущие изображения
             self.current_images = image_paths
-            self.logger.info(f"Начинаем анализ {len(image_paths)} слайдов")
+            self.logger.info("Начинаем анализ %s слайдов", len(image_paths))
+            
+            workers = max(1, min(config.MAX_CONCURRENT_ANALYSES, len(image_paths)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='slide-analysis') as executor:
+                futures = [executor.submit(contextvars.copy_context().run, self._analyze_single_slide, image_path, idx)
+                           for idx, image_path in enumerate(image_paths, 1)]
             
             results = []
-            for idx, image_path in enumerate(image_paths, 1):
-                self.logger.info(f"Обработка слайда {idx}/{len(image_paths)}: {image_path}")
+            analyses = {}
+            for idx, future in enumerate(futures, 1):
                 try:
-                    slide_analysis = self._analyze_single_slide(image_path, idx)
-                    self.logger.info(f"Получен анализ для слайда {idx}: {slide_analysis[:100]}...")
-                    
+                    slide_analysis = future.result()
+                    self.logger.info("Получен анализ для слайда %s: %s...", idx, slide_analysis[:100])
+                    analyses[idx] = slide_analysis
                     results.append({
                         'slide_number': idx,
                         'analysis': slide_analysis
                     })
                 except Exception as e:
-                    self.logger.error(f"Ошибка при анализе слайда {idx}: {str(e)}")
+                    self.logger.error("Ошибка при анализе слайда %s: %s", idx, e)
                     # Добавляем заглушку для сохранения нумерации
                     results.append({
                         'slide_number': idx,
@@ -218,17 +693,27 @@ class ImageAnalyzer:
 """
                     })
             
-            self.logger.info(f"Завершен анализ всех слайдов. Всего результатов: {len(results)}")
+            self.logger.info("Завершен анализ всех слайдов. Всего результатов: %s", len(results))
             
             # Проверяем, что количество результатов совпадает с количеством слайдов
             if len(results) != len(image_paths):
-                self.logger.error(f"Несоответствие количества результатов ({len(results)}) и слайдов ({len(image_paths)})")
+                self.logger.error("Несоответствие количества результатов (%s) и слайдов (%s)",
+                                  len(results), len(image_paths))
+            
+            # Вторая фаза: сводка по колоде и уточнение несогласованных слайдов
+            deck = self.summarize_deck(analyses) if analyses else None
+            if deck and (refine if refine is not None else config.DECK_REFINE_ENABLED):
+                for slide_number in deck['inconsistent'][:self.refine_max_slides]:
+                    refined = self.refine_slide_analysis(slide_number, analyses[slide_number], deck)
+                    if refined:
+                        results[slide_number - 1] = {'slide_number': slide_number, 'analysis': refined, 'refined': True}
             
             context_for_json = {
                 'general_context': self.presentation_context['general_context'],
                 'total_slides': self.presentation_context['total_slides'],
                 'current_themes': list(self.presentation_context['current_themes']),
-                'key_concepts': list(self.presentation_context['key_concepts'])
+                'key_concepts': list(self.presentation_context['key_concepts']),
+                'summary': deck['summary'] if deck else None
             }
             
             return {
@@ -237,9 +722,58 @@ class ImageAnalyzer:
             }
             
         except Exception as e:
-            self.logger.error(f"Критическая ошибка при анализе слайдов: {str(e)}", exc_info=True)
+            self.logger.error("Критическая ошибка при анализе слайдов: %s", e, exc_info=True)
             raise
     
+    def summarize_deck(self, analyses: Dict[int, str], context: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Сводка по колоде одним запросом: темы, концепции, резюме и номера
+        несогласованных слайдов. Обновляет presentation_context; при ошибке - None.
+        """
+        prompt = self._deck_summary_prompt(analyses, context)
+        try:
+            cache_key = None
+            content = None
+            if self.cache:
+                cache_key = self.cache.make_key(prompt.encode('utf-8'), self.model, self.deck_summary_max_tokens)
+                content = self.cache.get(cache_key)
+            if not content:
+                max_tokens = self.output_stats.cap('deck_summary', self.deck_summary_max_tokens)
+                with metrics.span('deck_summary'):
+                    response = self._request('deck_summary', self._text_messages(prompt), max_tokens,
+                                             len(prompt) // 2 + max_tokens)
+                metrics.inc('deck_summary_requests_total')
+                content = response.choices[0].message.content if response.choices else None
+                if not content:
+                    self.logger.warning("Пустой ответ при сводке по колоде")
+                    return None
+                if cache_key:
+                    self.cache.set(cache_key, content)
+        except Exception as e:
+            self.logger.error("Ошибка при сводке по колоде: %s", e)
+            return None
+        
+        return self._apply_deck_summary(content, analyses)
+    
+    def refine_slide_analysis(self, slide_number: int, analysis: str, deck: Dict[str, Any],
+                              context: Optional[str] = None) -> Optional[str]:
+        """Уточнение анализа слайда по сводке колоды текстовым запросом; при ошибке - None"""
+        prompt = self._refine_prompt(slide_number, analysis, deck, context)
+        max_tokens = self.output_stats.cap('refine', self.refine_max_tokens)
+        try:
+            with metrics.span('deck_refine'):
+                response = self._request('refine', self._text_messages(prompt), max_tokens,
+                                         len(prompt) // 2 + max_tokens)
+            refined = response.choices[0].message.content if response.choices else None
+        except Exception as e:
+            self.logger.error("Ошибка при уточнении слайда %s: %s", slide_number, e)
+            return None
+        
+        if refined:
+            metrics.inc('deck_refined_slides_total')
+            self.logger.info("Анализ слайда %s уточнен по сводке колоды", slide_number)
+        return refined
+    
     def _process_api_response(self, response) -> Dict[str, Any]:
         """Обработка ответа от API"""
         try:
@@ -250,7 +784,7 @@ class ImageAnalyzer:
                 "structured_data": self._structure_analysis(content)
             }
         except Exception as e:
-            self.logger.error(f"Ошибка при обработке ответа API: {str(e)}")
+            self.logger.error("Ошибка при обработке ответа API: %s", e)
             raise
     
     def _structure_analysis(self, content: str) -> Dict[str, Any]:
@@ -270,52 +804,146 @@ class ImageAnalyzer:
         """Получение текущего набора обрабатываемых изображений"""
         return self.current_images
 
-    def analyze_image(self, image_path):
+    def analyze_image(self, image_path, page_text: Optional[PageText] = None):
+        """
+        Анализ слайда. С текстовым слоем страницы (page_text) режим выбирается
+        эвристикой choose_mode: текст и изображение низкой детализации либо только текст.
+        При ошибке - None; TokenBudgetExhaustedError, если бюджет колоды исчерпан.
+        """
         try:
-            self.logger.info(f"Анализ изображения: {image_path}")
+            self.logger.info("Анализ изображения: %s", image_path)
+            slide = self._prepare_slide(image_path, page_text)
+            if 'cached' in slide:
+                return slide['cached']
             
-            # Загружаем изображение
-            with open(image_path, 'rb') as img_file:
-                image_data = base64.b64encode(img_file.read()).decode('utf-8')
+            started = time.perf_counter()
+            with metrics.span('api_request'):
+                response = self._request('slide', slide['messages'], slide['max_tokens'],
+                                         slide['tokens'] + slide['max_tokens'],
+                                         model=slide['model'], reserved=slide['reserved'], slides=1)
+                # Ответ обрезан по адаптивному лимиту: повторяем с полным потолком
+                if self._should_retry(slide, response):
+                    response = self._request('slide', slide['messages'], self.max_tokens,
+                                             slide['tokens'] + self.max_tokens, model=slide['model'])
+            return self._finish_slide(slide, response.choices[0].message.content, time.perf_counter() - started)
             
-            # Формируем запрос к API в правильном формате
-            messages = [
-                {"role": "system", "content": "Вы - эксперт по анализу дизайна и визуальных материалов."},
-                {"role": "user", "content": [
-                    {"type": "text", "text": """Проанализируйте этот слайд и опишите его содержание в следующем формате:
-
-СУТЬ
-Краткое описание того, что показано на слайде.
-
-ТЕЗИСЫ
-- Первый важный момент
-- Второй важный момент
-- Третий важный момент
-
-АКЦЕНТЫ
-Ключевые слова через запятую"""},
-                    {"type": "image_url", 
-                     "image_url": {
-                         "url": f"data:image/png;base64,{image_data}",
-                         "detail": "high"
-                     }
-                    }
-                ]}
-            ]
+        except TokenBudgetExhaustedError:
+            raise
+        except Exception as e:
+            self.logger.error("Ошибка при анализе изображения: %s", e)
+            return None
+    
+    def stream_image(self, image_path, page_text: Optional[PageText] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковый анализ слайда (stream=True). События:
+        - delta: очередной фрагмент текста (text)
+        - reset: ответ обрезан адаптивным лимитом, текст начинается заново с полным лимитом
+        - done: итоговый анализ, время до первого токена ttft (секунды) и cached
+        
+        Итоговый текст сохраняется в кэш под тем же ключом, что и в
+        analyze_image, поэтому совпадает с непотоковым результатом.
+        """
+        self.logger.info("Потоковый анализ изображения: %s", image_path)
+        slide = self._prepare_slide(image_path, page_text)
+        if 'cached' in slide:
+            yield {'event': 'delta', 'text': slide['cached']}
+            yield {'event': 'done', 'analysis': slide['cached'], 'ttft': None, 'cached': True}
+            return
+        
+        started = time.perf_counter()
+        ttft = None
+        reserved = slide['reserved']
+        while True:
+            state = self._stream_state()
+            estimated_tokens = slide['tokens'] + slide['max_tokens']
+            try:
+                stream = self.scheduler.call(
+                    self.client.chat.completions.create,
+                    estimated_tokens=estimated_tokens,
+                    model=slide['model'],
+                    messages=slide['messages'],
+                    max_tokens=slide['max_tokens'],
+                    stream=True,
+                    stream_options={'include_usage': True}
+                )
+                with closing(stream):
+                    for chunk in stream:
+                        text = self._stream_chunk(state, chunk)
+                        if not text:
+                            continue
+                        if ttft is None:
+                            ttft = self._record_ttft(image_path, started)
+                        yield {'event': 'delta', 'text': text}
+            except BaseException:
+                # В том числе закрытие генератора, когда клиент отключился
+                self._release(reserved)
+                raise
             
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self._stream_response(state)
+            self._account(response, 'slide', 1, reserved, estimated_tokens)
+            if not self._should_retry(slide, response):
+                break
+            slide['max_tokens'] = self.max_tokens
+            reserved = 0
+            yield {'event': 'reset'}
+        
+        analysis = self._finish_slide(slide, response.choices[0].message.content, time.perf_counter() - started)
+        yield {'event': 'done', 'analysis': analysis, 'ttft': ttft, 'cached': False}
+    
+    def analyze_image_group(self, image_paths: List[Path]) -> List[Optional[str]]:
+        """
+        Анализ нескольких слайдов одним запросом.
+        
+        Слайды из кэша в запрос не попадают. Ответ делится по разделителям
+        "=== СЛАЙД N ==="; слайды, для которых раздел не найден или пуст,
+        анализируются отдельными запросами через analyze_image. Анализ в
+        дешевом режиме кэшируется под отдельным ключом, как в _prepare_slide.
+        """
+        analyses, cache_keys, pending = self._group_from_cache(image_paths)
+        
+        if len(pending) > 1:
+            try:
+                sections, degraded_model = self._request_slide_group([image_bytes for _, image_bytes in pending])
+                self._apply_group_sections(analyses, cache_keys, pending, sections, degraded_model)
+            except TokenBudgetExhaustedError:
+                raise
+            except Exception as e:
+                self.logger.error("Ошибка при групповом анализе %s слайдов: %s", len(pending), e)
+        
+        # Запасной вариант: отдельный запрос для каждого неразобранного слайда
+        for idx in self._group_fallbacks(image_paths, analyses, pending):
+            analyses[idx] = self.analyze_image(image_paths[idx])
+        
+        return analyses
+    
+    def _request_slide_group(self, images: List[bytes]) -> Tuple[Dict[int, str], Optional[str]]:
+        """
+        Один запрос с несколькими изображениями; возвращает разделы ответа по
+        номеру слайда и модель дешевого режима (None, если запрос не удешевлен)
+        """
+        group = self._prepare_slide_group(images)
+        started = time.perf_counter()
+        with metrics.span('api_request'):
+            response = self._request('group', group['messages'], group['max_tokens'], group['estimated_tokens'],
+                                     model=group['model'], reserved=group['reserved'], slides=len(images))
+        return self._finish_slide_group(group, response, time.perf_counter() - started)
+    
+    def _request(self, kind: str, messages: List[Dict[str, Any]], max_tokens: int, estimated_tokens: int,
+                 model: Optional[str] = None, reserved: int = 0, slides: int = 0):
+        """
+        Запрос chat.completions через планировщик. Расход из usage идет в
+        статистику длины ответов (вид kind) и в бюджет текущей колоды.
+        """
+        try:
+            response = self.scheduler.call(
+                self.client.chat.completions.create,
+                estimated_tokens=estimated_tokens,
+                model=model or self.model,
                 messages=messages,
-                max_tokens=self.max_tokens
+                max_tokens=max_tokens
             )
-            
-            analysis = response.choices[0].message.content
-            if analysis:
-                self.logger.info(f"Получен анализ длиной {len(analysis)} символов")
-            else:
-                self.logger.warning("Получен пустой анализ")
-            return analysis
-            
-        except Exception as e:
-            self.logger.error(f"Ошибка при анализе изображения: {str(e)}")
-            return None 
\ No newline at end of file
+        except Exception:
+            self._release(reserved)
+            raise
+        self._account(response, kind, slides, reserved, estimated_tokens)
+        return response
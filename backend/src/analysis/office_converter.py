@@ -0,0 +1,302 @@
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics
+
+__all__ = ['OfficeConverter', 'OfficeConversionError', 'get_office_converter', 'OFFICE_EXTENSIONS']
+
+# Форматы, которые перед рендерингом конвертируются в PDF
+OFFICE_EXTENSIONS = ('.ppt', '.pptx')
+
+_shared_converter = None
+_shared_converter_lock = threading.Lock()
+
+def get_office_converter() -> 'OfficeConverter':
+    """Общий для процесса пул LibreOffice (процессы soffice останавливаются при выходе)"""
+    global _shared_converter
+    with _shared_converter_lock:
+        if _shared_converter is None:
+            _shared_converter = OfficeConverter()
+            atexit.register(_shared_converter.close)
+        return _shared_converter
+
+class OfficeConversionError(Exception):
+    """Не удалось конвертировать презентацию в PDF"""
+
+def _import_uno():
+    """
+    Модуль uno необязателен: без него конвертация идет через запуск soffice.
+
+    uno не ставится через pip (пакет PyPI с тем же именем - другой проект):
+    это python3-uno из пакетов LibreOffice системы.
+    """
+    try:
+        import uno
+        return uno
+    except ImportError:
+        return None
+
+class _OfficeWorker:
+    """
+    Прогретый процесс soffice --headless со своим профилем пользователя.
+
+    Если доступен uno, документы открываются и сохраняются в PDF через
+    UNO-соединение по именованному каналу. Иначе вызывается
+    soffice --convert-to с тем же профилем: LibreOffice передает задание
+    процессу, уже работающему с этим профилем, если тот принимает команды.
+    Выигрыш пула без uno зависит от версии LibreOffice и проверяется
+    backend.benchmarks.bench_office_convert.
+    """
+    def __init__(self, index: int, soffice: str, profile_root: Path, start_timeout: float):
+        self.logger = logging.getLogger(__name__)
+        self.index = index
+        self.soffice = soffice
+        self.profile_dir = profile_root / f"worker_{index}"
+        self.pipe_name = f"designanalyzer_{os.getpid()}_{index}"
+        self.start_timeout = start_timeout
+        self.process = None
+        self.desktop = None
+        self.conversions = 0
+
+    @property
+    def profile_arg(self) -> str:
+        return f"-env:UserInstallation={self.profile_dir.resolve().as_uri()}"
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Запуск soffice и (при наличии uno) подключение к нему"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [self.soffice, '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+             '--nolockcheck', self.profile_arg,
+             f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        self.conversions = 0
+
+        uno = _import_uno()
+        if uno is not None:
+            self.desktop = self._connect(uno)
+        elif self.index == 0:
+            self.logger.warning("Модуль uno недоступен (python3-uno): конвертация через soffice --convert-to")
+        metrics.inc('office_worker_starts_total')
+        self.logger.info("Процесс LibreOffice %s запущен за %.2f с (%s)",
+                         self.index, time.perf_counter() - started, 'UNO' if self.desktop is not None else 'convert-to')
+
+    def _connect(self, uno):
+        """Подключение к soffice по UNO с повторами до start_timeout"""
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context)
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                return context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+            except Exception as e:
+                if not self.alive() or time.monotonic() > deadline:
+                    self.stop()
+                    raise OfficeConversionError(f"LibreOffice не запустился: {str(e)}")
+                time.sleep(0.2)
+
+    def stop(self):
+        """Остановка процесса soffice вместе с дочерними"""
+        self.desktop = None
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                self.process.kill()
+        self.process.wait()
+        self.process = None
+
+    def convert(self, source: Path, out_dir: Path, timeout: float) -> Path:
+        """Конвертация source в PDF внутри out_dir; при превышении timeout процесс останавливается"""
+        if not self.alive():
+            self.start()
+        self.conversions += 1
+        if self.desktop is not None:
+            return self._convert_uno(source, out_dir, timeout)
+
+        try:
+            subprocess.run(
+                [self.soffice, '--headless', self.profile_arg, '--convert-to', 'pdf',
+                 '--outdir', str(out_dir), str(source)],
+                stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout, check=True
+            )
+        except subprocess.TimeoutExpired:
+            raise OfficeConversionError(f"Конвертация {source.name} превысила {timeout} с")
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise OfficeConversionError(f"Ошибка конвертации {source.name}: {str(e)}")
+
+        target = out_dir / f"{source.stem}.pdf"
+        if not target.exists():
+            raise OfficeConversionError(f"LibreOffice не создал PDF для {source.name}")
+        return target
+
+    def _convert_uno(self, source: Path, out_dir: Path, timeout: float) -> Path:
+        from com.sun.star.beans import PropertyValue
+
+        def properties(**values):
+            result = []
+            for name, value in values.items():
+                prop = PropertyValue()
+                prop.Name, prop.Value = name, value
+                result.append(prop)
+            return tuple(result)
+
+        target = out_dir / f"{source.stem}.pdf"
+        # Зависший документ не снять через UNO: останавливаем процесс целиком
+        watchdog = threading.Timer(timeout, self.stop)
+        watchdog.start()
+        try:
+            document = self.desktop.loadComponentFromURL(
+                source.resolve().as_uri(), '_blank', 0, properties(Hidden=True, ReadOnly=True))
+            try:
+                document.storeToURL(target.resolve().as_uri(), properties(FilterName='impress_pdf_Export'))
+            finally:
+                document.close(True)
+        except Exception as e:
+            if not watchdog.is_alive():
+                raise OfficeConversionError(f"Конвертация {source.name} превысила {timeout} с")
+            raise OfficeConversionError(f"Ошибка конвертации {source.name}: {str(e)}")
+        finally:
+            watchdog.cancel()
+        return target
+
+class OfficeConverter:
+    """
+    Конвертация PPT/PPTX в PDF пулом прогретых процессов LibreOffice.
+
+    Число процессов (size) ограничивает одновременные конвертации, остальные
+    ждут свободный процесс не дольше timeout. Результаты кэшируются на
+    диске по SHA-256 исходного файла; одинаковые файлы, загруженные
+    одновременно, конвертируются один раз.
+    """
+    def __init__(self, size: Optional[int] = None, timeout: Optional[float] = None,
+                 cache_dir: Optional[str | Path] = None, soffice: Optional[str] = None,
+                 start_timeout: Optional[float] = None, max_cached: Optional[int] = None,
+                 max_conversions_per_worker: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.size = max(1, size or config.OFFICE_POOL_SIZE)
+        self.timeout = timeout or config.OFFICE_CONVERT_TIMEOUT
+        self.cache_dir = Path(cache_dir or config.OFFICE_CACHE_DIR)
+        self.max_cached = max_cached if max_cached is not None else config.OFFICE_CACHE_MAX_FILES
+        # Перезапуск процесса после N конвертаций: LibreOffice со временем накапливает память
+        self.max_conversions_per_worker = (max_conversions_per_worker if max_conversions_per_worker is not None
+                                           else config.OFFICE_MAX_CONVERSIONS_PER_WORKER)
+        soffice = soffice or config.SOFFICE_PATH
+        start_timeout = start_timeout or config.OFFICE_START_TIMEOUT
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._workers = [_OfficeWorker(index, soffice, self.cache_dir / 'profiles', start_timeout)
+                         for index in range(self.size)]
+        # LIFO: следующая конвертация достается последнему (уже прогретому) процессу
+        self._idle = queue.LifoQueue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._lock = threading.Lock()
+        # Блокировка и число ожидающих по хэшу файла; запись живет, пока файл конвертируется
+        self._key_locks: Dict[str, List] = {}
+
+    def prewarm(self):
+        """Запуск всех процессов пула заранее"""
+        for worker in self._workers:
+            if not worker.alive():
+                worker.start()
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+
+    @staticmethod
+    def file_hash(path: str | Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source_file:
+            for chunk in iter(lambda: source_file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def cached_path(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}.pdf"
+
+    def convert(self, source: str | Path) -> Path:
+        """PDF для презентации: из кэша или после конвертации свободным процессом пула"""
+        source = Path(source)
+        digest = self.file_hash(source)
+        target = self.cached_path(digest)
+
+        with self._key_lock(digest):
+            if target.exists():
+                os.utime(target)
+                metrics.inc('office_cache_hits_total')
+                self.logger.info("PDF для %s найден в кэше конвертации", source.name)
+                return target
+            metrics.inc('office_cache_misses_total')
+
+            try:
+                worker = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                metrics.inc('office_conversion_errors_total')
+                raise OfficeConversionError(f"Нет свободного процесса LibreOffice за {self.timeout} с")
+
+            try:
+                if worker.conversions >= self.max_conversions_per_worker:
+                    worker.stop()
+                with tempfile.TemporaryDirectory(dir=self.cache_dir) as out_dir, metrics.span('office_convert'):
+                    converted = worker.convert(source, Path(out_dir), self.timeout)
+                    os.replace(converted, target)
+            except Exception:
+                # Процесс мог зависнуть на документе: следующий запрос запустит новый
+                worker.stop()
+                metrics.inc('office_conversion_errors_total')
+                raise
+            finally:
+                self._idle.put(worker)
+
+        self.logger.info("Презентация %s конвертирована в PDF: %s", source.name, target)
+        self._prune()
+        return target
+
+    @contextmanager
+    def _key_lock(self, digest: str) -> Iterator[None]:
+        """Одна конвертация на хэш файла; блокировка удаляется, когда ее никто не ждет"""
+        with self._lock:
+            entry = self._key_locks.setdefault(digest, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[digest]
+
+    def _prune(self):
+        """Удаление давно не использованных PDF сверх max_cached"""
+        if not self.max_cached:
+            return
+        cached = sorted(self.cache_dir.glob('*.pdf'), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in cached[self.max_cached:]:
+            try:
+                path.unlink()
+            except OSError as e:
+                self.logger.error("Ошибка при удалении %s: %s", path, e)
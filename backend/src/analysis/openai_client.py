@@ -0,0 +1,68 @@
+import logging
+import threading
+from typing import Any
+from backend.src.utils.config import config
+
+__all__ = ['get_openai_client', 'build_openai_client', 'get_async_openai_client', 'build_async_openai_client']
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+_shared_async_client = None
+
+def _connection_limits() -> Any:
+    """Лимиты пула соединений httpx, на котором построен клиент openai"""
+    import httpx
+    
+    return httpx.Limits(
+        max_connections=config.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def build_openai_client(**kwargs) -> Any:
+    """
+    Клиент OpenAI с настроенным пулом соединений.
+    
+    Пакет openai импортируется здесь, а не на уровне модуля: его импорт
+    занимает около секунды и замедлял бы запуск каждого рабочего процесса.
+    Повторы выполняет планировщик запросов, поэтому встроенные повторы отключены.
+    """
+    import openai
+    
+    kwargs.setdefault('max_retries', 0)
+    kwargs.setdefault('http_client', openai.DefaultHttpxClient(limits=_connection_limits()))
+    return openai.OpenAI(**kwargs)
+
+def build_async_openai_client(**kwargs) -> Any:
+    """Клиент AsyncOpenAI с тем же пулом соединений (для асинхронного режима сервера)"""
+    import openai
+    
+    kwargs.setdefault('max_retries', 0)
+    kwargs.setdefault('http_client', openai.DefaultAsyncHttpxClient(limits=_connection_limits()))
+    return openai.AsyncOpenAI(**kwargs)
+
+def get_openai_client() -> Any:
+    """Общий для процесса клиент: все анализаторы используют один пул соединений"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = build_openai_client()
+            logging.getLogger(__name__).info(
+                "Создан клиент OpenAI: до %s соединений, keep-alive %s на %s с",
+                config.OPENAI_MAX_CONNECTIONS, config.OPENAI_MAX_KEEPALIVE_CONNECTIONS, config.OPENAI_KEEPALIVE_EXPIRY
+            )
+        return _shared_client
+
+def get_async_openai_client() -> Any:
+    """
+    Общий асинхронный клиент. Соединения его пула привязаны к циклу событий,
+    поэтому в процессе должен работать один цикл (рабочий процесс ASGI-сервера).
+    """
+    global _shared_async_client
+    with _shared_client_lock:
+        if _shared_async_client is None:
+            _shared_async_client = build_async_openai_client()
+            logging.getLogger(__name__).info(
+                "Создан асинхронный клиент OpenAI: до %s соединений", config.OPENAI_MAX_CONNECTIONS
+            )
+        return _shared_async_client
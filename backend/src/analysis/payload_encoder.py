@@ -0,0 +1,109 @@
+import base64
+import io
+import logging
+import math
+from typing import Dict, Any, Optional, Tuple
+from PIL import Image
+from backend.src.utils.config import config
+
+__all__ = ['PayloadEncoder', 'EncodedPayload', 'estimate_vision_tokens']
+
+# Формат сохранения PIL и MIME-тип для каждого поддерживаемого формата
+FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+    'png': ('PNG', 'image/png'),
+}
+
+DETAIL_LEVELS = ('low', 'high', 'auto')
+
+def estimate_vision_tokens(size: Tuple[int, int], detail: str = 'high') -> int:
+    """
+    Оценка стоимости изображения в токенах по правилам OpenAI:
+    low - фиксированные 85 токенов; high - изображение вписывается в 2048x2048,
+    короткая сторона уменьшается до 768, далее 170 токенов за плитку 512x512 плюс 85.
+    """
+    if detail == 'low':
+        return 85
+    width, height = size
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+class EncodedPayload:
+    """
+    Изображение, подготовленное для отправки в API
+    """
+    def __init__(self, data: bytes, mime_type: str, size: Tuple[int, int], source_bytes: int):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.source_bytes = source_bytes
+    
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+class PayloadEncoder:
+    """
+    Кодирование слайда в компактное изображение для vision API.
+    
+    PNG, который видит пользователь, не меняется: для API создается отдельная
+    уменьшенная копия в JPEG/WebP с правильным MIME-типом.
+    """
+    def __init__(self, max_side: Optional[int] = None, image_format: Optional[str] = None,
+                 quality: Optional[int] = None, detail: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_side = max_side or config.API_IMAGE_MAX_SIDE
+        self.image_format = (image_format or config.API_IMAGE_FORMAT).lower()
+        self.quality = quality or config.JPEG_QUALITY
+        self.detail = (detail or config.API_IMAGE_DETAIL).lower()
+        
+        if self.image_format not in FORMATS:
+            raise ValueError(f"Неподдерживаемый формат изображения для API: {self.image_format}")
+        if self.detail not in DETAIL_LEVELS:
+            raise ValueError(f"Неподдерживаемый уровень детализации: {self.detail}")
+    
+    def cache_key_parts(self) -> Tuple[Any, ...]:
+        """Параметры кодирования, влияющие на результат анализа"""
+        return (self.image_format, self.max_side, self.quality, self.detail)
+    
+    def fitted_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Размер изображения после уменьшения до max_side (без кодирования)"""
+        scale = min(1.0, self.max_side / max(size))
+        return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+    
+    def encode(self, image_bytes: bytes) -> EncodedPayload:
+        """Уменьшение и перекодирование изображения для API"""
+        pil_format, mime_type = FORMATS[self.image_format]
+        
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            # PNG, который уже помещается в лимит, отправляем как есть
+            if self.image_format == 'png' and max(image.size) <= self.max_side:
+                return EncodedPayload(image_bytes, mime_type, image.size, len(image_bytes))
+            
+            image.load()
+            if max(image.size) > self.max_side:
+                image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+            
+            if pil_format != 'PNG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            
+            buffer = io.BytesIO()
+            if pil_format == 'PNG':
+                image.save(buffer, pil_format)
+            else:
+                image.save(buffer, pil_format, quality=self.quality)
+            
+            return EncodedPayload(buffer.getvalue(), mime_type, image.size, len(image_bytes))
+    
+    def image_content(self, payload: EncodedPayload, detail: Optional[str] = None) -> Dict[str, Any]:
+        """Блок image_url для сообщения chat.completions"""
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": payload.data_url(),
+                "detail": detail or self.detail
+            }
+        }
@@ -1,30 +1,67 @@
+import contextvars
+import hashlib
+import json
 import logging
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait as wait_futures
 from pathlib import Path
-from typing import List
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 import pdf2image
 from PIL import Image
 import os
 from backend.src.utils.config import config
+from backend.src.analysis.deck_events import (DeckEvents, slide_result, slide_url, ANALYSIS_ERROR_PREFIX,
+                                              ANALYSIS_EMPTY_PLACEHOLDER, ANALYSIS_SKIPPED_PLACEHOLDER)
 from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.office_converter import get_office_converter, OFFICE_EXTENSIONS
+from backend.src.analysis.rasterizer import PDFRasterizer
+from backend.src.analysis.slide_artifact import SlideArtifact, wait_saved
+from backend.src.analysis.text_layer import PageText, extract_text_layer
+from backend.src.analysis.token_budget import TokenBudget, TokenBudgetExhaustedError, budget_context
+from backend.src.utils.logs import log_context
+from backend.src.utils.metrics import metrics
 
 __all__ = ['process_pdf']
 
+# Допустимый идентификатор документа: хэш содержимого или id задачи
+DOC_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Текстовый слой документа рядом со слайдами: для анализа отдельного слайда
+TEXT_LAYER_FILENAME = 'text_layer.json'
+
+_shared_processor = None
+_shared_processor_lock = threading.Lock()
+
 def process_pdf(pdf_path):
-    processor = PDFProcessor()
-    return processor.process_pdf(pdf_path)
+    # Общий экземпляр: у каждого PDFProcessor свой пул процессов рендеринга
+    global _shared_processor
+    with _shared_processor_lock:
+        if _shared_processor is None:
+            _shared_processor = PDFProcessor()
+    return _shared_processor.process_pdf(pdf_path)
 
 class PDFProcessor:
     """
     Класс для обработки PDF файлов и конвертации их в изображения
     """
-    def __init__(self):
+    def __init__(self, image_analyzer: Optional[ImageAnalyzer] = None, slides_dir: Optional[str | Path] = None):
         self.logger = logging.getLogger(__name__)
         self.temp_dir = Path(config.TEMP_DIR)
         self.output_dir = Path(os.path.join('backend', 'output'))
-        self.slides_dir = self.output_dir / 'slides'
+        # Папка слайдов документов; на общем томе - общая для экземпляров приложения
+        self.slides_dir = Path(slides_dir) if slides_dir else self.output_dir / 'slides'
         self.max_file_size = config.max_file_size_bytes
         self.jpeg_quality = config.JPEG_QUALITY
-        self.image_analyzer = ImageAnalyzer()
+        self.image_analyzer = image_analyzer or ImageAnalyzer()
+        self.max_concurrent_analyses = max(1, config.MAX_CONCURRENT_ANALYSES)
+        self.analysis_batch_size = max(1, config.ANALYSIS_BATCH_SIZE)
+        self.dedup_enabled = config.SLIDE_DEDUP_ENABLED
+        self.text_layer_enabled = config.TEXT_LAYER_ENABLED
+        self.deck_summary_enabled = config.DECK_SUMMARY_ENABLED
+        self.deck_refine_enabled = config.DECK_REFINE_ENABLED
         
         # Создаем необходимые директории
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -32,48 +69,123 @@ class PDFProcessor:
         
         # Параметры для обработки изображений
         self.max_resolution = (2000, 2000)
+        self.rasterizer = PDFRasterizer(max_resolution=self.max_resolution)
         self.current_pdf = None
         self.images = []
     
-    def process_pdf(self, pdf_path: str | Path) -> List[Path]:
+    def process_pdf(self, pdf_path: str | Path, doc_id: Optional[str] = None) -> List[Path]:
         """Обработка PDF файла и конвертация страниц в изображения"""
         try:
-            pdf_path = Path(pdf_path)
-            if not pdf_path.exists():
-                raise FileNotFoundError(f"Файл не найден: {pdf_path}")
-            
-            # Очищаем старые файлы
-            for old_file in self.slides_dir.glob("*.png"):
-                old_file.unlink()
-            
-            # Конвертируем PDF в изображения
-            images = pdf2image.convert_from_path(str(pdf_path))
-            processed_images = []
-            
-            for idx, image in enumerate(images, 1):
-                # Сохраняем изображение
-                output_path = self.slides_dir / f"slide_{idx}.png"
-                
-                # Изменяем размер если необходимо
-                if image.size[0] > self.max_resolution[0] or image.size[1] > self.max_resolution[1]:
-                    image.thumbnail(self.max_resolution, Image.Resampling.LANCZOS)
-                
-                image.save(str(output_path), "PNG", optimize=True)
-                processed_images.append(output_path)
-                self.logger.info(f"Сохранен слайд {idx}: {output_path}")
-                
-                # Проверяем что файл действительно создан
-                if not output_path.exists():
-                    raise FileNotFoundError(f"Не удалось сохранить файл: {output_path}")
+            pdf_path = self.ensure_pdf(pdf_path)
+            with metrics.span('process_pdf'):
+                # Пути, а не артефакты: байты всей колоды в памяти не держим
+                processed_images = [Path(artifact) for _, artifact in self.iter_pdf(pdf_path, doc_id=doc_id)]
             
             # Сохраняем список обработанных изображений
             self.images = processed_images
             return processed_images
             
         except Exception as e:
-            self.logger.error(f"Ошибка при обработке PDF: {str(e)}")
+            self.logger.error("Ошибка при обработке PDF: %s", e)
             raise
     
+    def ensure_pdf(self, path: str | Path) -> Path:
+        """PDF для рендеринга: презентации PowerPoint конвертируются пулом LibreOffice"""
+        path = Path(path)
+        if path.suffix.lower() in OFFICE_EXTENSIONS:
+            return get_office_converter().convert(path)
+        return path
+    
+    def get_page_count(self, pdf_path: str | Path) -> int:
+        """Количество страниц в PDF"""
+        info = pdf2image.pdfinfo_from_path(str(pdf_path))
+        return int(info['Pages'])
+    
+    def document_id(self, pdf_path: str | Path) -> str:
+        """
+        Идентификатор документа по хэшу его содержимого и параметров рендеринга.
+        
+        Содержимое папки документа однозначно определяется идентификатором,
+        поэтому слайды можно кэшировать в браузере как неизменяемые.
+        """
+        digest = hashlib.sha256(self.rasterizer.render_signature().encode('utf-8'))
+        with open(pdf_path, 'rb') as pdf_file:
+            for chunk in iter(lambda: pdf_file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:32]
+    
+    def document_dir(self, doc_id: str) -> Path:
+        """Папка слайдов отдельного документа"""
+        if not DOC_ID_PATTERN.match(doc_id):
+            raise ValueError(f"Неверный идентификатор документа: {doc_id}")
+        return self.slides_dir / doc_id
+    
+    def get_slide_path(self, doc_id: str, slide_number: int, variant: Optional[str] = None) -> Optional[Path]:
+        """
+        Путь к слайду документа или None, если его нет.
+        
+        variant - имя уменьшенной копии (thumb, preview); если копии нет
+        (слайд отрисован до ее появления), возвращается полный PNG.
+        """
+        if not DOC_ID_PATTERN.match(doc_id) or slide_number < 1:
+            return None
+        if variant and variant not in self.slide_variants:
+            return None
+        slide_path = self.document_dir(doc_id) / f"slide_{slide_number}.png"
+        if not slide_path.is_file():
+            return None
+        if variant:
+            variant_path = slide_path.with_name(self.rasterizer.variant_filename(slide_number, variant))
+            if variant_path.is_file():
+                return variant_path
+        return slide_path
+    
+    @property
+    def max_pending_groups(self) -> int:
+        """
+        Групп в пуле анализа (выполняются и ждут в очереди): по одной в
+        запасе на поток. Пока их столько, рендеринг следующих страниц ждет,
+        и артефакты в памяти не копятся при медленном API
+        """
+        return 2 * self.max_concurrent_analyses
+    
+    @property
+    def slide_variants(self) -> List[str]:
+        """Имена уменьшенных копий слайдов"""
+        return [name for name, _ in self.rasterizer.variants]
+    
+    @staticmethod
+    def slide_url(doc_id: str, slide_number: int) -> str:
+        """Относительный URL слайда для маршрута /slides/<doc_id>/<n>"""
+        return slide_url(doc_id, slide_number)
+    
+    def deck_events(self, doc_id: str, total_slides: int) -> DeckEvents:
+        """Последовательность событий колоды с настройками процессора (группы, дедупликация, сводка)"""
+        return DeckEvents(doc_id, total_slides, self.analysis_batch_size, dedup=self.dedup_enabled,
+                          summary=self.deck_summary_enabled, refine=self.deck_refine_enabled)
+    
+    def iter_pdf(self, pdf_path: str | Path, total_pages: Optional[int] = None,
+                 doc_id: Optional[str] = None) -> Iterator[Tuple[int, SlideArtifact]]:
+        """
+        Постраничная конвертация PDF: каждый слайд отдается артефактом в
+        памяти сразу после кодирования, файлы для /slides пишутся в фоне
+        """
+        pdf_path = Path(pdf_path)
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"Файл не найден: {pdf_path}")
+        
+        # У каждого документа своя папка, параллельные анализы не мешают друг другу
+        document_dir = self.document_dir(doc_id or self.document_id(pdf_path))
+        document_dir.mkdir(parents=True, exist_ok=True)
+        
+        if total_pages is None:
+            total_pages = self.get_page_count(pdf_path)
+        
+        # Страницы рендерятся диапазонами на пуле процессов
+        for idx, artifact in self.rasterizer.iter_pages(pdf_path, total_pages, document_dir):
+            self.logger.info("Отрисован слайд %s: %s (%s байт)", idx, artifact.path, len(artifact.data))
+            yield idx, artifact
+    
     def _process_image(self, image: Image.Image, idx: int) -> Path:
         """Обработка отдельного изображения"""
         # Изменяем размер если необходимо
@@ -84,7 +196,7 @@ class PDFProcessor:
         image.save(
             str(output_path),
             "PNG",
-            optimize=True
+            compress_level=config.PNG_COMPRESS_LEVEL
         )
         
         return output_path
@@ -109,7 +221,23 @@ class PDFProcessor:
             
             self.logger.info("Временные файлы успешно очищены")
         except Exception as e:
-            self.logger.error(f"Ошибка при очистке временных файлов: {str(e)}")
+            self.logger.error("Ошибка при очистке временных файлов: %s", e)
+
+    def cleanup_expired_slides(self, max_age_seconds: float) -> int:
+        """Удаление папок документов, не изменявшихся дольше max_age_seconds"""
+        deadline = time.time() - max_age_seconds
+        removed = 0
+        for document_dir in self.slides_dir.iterdir():
+            try:
+                if document_dir.is_dir() and document_dir.stat().st_mtime < deadline:
+                    shutil.rmtree(document_dir)
+                    removed += 1
+            except OSError as e:
+                self.logger.error("Ошибка при удалении слайдов %s: %s", document_dir, e)
+        
+        if removed:
+            self.logger.info("Удалено устаревших папок слайдов: %s", removed)
+        return removed
 
     def get_slide_image(self, slide_index: int) -> Path:
         """Получение изображения конкретного слайда"""
@@ -118,57 +246,235 @@ class PDFProcessor:
         
         return self.images[slide_index]
 
-    def process_slides(self, pdf_path):
-        """Обработка и анализ всех слайдов"""
-        self.logger.info(f"Начинаем обработку PDF: {pdf_path}")
+    def process_slides(self, pdf_path, token_budget: Optional[int] = None):
+        """Обработка и анализ всех слайдов (с бюджетом токенов на колоду, если задан)"""
+        results = {}
+        total_slides = 0
         
-        # Сначала обрабатываем PDF в изображения
-        processed_images = self.process_pdf(pdf_path)
-        results = []
+        with metrics.span('process_slides'):
+            for event in self.iter_slides(pdf_path, token_budget=token_budget):
+                if event['event'] == 'started':
+                    total_slides = event['total_slides']
+                elif event['event'] in ('analyzed', 'refined'):
+                    results[event['slide_number']] = {k: v for k, v in event.items() if k != 'event'}
+                elif event['event'] == 'summary':
+                    self.logger.info("Темы презентации: %s", ', '.join(event['themes']))
+                elif event['event'] == 'budget':
+                    self.logger.info("Бюджет токенов: потрачено %s из %s, в дешевом режиме запросов: %s, "
+                                     "сэкономлено ~%s токенов",
+                                     event['spent'], event['limit'], event['degraded_requests'], event['saved_tokens'])
+                elif event['event'] == 'deduplicated' and event['saved_calls']:
+                    self.logger.info("Дедупликация сэкономила запросов к API: %s", event['saved_calls'])
         
-        if not processed_images:
+        if not total_slides:
             self.logger.error("Не удалось получить изображения из PDF")
             return []
         
-        self.logger.info(f"Получено {len(processed_images)} изображений для анализа")
+        self.logger.info("Обработано слайдов: %s, получено результатов: %s", total_slides, len(results))
+        
+        # Проверяем соответствие количества результатов и слайдов
+        if len(results) != total_slides:
+            self.logger.error("Несоответствие количества результатов (%s) и слайдов (%s)", len(results), total_slides)
+        
+        return [results[number] for number in sorted(results)]
+
+    def iter_slides(self, pdf_path, doc_id: Optional[str] = None, context: Optional[str] = None,
+                    token_budget: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковая обработка слайдов.
+        
+        Генерирует события:
+        - started: известны идентификатор документа и количество слайдов
+        - rendered: PNG слайда сохранен и доступен по image_path (анализ
+          слайда к этому моменту уже запущен по байтам в памяти)
+        - analyzed: получен анализ слайда (или заглушка при ошибке); у почти
+          одинаковых слайдов анализ общий, shared_with - номер слайда-представителя
+        - deduplicated: итог дедупликации и число сэкономленных запросов
+        - summary: сводка по колоде для аудитории context (темы, концепции,
+          резюме, несогласованные слайды) - один запрос после всех слайдов
+        - refined: уточненный анализ несогласованного слайда (refined: true)
+        - budget: расход бюджета token_budget (если задан), число запросов
+          в дешевом режиме и оценка сэкономленных токенов
+        
+        Анализ слайда начинается сразу после его рендеринга, параллельно
+        с конвертацией остальных страниц. При analysis_batch_size > 1 слайды
+        отправляются на анализ группами. Текстовый слой PDF извлекается один
+        раз на документ и передается в анализ отдельных слайдов.
+        """
+        self.logger.info("Начинаем обработку PDF: %s", pdf_path)
+        
+        pdf_path = self.ensure_pdf(pdf_path)
+        doc_id = doc_id or self.document_id(pdf_path)
+        events = self.deck_events(doc_id, self.get_page_count(pdf_path))
+        yield events.started()
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrent_analyses, thread_name_prefix='slide-analysis')
+        text_layer = self._submit_text_layer(executor, pdf_path, doc_id) if self.text_layer_enabled else None
+        budget = TokenBudget(token_budget) if token_budget else None
+        pending = set()
+        try:
+            for slide_number, image in self.iter_pdf(pdf_path, events.total_slides, doc_id):
+                # Почти одинаковые слайды не анализируем повторно
+                events.add_slide(slide_number, image)
+                
+                # Анализ запускается по байтам в памяти, не дожидаясь записи на диск
+                group = events.take_group()
+                if group:
+                    yield from self._wait_pending(pending, events)
+                    pending.add(self._submit_group(executor, group, text_layer, budget))
+                
+                wait_saved(image)
+                yield from events.rendered(slide_number)
+                
+                # Отдаем уже готовые анализы, не дожидаясь конца рендеринга
+                for future in [f for f in pending if f.done()]:
+                    pending.discard(future)
+                    yield from events.analyzed(future.result())
+            
+            group = events.take_group(final=True)
+            if group:
+                pending.add(self._submit_group(executor, group, text_layer, budget))
+            for future in as_completed(pending):
+                yield from events.analyzed(future.result())
+            pending.clear()
+            
+            yield events.deduplicated()
+            
+            # Вторая фаза: сводка по колоде одним запросом вместо обновления
+            # контекста после каждого слайда
+            yield from self._deck_pass(executor, events, context, budget)
+            if budget:
+                yield {'event': 'budget', **budget.to_dict()}
+        finally:
+            # Если клиент отключился, не запускаем оставшиеся запросы
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _deck_pass(self, executor: ThreadPoolExecutor, events: DeckEvents, context: Optional[str],
+                   budget: Optional[TokenBudget] = None) -> Iterator[Dict[str, Any]]:
+        """События summary и refined: сводка по готовым анализам и уточнение несогласованных слайдов"""
+        # Сводка и уточнение не отправляются, если бюджет колоды исчерпан
+        analyses = events.summary_request(budget)
+        if analyses is None:
+            return
+        deck = budget_context(budget).run(self.image_analyzer.summarize_deck, analyses, context)
+        if deck is None:
+            return
+        yield events.summary(deck)
+        
+        futures = [
+            (number, executor.submit(budget_context(budget).run, self.image_analyzer.refine_slide_analysis,
+                                     number, analysis, deck, context))
+            for number, analysis in events.refine_requests(self.image_analyzer.refine_max_slides, budget)
+        ]
+        for number, future in futures:
+            yield from events.refined(future.result(), number)
+    
+    def _wait_pending(self, pending: set, events: DeckEvents) -> Iterator[Dict[str, Any]]:
+        """Ожидание места в пуле анализа (max_pending_groups) с отдачей готовых анализов"""
+        while len(pending) >= self.max_pending_groups:
+            done, _ = wait_futures(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                yield from events.analyzed(future.result())
+    
+    def analyze_images(self, image_paths: List[Path]) -> List[Dict[str, Any]]:
+        """Параллельный анализ слайдов с ограничением числа одновременных запросов"""
+        if not image_paths:
+            return []
+        
+        slides = list(enumerate(image_paths, 1))
+        groups = [slides[i:i + self.analysis_batch_size] for i in range(0, len(slides), self.analysis_batch_size)]
+        workers = min(self.max_concurrent_analyses, len(groups))
+        self.logger.info("Анализ %s слайдов, запросов: %s, одновременных: %s", len(image_paths), len(groups), workers)
         
-        for i, image_path in enumerate(processed_images, 1):
+        # Futures собираются в порядке групп, а результаты внутри группы - в
+        # порядке ее слайдов, поэтому итог упорядочен по slide_number
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='slide-analysis') as executor:
+            futures = [self._submit_group(executor, group) for group in groups]
+            return [result for future in futures for result in future.result()]
+
+    def _submit_text_layer(self, executor: ThreadPoolExecutor, pdf_path, doc_id: Optional[str] = None) -> Future:
+        """Извлечение текстового слоя в пуле анализа: первые слайды ждут его, рендеринг - нет"""
+        return executor.submit(contextvars.copy_context().run, self.extract_text_layer, pdf_path, doc_id)
+    
+    def extract_text_layer(self, pdf_path, doc_id: Optional[str] = None) -> Dict[int, PageText]:
+        """
+        Текстовый слой страниц. С doc_id он сохраняется в папку документа:
+        отдельный слайд (get_page_text) анализируется с тем же текстом, что и в колоде.
+        """
+        with metrics.span('text_layer'):
+            pages = extract_text_layer(pdf_path)
+        if doc_id and pages:
+            try:
+                document_dir = self.document_dir(doc_id)
+                document_dir.mkdir(parents=True, exist_ok=True)
+                temp_path = document_dir / f"{TEXT_LAYER_FILENAME}.{os.getpid()}.{threading.get_ident()}.tmp"
+                temp_path.write_text(json.dumps({number: page.to_dict() for number, page in pages.items()},
+                                                ensure_ascii=False), encoding='utf-8')
+                temp_path.replace(document_dir / TEXT_LAYER_FILENAME)
+            except OSError as e:
+                self.logger.error("Не удалось сохранить текстовый слой документа %s: %s", doc_id, e)
+        return pages
+    
+    def get_page_text(self, doc_id: str, slide_number: int) -> Optional[PageText]:
+        """Текстовый слой слайда, сохраненный при анализе колоды, или None"""
+        if not DOC_ID_PATTERN.match(doc_id):
+            return None
+        try:
+            pages = json.loads((self.document_dir(doc_id) / TEXT_LAYER_FILENAME).read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.error("Не удалось прочитать текстовый слой документа %s: %s", doc_id, e)
+            return None
+        page = pages.get(str(slide_number))
+        return PageText.from_dict(page) if page else None
+
+    def _submit_group(self, executor: ThreadPoolExecutor, group: List[Tuple[int, Path]],
+                      text_layer: Optional[Future] = None, budget: Optional[TokenBudget] = None):
+        """Запуск анализа группы в пуле с контекстом вызывающего потока (разбивка по этапам) и бюджетом колоды"""
+        return executor.submit(budget_context(budget).run, self._analyze_group, group, text_layer)
+
+    def _analyze_group(self, group: List[Tuple[int, Path]],
+                       text_layer: Optional[Future] = None) -> List[Dict[str, Any]]:
+        """Анализ группы слайдов одним запросом; одиночный слайд - обычным (с текстовым слоем)"""
+        if len(group) == 1:
+            slide_number, image_path = group[0]
+            page_text = text_layer.result().get(slide_number) if text_layer else None
+            return [self._analyze_slide(slide_number, image_path, page_text)]
+        
+        with log_context(doc_id=Path(group[0][1]).parent.name, slide=[slide_number for slide_number, _ in group]):
             try:
-                self.logger.info(f"Обработка слайда {i}/{len(processed_images)}: {image_path}")
+                analyses = self.image_analyzer.analyze_image_group([image_path for _, image_path in group])
+            except TokenBudgetExhaustedError as e:
+                return [slide_result(slide_number, image_path, error=e) for slide_number, image_path in group]
+            except Exception as e:
+                self.logger.error("Ошибка при групповом анализе слайдов: %s", e)
+                return [slide_result(slide_number, image_path, error=e) for slide_number, image_path in group]
+            
+            return [slide_result(slide_number, image_path, analysis)
+                    for (slide_number, image_path), analysis in zip(group, analyses)]
+
+    def _analyze_slide(self, slide_number: int, image_path: Path,
+                       page_text: Optional[PageText] = None) -> Dict[str, Any]:
+        """Анализ одного слайда с заглушкой при ошибке"""
+        # Номер слайда и документ - во всех записях лога анализа
+        with log_context(doc_id=Path(image_path).parent.name, slide=slide_number):
+            try:
+                self.logger.info("Обработка слайда %s: %s", slide_number, image_path)
                 
-                # Анализируем изображение
-                analysis = self.image_analyzer.analyze_image(str(image_path))
+                # Артефакт передается как есть: анализ берет байты из памяти
+                image = image_path if isinstance(image_path, SlideArtifact) else str(image_path)
                 
-                if analysis:
-                    result = {
-                        'slide_number': i,
-                        'analysis': analysis,
-                        'image_path': f"slides/slide_{i}.png"
-                    }
-                    results.append(result)
-                    self.logger.info(f"Слайд {i} успешно проанализирован")
+                # Анализируем изображение (и текст слайда, если он извлечен из PDF)
+                if page_text is not None:
+                    analysis = self.image_analyzer.analyze_image(image, page_text)
                 else:
-                    self.logger.warning(f"Пустой результат анализа для слайда {i}")
-                    # Добавляем заглушку для сохранения последовательности
-                    results.append({
-                        'slide_number': i,
-                        'analysis': "Не удалось проанализировать слайд",
-                        'image_path': f"slides/slide_{i}.png"
-                    })
+                    analysis = self.image_analyzer.analyze_image(image)
+                return slide_result(slide_number, image_path, analysis)
                     
+            except TokenBudgetExhaustedError as e:
+                return slide_result(slide_number, image_path, error=e)
             except Exception as e:
-                self.logger.error(f"Ошибка при обработке слайда {i}: {str(e)}")
-                # Добавляем информацию об ошибке в результаты
-                results.append({
-                    'slide_number': i,
-                    'analysis': f"Ошибка при анализе: {str(e)}",
-                    'image_path': f"slides/slide_{i}.png"
-                })
-        
-        self.logger.info(f"Обработано слайдов: {len(processed_images)}, получено результатов: {len(results)}")
-        
-        # Проверяем соответствие количества результатов и слайдов
-        if len(results) != len(processed_images):
-            self.logger.error(f"Несоответствие количества результатов ({len(results)}) и слайдов ({len(processed_images)})")
-        
-        return results
+                self.logger.error("Ошибка при обработке слайда %s: %s", slide_number, e)
+                return slide_result(slide_number, image_path, error=e)
@@ -0,0 +1,324 @@
+import io
+import logging
+import math
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait as wait_futures
+from itertools import islice
+from pathlib import Path
+from typing import List, Tuple, Iterator, Optional, Dict
+import pdf2image
+from PIL import Image
+from backend.src.analysis.slide_artifact import SlideArtifact, SlideWriter
+from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics
+
+__all__ = ['PDFRasterizer', 'render_page_range', 'parse_page_sizes', 'parse_variants', 'encode_variants',
+           'VARIANT_FORMATS']
+
+# Формат сохранения PIL, расширение и MIME-тип уменьшенных копий слайда
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+
+PAGE_SIZE_KEY = re.compile(r'^Page\s+(\d+)\s+size$')
+PAGE_ROT_KEY = re.compile(r'^Page\s+(\d+)\s+rot$')
+PAGE_SIZE_VALUE = re.compile(r'([\d.]+)\s*x\s*([\d.]+)\s*pts')
+
+def parse_page_sizes(info: Dict[str, str]) -> Dict[int, Tuple[float, float]]:
+    """
+    Размеры страниц в пунктах из вывода pdfinfo -f/-l.
+    
+    Для страниц, повернутых на 90/270 градусов, ширина и высота меняются местами.
+    """
+    sizes = {}
+    rotations = {}
+    for key, value in info.items():
+        size_match = PAGE_SIZE_KEY.match(key)
+        if size_match:
+            value_match = PAGE_SIZE_VALUE.search(str(value))
+            if value_match:
+                sizes[int(size_match.group(1))] = (float(value_match.group(1)), float(value_match.group(2)))
+            continue
+        rot_match = PAGE_ROT_KEY.match(key)
+        if rot_match:
+            try:
+                rotations[int(rot_match.group(1))] = int(str(value).strip()) % 360
+            except ValueError:
+                pass
+    
+    for page, (width, height) in sizes.items():
+        if rotations.get(page) in (90, 270):
+            sizes[page] = (height, width)
+    return sizes
+
+def parse_variants(spec: str) -> Tuple[Tuple[str, int], ...]:
+    """Разбор строки вида "thumb:320,preview:1024" в пары (имя, максимальная сторона)"""
+    variants = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, side = item.partition(':')
+        variants.append((name.strip(), int(side)))
+    return tuple(variants)
+
+def encode_variants(image: Image.Image, page_number: int, variants: Tuple[Tuple[str, int], ...],
+                    image_format: str, quality: int) -> Dict[str, bytes]:
+    """
+    Уменьшенные копии слайда для страниц результатов: имя файла
+    slide_<n>.<имя>.<ext> -> закодированные байты.
+    
+    Копии строятся от большей к меньшей, каждая из предыдущей, чтобы не
+    уменьшать полноразмерный слайд несколько раз.
+    """
+    pil_format, extension, _ = VARIANT_FORMATS[image_format]
+    source = image.convert('RGB')
+    encoded = {}
+    for name, max_side in sorted(variants, key=lambda variant: variant[1], reverse=True):
+        if max(source.size) > max_side:
+            source = source.copy()
+            source.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        source.save(buffer, pil_format, quality=quality)
+        encoded[f"slide_{page_number}.{name}.{extension}"] = buffer.getvalue()
+    return encoded
+
+def render_page_range(pdf_path: str, first_page: int, last_page: int, output_dir: str,
+                      dpi: float, max_resolution: Tuple[int, int],
+                      variants: Tuple[Tuple[str, int], ...] = (), variant_format: str = 'webp',
+                      variant_quality: int = 80,
+                      png_compress_level: int = 1) -> List[Tuple[SlideArtifact, Dict[str, float]]]:
+    """
+    Рендеринг диапазона страниц PDF в PNG и уменьшенные копии variants.
+    
+    Выполняется в процессе пула. pdftoppm пишет страницы во временную папку,
+    а в памяти одновременно находится только одна раскодированная страница:
+    она сразу уменьшается, кодируется в PNG (один раз, быстрым уровнем
+    сжатия) и освобождается. Результат - артефакты в памяти с путями в
+    output_dir; файлы пишет основной процесс (SlideWriter).
+    
+    Для каждой страницы возвращается время этапов; метрики процесса пула
+    недоступны основному процессу, поэтому их записывает вызывающая сторона.
+    """
+    output_dir_path = Path(output_dir)
+    rendered = []
+    with tempfile.TemporaryDirectory(prefix='pdf_render_') as raw_dir:
+        started = time.perf_counter()
+        raw_paths = pdf2image.convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            output_folder=raw_dir,
+            paths_only=True
+        )
+        
+        # Время pdftoppm делится поровну между страницами диапазона
+        render_seconds = (time.perf_counter() - started) / max(1, len(raw_paths))
+        
+        # Имена файлов pdftoppm содержат номер страницы с ведущими нулями
+        for page_number, raw_path in enumerate(sorted(raw_paths), first_page):
+            timings = {'pdf_render': render_seconds}
+            with Image.open(raw_path) as image:
+                started = time.perf_counter()
+                image.load()
+                timings['decode'] = time.perf_counter() - started
+                
+                # При рендеринге сразу в целевом разрешении уменьшение не требуется
+                started = time.perf_counter()
+                if image.size[0] > max_resolution[0] or image.size[1] > max_resolution[1]:
+                    image.thumbnail(max_resolution, Image.Resampling.LANCZOS)
+                timings['resize'] = time.perf_counter() - started
+                
+                started = time.perf_counter()
+                buffer = io.BytesIO()
+                image.save(buffer, "PNG", compress_level=png_compress_level)
+                timings['png_encode'] = time.perf_counter() - started
+                
+                started = time.perf_counter()
+                encoded_variants = encode_variants(image, page_number, variants, variant_format, variant_quality)
+                timings['variants_encode'] = time.perf_counter() - started
+                artifact = SlideArtifact(page_number, output_dir_path / f"slide_{page_number}.png",
+                                         buffer.getvalue(), image.size, encoded_variants)
+            
+            os.unlink(raw_path)
+            rendered.append((artifact, timings))
+    
+    return rendered
+
+class PDFRasterizer:
+    """
+    Конвертация PDF в изображения диапазонами страниц на пуле процессов.
+    
+    Потребление памяти не зависит от количества страниц: каждый процесс
+    держит в памяти одну страницу, диапазоны ограничены chunk_pages, а в
+    работе не больше workers диапазонов - следующий запускается, когда
+    потребитель забирает страницы готового.
+    
+    При target_size DPI каждой страницы вычисляется по ее размеру так, чтобы
+    страница сразу получалась не больше max_resolution, без последующего
+    уменьшения LANCZOS.
+    
+    Вместе с PNG кодируются уменьшенные копии variants (миниатюра и превью)
+    в формате variant_format. Слайды отдаются артефактами в памяти, файлы
+    для /slides пишутся в фоне.
+    """
+    def __init__(self, dpi: Optional[int] = None, workers: Optional[int] = None,
+                 chunk_pages: Optional[int] = None, max_resolution: Tuple[int, int] = (2000, 2000),
+                 target_size: Optional[bool] = None, variants: Optional[Tuple[Tuple[str, int], ...]] = None,
+                 variant_format: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.dpi = dpi or config.PDF_RENDER_DPI
+        self.target_size = config.PDF_RENDER_TARGET_SIZE if target_size is None else target_size
+        self.workers = max(1, workers or config.PDF_RENDER_WORKERS)
+        self.chunk_pages = max(1, chunk_pages or config.PDF_RENDER_CHUNK_PAGES)
+        self.max_resolution = max_resolution
+        self.variants = parse_variants(config.SLIDE_VARIANTS) if variants is None else tuple(variants)
+        self.variant_format = (variant_format or config.SLIDE_VARIANT_FORMAT).lower()
+        if self.variant_format not in VARIANT_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат копий слайда: {self.variant_format}")
+        self.variant_quality = config.SLIDE_VARIANT_QUALITY
+        self.png_compress_level = config.PNG_COMPRESS_LEVEL
+        self.writer = SlideWriter()
+        
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Общий пул процессов, создается при первом использовании"""
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn вместо fork: приложение многопоточное
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+    
+    def render_signature(self) -> str:
+        """Параметры, от которых зависит результат рендеринга (входят в идентификатор документа)"""
+        return (f"dpi={self.dpi};target={self.target_size};max={self.max_resolution[0]}x{self.max_resolution[1]};"
+                f"variants={self.variants};format={self.variant_format};quality={self.variant_quality};"
+                f"png={self.png_compress_level}")
+    
+    @property
+    def variant_mime_type(self) -> str:
+        return VARIANT_FORMATS[self.variant_format][2]
+    
+    def variant_filename(self, page_number: int, name: str) -> str:
+        """Имя файла уменьшенной копии слайда"""
+        return f"slide_{page_number}.{name}.{VARIANT_FORMATS[self.variant_format][1]}"
+    
+    def _render_args(self) -> Tuple:
+        return self.max_resolution, self.variants, self.variant_format, self.variant_quality, self.png_compress_level
+    
+    def target_dpi(self, page_size: Tuple[float, float]) -> float:
+        """DPI, при котором страница вписывается в max_resolution (не выше self.dpi)"""
+        width, height = page_size
+        if width <= 0 or height <= 0:
+            return float(self.dpi)
+        fit = 72 * min(self.max_resolution[0] / width, self.max_resolution[1] / height)
+        # Округляем вниз, чтобы размер страницы не превысил лимит из-за округления pdftoppm
+        return min(float(self.dpi), math.floor(fit * 100) / 100)
+    
+    def page_dpis(self, pdf_path: str | Path, total_pages: int) -> List[float]:
+        """DPI рендеринга для каждой страницы"""
+        if not self.target_size or total_pages < 1:
+            return [float(self.dpi)] * total_pages
+        
+        try:
+            info = pdf2image.pdfinfo_from_path(str(pdf_path), first_page=1, last_page=total_pages)
+            sizes = parse_page_sizes(info)
+        except Exception as e:
+            self.logger.warning("Не удалось получить размеры страниц, используем %s DPI: %s", self.dpi, e)
+            sizes = {}
+        
+        return [
+            self.target_dpi(sizes[page]) if page in sizes else float(self.dpi)
+            for page in range(1, total_pages + 1)
+        ]
+    
+    def page_ranges(self, total_pages: int, dpis: Optional[List[float]] = None) -> List[Tuple[int, int, float]]:
+        """
+        Разбиение страниц на диапазоны (first, last, dpi).
+        
+        Диапазон содержит не больше chunk_pages подряд идущих страниц с одинаковым DPI.
+        """
+        dpis = dpis or [float(self.dpi)] * total_pages
+        ranges = []
+        for page, dpi in enumerate(dpis, 1):
+            if ranges:
+                first, last, range_dpi = ranges[-1]
+                if range_dpi == dpi and last - first + 1 < self.chunk_pages:
+                    ranges[-1] = (first, page, dpi)
+                    continue
+            ranges.append((page, page, dpi))
+        return ranges
+    
+    def iter_pages(self, pdf_path: str | Path, total_pages: int,
+                   output_dir: str | Path) -> Iterator[Tuple[int, SlideArtifact]]:
+        """
+        Рендеринг страниц; пары (номер, артефакт) отдаются по порядку страниц.
+        
+        Артефакт доступен сразу, его файлы пишутся в фоне (artifact.saved);
+        к концу итерации все записи завершены.
+        """
+        writes = []
+        try:
+            for artifact, timings in self._iter_rendered(pdf_path, total_pages, output_dir):
+                self._record_timings(timings)
+                writes.append(self.writer.submit(artifact))
+                yield artifact.page_number, artifact
+            for future in writes:
+                future.result()
+        finally:
+            wait_futures(writes)
+    
+    def _iter_rendered(self, pdf_path: str | Path, total_pages: int,
+                       output_dir: str | Path) -> Iterator[Tuple[SlideArtifact, Dict[str, float]]]:
+        ranges = self.page_ranges(total_pages, self.page_dpis(pdf_path, total_pages))
+        
+        if self.workers == 1 or len(ranges) == 1:
+            for first, last, dpi in ranges:
+                yield from render_page_range(str(pdf_path), first, last, str(output_dir), dpi, *self._render_args())
+            return
+        
+        executor = self._get_executor()
+        pending_ranges = iter(ranges)
+        futures = deque(self._submit_range(executor, pdf_path, output_dir, *page_range)
+                        for page_range in islice(pending_ranges, self.workers))
+        try:
+            while futures:
+                rendered = futures.popleft().result()
+                next_range = next(pending_ranges, None)
+                if next_range is not None:
+                    futures.append(self._submit_range(executor, pdf_path, output_dir, *next_range))
+                yield from rendered
+        finally:
+            # Если обработку прервали, не рендерим оставшиеся диапазоны
+            for future in futures:
+                future.cancel()
+    
+    def _submit_range(self, executor: ProcessPoolExecutor, pdf_path: str | Path, output_dir: str | Path,
+                      first: int, last: int, dpi: float) -> Future:
+        return executor.submit(render_page_range, str(pdf_path), first, last, str(output_dir), dpi,
+                               *self._render_args())
+    
+    @staticmethod
+    def _record_timings(timings: Dict[str, float]):
+        """Запись времени этапов страницы, полученного из процесса рендеринга"""
+        for stage, seconds in timings.items():
+            metrics.record_stage(stage, seconds)
+    
+    def close(self, wait: bool = False):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+        self.writer.close()
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional
+from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics
+
+__all__ = ['RequestScheduler', 'TokenBucket', 'CircuitOpenError', 'get_request_scheduler']
+
+# Статусы HTTP, после которых запрос имеет смысл повторить
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+def get_request_scheduler() -> 'RequestScheduler':
+    """Общий для процесса планировщик: все анализаторы делят одну квоту"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RequestScheduler()
+        return _shared_scheduler
+
+class CircuitOpenError(Exception):
+    """API временно недоступно: запросы не отправляются до истечения паузы"""
+
+class TokenBucket:
+    """
+    Ведро токенов с пополнением rate_per_minute в минуту.
+    
+    rate_per_minute <= 0 отключает ограничение.
+    """
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+    
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, amount: float) -> float:
+        """
+        Резервирование amount токенов.
+        
+        Возвращает, сколько секунд нужно подождать, прежде чем их использовать
+        (0, если токены есть сразу). Баланс может уйти в минус - это
+        очередь ожидающих запросов.
+        """
+        if not self.enabled:
+            return 0.0
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def consume(self, amount: float):
+        """Списание токенов без ожидания (например, фактический расход сверх оценки)"""
+        if not self.enabled or amount <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+class RequestScheduler:
+    """
+    Планировщик запросов к OpenAI.
+    
+    - ограничение запросов и токенов в минуту (ведра токенов);
+    - повтор при 429/5xx/таймаутах с экспоненциальной задержкой и джиттером,
+      с учетом заголовка Retry-After;
+    - таймаут на каждый запрос;
+    - автоматический выключатель: после серии неудач запросы на время
+      отклоняются сразу, не расходуя квоту.
+    """
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_retries: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, request_timeout: Optional[float] = None,
+                 failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+                 async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.logger = logging.getLogger(__name__)
+        self._clock = clock
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+        
+        self.request_bucket = TokenBucket(
+            config.OPENAI_RPM_LIMIT if requests_per_minute is None else requests_per_minute, clock)
+        self.token_bucket = TokenBucket(
+            config.OPENAI_TPM_LIMIT if tokens_per_minute is None else tokens_per_minute, clock)
+        
+        self.max_retries = config.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = config.OPENAI_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.OPENAI_RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.request_timeout = config.OPENAI_REQUEST_TIMEOUT if request_timeout is None else request_timeout
+        
+        # Состояние автоматического выключателя
+        self.failure_threshold = (config.OPENAI_CIRCUIT_FAILURE_THRESHOLD
+                                  if failure_threshold is None else failure_threshold)
+        self.reset_timeout = config.OPENAI_CIRCUIT_RESET_SECONDS if reset_timeout is None else reset_timeout
+        self._circuit_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_until = None
+        self._half_open_probe = False
+    
+    @property
+    def circuit_state(self) -> str:
+        with self._circuit_lock:
+            if self._opened_until is None:
+                return 'closed'
+            return 'open' if self._clock() < self._opened_until else 'half_open'
+    
+    def call(self, func: Callable[..., Any], *, estimated_tokens: int = 0, **kwargs) -> Any:
+        """Выполнение запроса func(**kwargs) с учетом лимитов, повторов и выключателя"""
+        if self.request_timeout:
+            kwargs.setdefault('timeout', self.request_timeout)
+        
+        attempt = 0
+        holding_probe = False
+        while True:
+            # Повторы пробного запроса не проверяют выключатель повторно
+            if not holding_probe:
+                holding_probe = self._before_request()
+            wait = self._reserve_capacity(estimated_tokens)
+            if wait > 0:
+                with self._throttled(wait):
+                    self._sleep(wait)
+            
+            metrics.inc('scheduler_requests_total')
+            try:
+                result = func(**kwargs)
+            except Exception as e:
+                delay = self._failure_delay(e, attempt)
+                attempt += 1
+                self._sleep(delay)
+                continue
+            
+            self._record_success()
+            self._account_usage(result, estimated_tokens)
+            return result
+    
+    async def acall(self, func: Callable[..., Awaitable[Any]], *, estimated_tokens: int = 0, **kwargs) -> Any:
+        """То же, что call, для асинхронного клиента: ожидания не блокируют цикл событий"""
+        if self.request_timeout:
+            kwargs.setdefault('timeout', self.request_timeout)
+        
+        attempt = 0
+        holding_probe = False
+        while True:
+            if not holding_probe:
+                holding_probe = self._before_request()
+            wait = self._reserve_capacity(estimated_tokens)
+            if wait > 0:
+                with self._throttled(wait):
+                    await self._async_sleep(wait)
+            
+            metrics.inc('scheduler_requests_total')
+            try:
+                result = await func(**kwargs)
+            except Exception as e:
+                delay = self._failure_delay(e, attempt)
+                attempt += 1
+                await self._async_sleep(delay)
+                continue
+            
+            self._record_success()
+            self._account_usage(result, estimated_tokens)
+            return result
+    
+    def _reserve_capacity(self, estimated_tokens: int) -> float:
+        """Резерв квоты запросов и токенов; возвращает время ожидания в секундах"""
+        return max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimated_tokens))
+    
+    @contextmanager
+    def _throttled(self, wait: float):
+        """Учет ожидания свободной квоты"""
+        metrics.add_gauge('scheduler_queue_depth', 1)
+        try:
+            metrics.inc('scheduler_throttled_total')
+            metrics.inc('scheduler_throttle_seconds_total', wait)
+            metrics.observe('scheduler_throttle_seconds', wait)
+            self.logger.debug("Ограничение частоты запросов: ожидание %.2f с", wait)
+            yield
+        finally:
+            metrics.add_gauge('scheduler_queue_depth', -1)
+    
+    def _failure_delay(self, error: Exception, attempt: int) -> float:
+        """Задержка перед повтором после ошибки; если повторять нельзя, ошибка пробрасывается"""
+        if not self._is_retryable(error):
+            self._release_probe()
+            raise error
+        
+        if attempt >= self.max_retries:
+            metrics.inc('scheduler_failures_total')
+            self._record_failure()
+            raise error
+        
+        delay = self._retry_delay(error, attempt)
+        metrics.inc('scheduler_retries_total')
+        self.logger.warning(
+            "Повтор запроса %s/%s через %.1f с: %s: %s",
+            attempt + 1, self.max_retries, delay, type(error).__name__, error
+        )
+        return delay
+    
+    def _account_usage(self, result: Any, estimated_tokens: int):
+        """Списание фактически израсходованных токенов сверх оценки"""
+        usage = getattr(result, 'usage', None)
+        total_tokens = getattr(usage, 'total_tokens', None)
+        if isinstance(total_tokens, (int, float)) and total_tokens > estimated_tokens:
+            self.token_bucket.consume(total_tokens - estimated_tokens)
+    
+    @staticmethod
+    def _status_code(error: Exception) -> Optional[int]:
+        status = getattr(error, 'status_code', None)
+        return status if isinstance(status, int) else None
+    
+    def _is_retryable(self, error: Exception) -> bool:
+        # openai к этому моменту уже загружен клиентом; импорт здесь не замедляет запуск
+        import openai
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        status = self._status_code(error)
+        return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Экспоненциальная задержка с полным джиттером, но не меньше Retry-After"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return min(max(backoff, retry_after), max(self.max_delay, retry_after))
+        return backoff
+    
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Значение Retry-After (или retry-after-ms) из ответа API, в секундах"""
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        if not headers:
+            return None
+        try:
+            if headers.get('retry-after-ms') is not None:
+                return float(headers.get('retry-after-ms')) / 1000
+            if headers.get('retry-after') is not None:
+                return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return None
+        return None
+    
+    def _before_request(self) -> bool:
+        """Проверка выключателя; True, если этот вызов выполняет пробный запрос"""
+        with self._circuit_lock:
+            if self._opened_until is None:
+                return False
+            if self._clock() < self._opened_until:
+                metrics.inc('scheduler_circuit_rejected_total')
+                raise CircuitOpenError("API временно недоступно, запросы приостановлены")
+            # Пауза истекла: пропускаем один пробный запрос
+            if self._half_open_probe:
+                metrics.inc('scheduler_circuit_rejected_total')
+                raise CircuitOpenError("API временно недоступно, выполняется пробный запрос")
+            self._half_open_probe = True
+            return True
+    
+    def _release_probe(self):
+        with self._circuit_lock:
+            self._half_open_probe = False
+    
+    def _record_success(self):
+        with self._circuit_lock:
+            if self._opened_until is not None:
+                self.logger.info("API снова доступно, выключатель закрыт")
+            self._consecutive_failures = 0
+            self._opened_until = None
+            self._half_open_probe = False
+        metrics.set_gauge('scheduler_circuit_open', 0)
+    
+    def _record_failure(self):
+        with self._circuit_lock:
+            self._consecutive_failures += 1
+            self._half_open_probe = False
+            if self._opened_until is not None or self._consecutive_failures >= self.failure_threshold:
+                self._opened_until = self._clock() + self.reset_timeout
+                metrics.inc('scheduler_circuit_opened_total')
+                metrics.set_gauge('scheduler_circuit_open', 1)
+                self.logger.error(
+                    "Выключатель разомкнут на %s с после %s неудачных запросов подряд",
+                    self.reset_timeout, self._consecutive_failures
+                )
@@ -0,0 +1,120 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from PIL import Image
+from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics
+
+__all__ = ['SlideArtifact', 'SlideWriter', 'slide_bytes', 'open_slide', 'wait_saved']
+
+class SlideArtifact:
+    """
+    Отрисованный слайд в памяти: PNG, закодированный один раз в процессе
+    рендеринга, и уменьшенные копии для страницы результатов.
+
+    Дедупликация и анализ берут байты отсюда, не читая файл; на диск слайд
+    пишется в фоне (SlideWriter) только для отдачи через /slides. Артефакт -
+    os.PathLike с путем итогового PNG, поэтому подставляется везде, где
+    раньше передавался путь к слайду.
+    """
+    __slots__ = ('page_number', 'path', 'data', 'size', 'variants', 'saved')
+
+    def __init__(self, page_number: int, path: Path, data: bytes, size: Tuple[int, int],
+                 variants: Optional[Dict[str, bytes]] = None):
+        self.page_number = page_number
+        self.path = Path(path)
+        self.data = data
+        self.size = size
+        # Имя файла копии -> закодированные байты
+        self.variants = variants or {}
+        # Future фоновой записи; задается SlideWriter в основном процессе
+        self.saved: Optional[Future] = None
+
+    def __fspath__(self) -> str:
+        return str(self.path)
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+    def __repr__(self) -> str:
+        return f"SlideArtifact({self.page_number}, {str(self.path)!r}, {len(self.data)} bytes)"
+
+    def __getstate__(self):
+        # Future не передается между процессами
+        return self.page_number, self.path, self.data, self.size, self.variants
+
+    def __setstate__(self, state):
+        self.page_number, self.path, self.data, self.size, self.variants = state
+        self.saved = None
+
+def slide_bytes(image) -> bytes:
+    """PNG слайда: из артефакта в памяти или чтением файла"""
+    if isinstance(image, SlideArtifact):
+        return image.data
+    with open(image, 'rb') as img_file:
+        return img_file.read()
+
+def open_slide(image) -> Image.Image:
+    """Открытие слайда в PIL без обращения к диску для артефакта"""
+    if isinstance(image, SlideArtifact):
+        return Image.open(io.BytesIO(image.data))
+    return Image.open(image)
+
+def wait_saved(image):
+    """Ожидание фоновой записи артефакта; для обычного пути - ничего"""
+    if isinstance(image, SlideArtifact) and image.saved is not None:
+        image.saved.result()
+
+def _write_atomic(path: Path, data: bytes):
+    # Временный файл и атомарное переименование: /slides не отдаст недописанный файл.
+    # Имя временного файла уникально для процесса и потока: ту же колоду (doc_id -
+    # хэш содержимого) могут одновременно рендерить две задачи или два экземпляра
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as target:
+            target.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+class SlideWriter:
+    """
+    Фоновая запись артефактов слайдов на диск.
+
+    Копии пишутся раньше полного PNG: появление PNG означает, что слайд
+    готов к отдаче со всеми копиями.
+    """
+    def __init__(self, workers: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.workers = max(1, workers or config.SLIDE_WRITER_THREADS)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='slide-writer')
+            return self._executor
+
+    def submit(self, artifact: SlideArtifact) -> Future:
+        """Запуск записи; Future сохраняется в artifact.saved"""
+        artifact.saved = self._get_executor().submit(self.write, artifact)
+        return artifact.saved
+
+    @staticmethod
+    def write(artifact: SlideArtifact):
+        with metrics.span('slide_write'):
+            for filename, data in artifact.variants.items():
+                _write_atomic(artifact.path.with_name(filename), data)
+            _write_atomic(artifact.path, artifact.data)
+
+    def close(self, wait: bool = True):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
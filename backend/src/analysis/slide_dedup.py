@@ -0,0 +1,90 @@
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+from PIL import Image
+from backend.src.analysis.slide_artifact import open_slide
+from backend.src.utils.config import config
+
+__all__ = ['SlideDeduplicator', 'SlideFingerprint', 'dhash', 'hamming_distance']
+
+# Размер цветовой подписи: слайд, уменьшенный до COLOR_GRID x COLOR_GRID
+COLOR_GRID = 4
+
+def dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """Разностный хэш: знак перепада яркости между соседними пикселями уменьшенного слайда"""
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+def hamming_distance(first: int, second: int) -> int:
+    """Число различающихся бит двух хэшей"""
+    return (first ^ second).bit_count()
+
+class SlideFingerprint:
+    """
+    Отпечаток слайда: dHash и грубая цветовая подпись.
+    
+    dHash не учитывает абсолютный цвет (однотонные слайды разных цветов дают
+    одинаковый хэш), поэтому дополнительно сравниваются средние цвета областей.
+    """
+    __slots__ = ('hash', 'colors')
+    
+    def __init__(self, hash_value: int, colors: bytes):
+        self.hash = hash_value
+        self.colors = colors
+    
+    @classmethod
+    def from_path(cls, image_path: str | Path, hash_size: int = 16) -> 'SlideFingerprint':
+        # Для SlideArtifact - из байтов в памяти, без чтения файла
+        with open_slide(image_path) as image:
+            colors = image.convert('RGB').resize((COLOR_GRID, COLOR_GRID), Image.Resampling.BOX).tobytes()
+            return cls(dhash(image, hash_size), colors)
+    
+    def color_distance(self, other: 'SlideFingerprint') -> float:
+        """Средняя разница каналов цветовых подписей (0-255)"""
+        return sum(abs(a - b) for a, b in zip(self.colors, other.colors)) / len(self.colors)
+
+class SlideDeduplicator:
+    """
+    Группировка почти одинаковых слайдов (шаги анимации, повторяющиеся
+    разделители, шаблонные слайды) по перцептивному хэшу.
+    
+    Слайды добавляются по мере рендеринга; для дубликата возвращается номер
+    первого похожего слайда-представителя, анализ которого можно переиспользовать.
+    """
+    def __init__(self, threshold: Optional[int] = None, hash_size: Optional[int] = None,
+                 color_tolerance: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.threshold = config.SLIDE_DEDUP_THRESHOLD if threshold is None else threshold
+        self.hash_size = hash_size or config.SLIDE_DEDUP_HASH_SIZE
+        self.color_tolerance = config.SLIDE_DEDUP_COLOR_TOLERANCE if color_tolerance is None else color_tolerance
+        self.representatives: List[Tuple[SlideFingerprint, int]] = []
+        self.shared = 0
+    
+    def add(self, slide_number: int, image_path: str | Path) -> Optional[int]:
+        """Номер слайда-представителя для дубликата или None для нового уникального слайда"""
+        try:
+            fingerprint = SlideFingerprint.from_path(image_path, self.hash_size)
+        except OSError as e:
+            self.logger.warning("Не удалось вычислить хэш слайда %s: %s", slide_number, e)
+            return None
+        
+        best = None
+        for candidate, representative in self.representatives:
+            distance = hamming_distance(fingerprint.hash, candidate.hash)
+            if distance <= self.threshold and fingerprint.color_distance(candidate) <= self.color_tolerance:
+                if best is None or distance < best[0]:
+                    best = (distance, representative)
+        
+        if best is None:
+            self.representatives.append((fingerprint, slide_number))
+            return None
+        
+        self.shared += 1
+        self.logger.info("Слайд %s похож на слайд %s (расстояние %s)", slide_number, best[1], best[0])
+        return best[1]
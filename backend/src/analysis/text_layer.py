@@ -0,0 +1,127 @@
+import io
+import logging
+import subprocess
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image, ImageChops
+from backend.src.utils.config import config
+
+__all__ = ['PageText', 'extract_text_layer', 'parse_bbox_layout', 'graphics_ratio', 'choose_mode',
+           'MODE_IMAGE', 'MODE_TEXT_LOW', 'MODE_TEXT']
+
+# Режимы анализа слайда
+MODE_IMAGE = 'image'         # только изображение высокой детализации (OCR выполняет модель)
+MODE_TEXT_LOW = 'text_low'   # текстовый слой и изображение низкой детализации
+MODE_TEXT = 'text'           # только текстовый слой
+
+# Ширина уменьшенного слайда для оценки графики вне текста
+GRAPHICS_SAMPLE_WIDTH = 160
+
+class PageText:
+    """
+    Текстовый слой страницы: текст по блокам и рамки слов в долях страницы
+    """
+    def __init__(self, page_number: int, text: str, word_count: int,
+                 boxes: List[Tuple[float, float, float, float]]):
+        self.page_number = page_number
+        self.text = text
+        self.word_count = word_count
+        self.boxes = boxes
+    
+    @property
+    def text_area_ratio(self) -> float:
+        """Доля площади страницы под словами (рамки не пересекаются)"""
+        return min(1.0, sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in self.boxes))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'page_number': self.page_number, 'text': self.text, 'word_count': self.word_count,
+                'boxes': [list(box) for box in self.boxes]}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PageText':
+        return cls(data['page_number'], data['text'], data['word_count'], [tuple(box) for box in data['boxes']])
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+def parse_bbox_layout(xhtml: str) -> Dict[int, PageText]:
+    """Разбор вывода pdftotext -bbox-layout: страницы, блоки, строки и слова с координатами"""
+    pages = {}
+    root = ElementTree.fromstring(xhtml)
+    page_number = 0
+    for page in root.iter():
+        if _local(page.tag) != 'page':
+            continue
+        page_number += 1
+        width, height = float(page.get('width', 0)), float(page.get('height', 0))
+        blocks, boxes, word_count = [], [], 0
+        for block in page.iter():
+            if _local(block.tag) != 'block':
+                continue
+            lines = []
+            for line in block.iter():
+                if _local(line.tag) != 'line':
+                    continue
+                words = [word for word in line if _local(word.tag) == 'word']
+                lines.append(' '.join(word.text or '' for word in words))
+                word_count += len(words)
+                if width and height:
+                    boxes += [(float(word.get('xMin')) / width, float(word.get('yMin')) / height,
+                               float(word.get('xMax')) / width, float(word.get('yMax')) / height)
+                              for word in words]
+            blocks.append('\n'.join(lines))
+        pages[page_number] = PageText(page_number, '\n\n'.join(blocks).strip(), word_count, boxes)
+    return pages
+
+def extract_text_layer(pdf_path: str | Path, timeout: Optional[float] = None) -> Dict[int, PageText]:
+    """
+    Текстовый слой всех страниц одним вызовом pdftotext (poppler).
+    
+    Если pdftotext недоступен или PDF без текста, возвращается пустой
+    словарь и слайды анализируются по изображению, как раньше.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        result = subprocess.run(
+            ['pdftotext', '-bbox-layout', '-enc', 'UTF-8', str(pdf_path), '-'],
+            capture_output=True, timeout=timeout or config.TEXT_LAYER_TIMEOUT, check=True
+        )
+        return parse_bbox_layout(result.stdout.decode('utf-8', errors='replace'))
+    except (OSError, subprocess.SubprocessError, ElementTree.ParseError) as e:
+        logger.warning("Не удалось извлечь текстовый слой %s: %s", pdf_path, e)
+        return {}
+
+def graphics_ratio(image_bytes: bytes, page_text: PageText) -> float:
+    """
+    Доля площади слайда с графикой вне текста.
+    
+    Пиксели, заметно отличающиеся от фона (медианы по краям), считаются
+    «чернилами»; области слов вычеркиваются, остаток - фотографии,
+    диаграммы и иллюстрации, которые текстовый слой не передает.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        height = max(1, round(image.height * GRAPHICS_SAMPLE_WIDTH / image.width))
+        sample = image.convert('L').resize((GRAPHICS_SAMPLE_WIDTH, height), Image.Resampling.BOX)
+    
+    width = sample.width
+    border = [sample.getpixel((x, 0)) for x in range(width)] + [sample.getpixel((x, height - 1)) for x in range(width)]
+    background = sorted(border)[len(border) // 2]
+    
+    ink = ImageChops.difference(sample, Image.new('L', sample.size, background)).point(
+        lambda value: 255 if value > config.TEXT_LAYER_INK_THRESHOLD else 0)
+    # Вычеркиваем слова с небольшим запасом на выносные элементы букв
+    mask = Image.new('L', sample.size, 255)
+    for x1, y1, x2, y2 in page_text.boxes:
+        mask.paste(0, (int(x1 * width) - 1, int(y1 * height) - 1, int(x2 * width) + 2, int(y2 * height) + 2))
+    graphics = ImageChops.multiply(ink, mask)
+    return graphics.histogram()[255] / (width * height)
+
+def choose_mode(page_text: Optional[PageText], image_bytes: bytes) -> str:
+    """Режим анализа слайда по количеству слов и доле графики вне текста"""
+    if page_text is None or page_text.word_count < config.TEXT_LAYER_MIN_WORDS:
+        return MODE_IMAGE
+    if page_text.word_count >= config.TEXT_ONLY_MIN_WORDS and \
+            graphics_ratio(image_bytes, page_text) <= config.TEXT_ONLY_MAX_GRAPHICS:
+        return MODE_TEXT
+    return MODE_TEXT_LOW
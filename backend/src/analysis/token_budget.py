@@ -0,0 +1,156 @@
+import contextvars
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+from backend.src.utils.config import config
+
+__all__ = ['OutputTokenStats', 'get_output_token_stats', 'TokenBudget', 'TokenBudgetExhaustedError',
+           'current_budget', 'budget_context']
+
+_shared_stats = None
+_shared_stats_lock = threading.Lock()
+
+# Бюджет токенов анализируемой колоды; виден задачам в пуле потоков,
+# запущенным в контексте из budget_context
+_current_budget: contextvars.ContextVar[Optional['TokenBudget']] = contextvars.ContextVar(
+    'token_budget', default=None)
+
+def get_output_token_stats() -> 'OutputTokenStats':
+    """Общая для процесса статистика длины ответов"""
+    global _shared_stats
+    with _shared_stats_lock:
+        if _shared_stats is None:
+            _shared_stats = OutputTokenStats()
+        return _shared_stats
+
+def current_budget() -> Optional['TokenBudget']:
+    """Бюджет токенов текущей колоды или None"""
+    return _current_budget.get()
+
+def budget_context(budget: Optional['TokenBudget']) -> contextvars.Context:
+    """Копия текущего контекста с бюджетом колоды (если задан) для запуска задачи в пуле"""
+    context = contextvars.copy_context()
+    if budget is not None:
+        context.run(_current_budget.set, budget)
+    return context
+
+class OutputTokenStats:
+    """
+    Скользящее окно completion_tokens по видам запросов и лимит ответа из него.
+
+    Пока образцов меньше min_samples, лимит равен переданному потолку; затем -
+    заданный перцентиль с запасом headroom, но не меньше floor и не больше потолка.
+    """
+    def __init__(self, window: Optional[int] = None, percentile: Optional[float] = None,
+                 headroom: Optional[float] = None, min_samples: Optional[int] = None,
+                 floor: Optional[int] = None):
+        self.window = window or config.OUTPUT_CAP_WINDOW
+        self.percentile = percentile or config.OUTPUT_CAP_PERCENTILE
+        self.headroom = headroom or config.OUTPUT_CAP_HEADROOM
+        self.min_samples = min_samples if min_samples is not None else config.OUTPUT_CAP_MIN_SAMPLES
+        self.floor = floor or config.OUTPUT_CAP_MIN
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, completion_tokens: int):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self.window)).append(completion_tokens)
+
+    def observed(self, kind: str) -> Optional[int]:
+        """Перцентиль длины ответа или None, пока образцов мало"""
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(len(samples) * self.percentile / 100) - 1)]
+
+    def cap(self, kind: str, ceiling: int) -> int:
+        """max_tokens для запроса вида kind"""
+        observed = self.observed(kind)
+        if observed is None:
+            return ceiling
+        return max(min(self.floor, ceiling), min(ceiling, math.ceil(observed * self.headroom)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {kind: len(samples) for kind, samples in self._samples.items()}
+        return {kind: {'samples': count, 'observed': self.observed(kind)} for kind, count in kinds.items()}
+
+class TokenBudgetExhaustedError(Exception):
+    """Бюджет токенов колоды исчерпан: запрос не отправлен"""
+
+class TokenBudget:
+    """
+    Бюджет токенов на колоду, заданный вызывающей стороной.
+
+    Перед запросом резервируется его оценка; когда потраченные и
+    зарезервированные токены с новым запросом превышают долю degrade_at
+    бюджета, запрос переводится в дешевый режим. Когда они достигли
+    бюджета, запрос не отправляется (TokenBudgetExhaustedError). После
+    ответа резерв заменяется фактическим расходом из usage.
+    """
+    def __init__(self, limit: int, degrade_at: Optional[float] = None):
+        self.limit = limit
+        self.degrade_at = degrade_at if degrade_at is not None else config.TOKEN_BUDGET_DEGRADE_AT
+        self.spent = 0
+        self.reserved = 0
+        self.requests = 0
+        self.degraded_requests = 0
+        self.saved_tokens = 0
+        self.skipped_requests = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, full_estimate: int, cheap_estimate: Optional[int] = None) -> Tuple[bool, int]:
+        """
+        Резерв под запрос: (перевести ли в дешевый режим, зарезервировано токенов).
+
+        TokenBudgetExhaustedError, если бюджет уже потрачен или зарезервирован целиком.
+        """
+        with self._lock:
+            if self.spent + self.reserved >= self.limit:
+                self.skipped_requests += 1
+                raise TokenBudgetExhaustedError(f"Бюджет токенов колоды исчерпан ({self.spent} из {self.limit})")
+            degrade = (cheap_estimate is not None and
+                       self.spent + self.reserved + full_estimate > self.limit * self.degrade_at)
+            amount = cheap_estimate if degrade else full_estimate
+            self.reserved += amount
+            if degrade:
+                self.degraded_requests += 1
+                self.saved_tokens += full_estimate - cheap_estimate
+            return degrade, amount
+
+    def settle(self, reserved: int, used: int):
+        """Замена резерва фактическим расходом отправленного запроса"""
+        with self._lock:
+            self.reserved -= reserved
+            self.spent += used
+            self.requests += 1
+
+    def release(self, reserved: int):
+        """Снятие резерва запроса, который не был выполнен (кэш, ошибка); в requests не учитывается"""
+        with self._lock:
+            self.reserved -= reserved
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return max(0, self.limit - self.spent)
+
+    @property
+    def exhausted(self) -> bool:
+        with self._lock:
+            return self.spent + self.reserved >= self.limit
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'spent': self.spent,
+                'remaining': max(0, self.limit - self.spent),
+                'requests': self.requests,
+                'degraded_requests': self.degraded_requests,
+                'saved_tokens': self.saved_tokens,
+                'skipped_requests': self.skipped_requests,
+                'exhausted': self.spent >= self.limit
+            }
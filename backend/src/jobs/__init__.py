@@ -0,0 +1,11 @@
+# Пустой файл для обозначения пакета
+
+from .job_manager import JobManager, Job, JobQueueFullError
+from .async_job_manager import AsyncJobManager
+from .shared_job_manager import SharedJobManager, JobLeaseLostError
+from .state_store import StateStore, SQLiteStateStore, get_state_store
+from .janitor import SlideJanitor, remove_job_uploads, remove_expired_uploads
+
+__all__ = ['JobManager', 'Job', 'JobQueueFullError', 'AsyncJobManager', 'SharedJobManager', 'JobLeaseLostError',
+           'StateStore', 'SQLiteStateStore', 'get_state_store', 'SlideJanitor', 'remove_job_uploads',
+           'remove_expired_uploads']
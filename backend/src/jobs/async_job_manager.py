@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+from backend.src.utils.config import config
+from backend.src.utils.logs import log_context
+from backend.src.utils.metrics import collect_timings
+from backend.src.jobs.job_manager import Job, JobQueueFullError
+
+__all__ = ['AsyncJobManager']
+
+class AsyncJobManager:
+    """
+    Задачи анализа для асинхронного режима сервера.
+
+    Каждая задача - корутина в цикле событий рабочего процесса, а не поток:
+    колода, ожидающая ответов API, не занимает поток. Одновременно
+    выполняется не больше max_active задач; сверх этого submit выбрасывает
+    JobQueueFullError (клиенту - 429), как и JobManager.
+    """
+    def __init__(self, processor, max_active: Optional[int] = None, job_ttl: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.processor = processor
+        self.max_active = max(1, max_active or config.ASYNC_MAX_ACTIVE_DECKS)
+        self.job_ttl = job_ttl if job_ttl is not None else config.JOB_TTL_SECONDS
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, filepath: str, context: str = '', include_timings: bool = False,
+               token_budget: Optional[int] = None) -> Job:
+        """Запуск задачи в текущем цикле событий"""
+        self._prune()
+        if len(self._tasks) >= self.max_active:
+            self.logger.warning("Одновременно анализируется %s колод, задача отклонена", len(self._tasks))
+            raise JobQueueFullError("Сервер занят, повторите попытку позже")
+
+        job = Job(filepath, context, include_timings, token_budget)
+        self._jobs[job.job_id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.logger.info("Задача %s запущена: %s", job.job_id, filepath)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def file_in_use(self, filepath: str) -> bool:
+        """Файл нужен выполняющейся задаче"""
+        return any(job.filepath == filepath and not job.finished for job in self._jobs.values())
+
+    async def _run(self, job: Job):
+        with log_context(job_id=job.job_id, doc_id=job.job_id):
+            job.set_status('running')
+            try:
+                with collect_timings() as timings:
+                    job.timings = timings
+                    async for event in self.processor.iter_slides(job.filepath, doc_id=job.job_id,
+                                                                  context=job.context, token_budget=job.token_budget):
+                        job.apply_event(event)
+                job.set_status('done')
+                self.logger.info("Задача %s завершена", job.job_id)
+            except Exception as e:
+                self.logger.error("Ошибка при выполнении задачи %s: %s", job.job_id, e)
+                job.set_status('failed', str(e))
+
+    async def shutdown(self):
+        """Отмена выполняющихся задач при остановке сервера"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _prune(self):
+        """Удаление завершенных задач старше job_ttl"""
+        deadline = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+from backend.src.utils.config import config
+
+__all__ = ['SlideJanitor', 'remove_job_uploads', 'remove_expired_uploads']
+
+# Расширения загружаемых презентаций
+UPLOAD_EXTENSIONS = ('.pdf', '.ppt', '.pptx')
+
+def _remove_upload(path: Path, job_manager) -> bool:
+    """Удаление загрузки, если она не нужна задаче в очереди или в работе"""
+    if job_manager is not None and job_manager.file_in_use(str(path)):
+        return False
+    try:
+        path.unlink()
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logging.getLogger(__name__).error("Ошибка при удалении файла %s: %s", path, e)
+        return False
+
+def remove_job_uploads(job_manager, job_ids: Iterable[str], uploads_dir: str | Path) -> int:
+    """
+    Удаление загрузок завершенных задач job_ids.
+
+    Папка загрузок общая для всех пользователей (и экземпляров), поэтому
+    удаляются только файлы задач вызывающей стороны; файл, который нужен
+    другой задаче в очереди или в работе, остается.
+    """
+    uploads_dir = Path(uploads_dir).resolve()
+    removed = 0
+    for job_id in job_ids:
+        job = job_manager.get(str(job_id))
+        if job is None or not job.finished:
+            continue
+        path = Path(job.filepath)
+        if path.resolve().parent != uploads_dir:
+            continue
+        if _remove_upload(path, job_manager):
+            removed += 1
+    return removed
+
+def remove_expired_uploads(uploads_dir: str | Path, max_age_seconds: float, job_manager=None) -> int:
+    """Удаление загрузок, не изменявшихся дольше max_age_seconds и не нужных задачам"""
+    deadline = time.time() - max_age_seconds
+    removed = 0
+    for entry in os.scandir(uploads_dir):
+        path = Path(uploads_dir) / entry.name
+        try:
+            expired = entry.is_file() and entry.stat().st_mtime < deadline
+        except OSError:
+            continue
+        if expired and entry.name.lower().endswith(UPLOAD_EXTENSIONS) and _remove_upload(path, job_manager):
+            removed += 1
+    return removed
+
+class SlideJanitor:
+    """
+    Фоновый поток, периодически удаляющий устаревшие папки слайдов документов
+    и (если задан uploads_dir) загрузки старше того же TTL
+    """
+    def __init__(self, pdf_processor, ttl_seconds: Optional[float] = None,
+                 interval_seconds: Optional[float] = None, uploads_dir: Optional[str | Path] = None,
+                 job_manager=None):
+        self.logger = logging.getLogger(__name__)
+        self.pdf_processor = pdf_processor
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.SLIDES_TTL_SECONDS
+        self.interval_seconds = interval_seconds if interval_seconds is not None else config.SLIDES_JANITOR_INTERVAL
+        self.uploads_dir = uploads_dir
+        self.job_manager = job_manager
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='slide-janitor', daemon=True)
+        self._thread.start()
+        self.logger.info("Очистка слайдов запущена: TTL %s с, интервал %s с", self.ttl_seconds, self.interval_seconds)
+    
+    def stop(self):
+        self._stop.set()
+    
+    def run_once(self) -> int:
+        """Один проход очистки; возвращает число удаленных папок слайдов"""
+        try:
+            removed = self.pdf_processor.cleanup_expired_slides(self.ttl_seconds)
+        except Exception as e:
+            self.logger.error("Ошибка при очистке слайдов: %s", e)
+            removed = 0
+        
+        if self.uploads_dir:
+            try:
+                uploads = remove_expired_uploads(self.uploads_dir, self.ttl_seconds, self.job_manager)
+                if uploads:
+                    self.logger.info("Удалено устаревших загрузок: %s", uploads)
+            except Exception as e:
+                self.logger.error("Ошибка при очистке загрузок: %s", e)
+        return removed
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.run_once()
@@ -0,0 +1,225 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional
+from backend.src.utils.config import config
+from backend.src.utils.logs import log_context
+from backend.src.utils.metrics import StageTimings, collect_timings
+
+__all__ = ['JobManager', 'Job', 'JobQueueFullError']
+
+class JobQueueFullError(Exception):
+    """Очередь задач заполнена"""
+
+class Job:
+    """
+    Задача анализа презентации и ее прогресс
+    """
+    # Поля, сохраняемые в общем хранилище (см. to_state)
+    STATE_FIELDS = ('job_id', 'filepath', 'context', 'include_timings', 'token_budget', 'budget', 'status',
+                    'error', 'total_slides', 'doc_id', 'rendered', 'results', 'dedup', 'summary',
+                    'created_at', 'started_at', 'finished_at')
+    
+    def __init__(self, filepath: str, context: str = '', include_timings: bool = False,
+                 token_budget: Optional[int] = None):
+        self.job_id = uuid.uuid4().hex
+        self.filepath = filepath
+        self.context = context
+        self.include_timings = include_timings
+        self.token_budget = token_budget  # бюджет токенов на колоду (None - без ограничения)
+        self.budget = None              # расход бюджета и экономия от дешевого режима
+        self.timings = None             # разбивка времени по этапам (StageTimings)
+        self.status = 'queued'          # queued -> running -> done / failed
+        self.error = None
+        self.total_slides = None
+        self.doc_id = None
+        self.rendered = {}              # slide_number -> image_path
+        self.results = {}               # slide_number -> результат анализа
+        self.dedup = None               # итог дедупликации слайдов
+        self.summary = None             # сводка по колоде (темы, концепции, резюме)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+    
+    def apply_event(self, event: Dict[str, Any]):
+        """Обновление прогресса по событию PDFProcessor.iter_slides"""
+        with self._lock:
+            if event['event'] == 'started':
+                self.doc_id = event.get('doc_id')
+                self.total_slides = event['total_slides']
+            elif event['event'] == 'rendered':
+                self.rendered[event['slide_number']] = event['image_path']
+            elif event['event'] in ('analyzed', 'refined'):
+                self.results[event['slide_number']] = {k: v for k, v in event.items() if k != 'event'}
+            elif event['event'] == 'deduplicated':
+                self.dedup = {k: v for k, v in event.items() if k != 'event'}
+            elif event['event'] == 'summary':
+                self.summary = {k: v for k, v in event.items() if k != 'event'}
+            elif event['event'] == 'budget':
+                self.budget = {k: v for k, v in event.items() if k != 'event'}
+    
+    def set_status(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            if status == 'running':
+                self.started_at = time.time()
+            elif status in ('done', 'failed'):
+                self.finished_at = time.time()
+    
+    def to_state(self) -> Dict[str, Any]:
+        """Полное состояние задачи для общего хранилища (сериализуется в JSON)"""
+        with self._lock:
+            state = {key: getattr(self, key) for key in self.STATE_FIELDS}
+            state['rendered'] = dict(self.rendered)
+            state['results'] = dict(self.results)
+        state['timings'] = self.timings.to_dict() if self.timings else None
+        return state
+    
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'Job':
+        """Задача из to_state; номера слайдов после JSON - снова числа"""
+        job = cls(state['filepath'])
+        for key in cls.STATE_FIELDS:
+            setattr(job, key, state.get(key))
+        job.rendered = {int(number): path for number, path in (state.get('rendered') or {}).items()}
+        job.results = {int(number): result for number, result in (state.get('results') or {}).items()}
+        if state.get('timings') is not None:
+            job.timings = StageTimings.from_dict(state['timings'])
+        return job
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Состояние задачи с частичными результатами"""
+        with self._lock:
+            data = {
+                'job_id': self.job_id,
+                'status': self.status,
+                'error': self.error,
+                'context': self.context,
+                'doc_id': self.doc_id,
+                'progress': {
+                    'total_slides': self.total_slides,
+                    'rendered': len(self.rendered),
+                    'analyzed': len(self.results)
+                },
+                'rendered_slides': [
+                    {'slide_number': number, 'image_path': self.rendered[number]}
+                    for number in sorted(self.rendered)
+                ],
+                'results': [self.results[number] for number in sorted(self.results)],
+                'dedup': self.dedup,
+                'summary': self.summary,
+                'budget': self.budget,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            }
+        if self.include_timings:
+            data['timings'] = self.timings.to_dict() if self.timings else None
+        return data
+
+class JobManager:
+    """
+    Локальная очередь задач анализа с пулом рабочих потоков.
+    
+    Новые задачи ставятся в очередь ограниченной длины; при ее заполнении
+    submit выбрасывает JobQueueFullError, чтобы вызывающая сторона могла
+    ответить клиенту 429.
+    """
+    def __init__(self, pdf_processor, workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, job_ttl: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.pdf_processor = pdf_processor
+        self.workers = max(1, workers or config.JOB_WORKERS)
+        self.job_ttl = job_ttl if job_ttl is not None else config.JOB_TTL_SECONDS
+        
+        self._queue = queue.Queue(maxsize=max(1, queue_size or config.JOB_QUEUE_SIZE))
+        self._jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._threads = []
+        self._started = False
+        self._start_lock = threading.Lock()
+    
+    def _ensure_started(self):
+        """Ленивый запуск рабочих потоков"""
+        with self._start_lock:
+            if self._started:
+                return
+            for idx in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'job-worker-{idx + 1}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+    
+    def submit(self, filepath: str, context: str = '', include_timings: bool = False,
+               token_budget: Optional[int] = None) -> Job:
+        """Постановка задачи в очередь"""
+        self._ensure_started()
+        self._prune()
+        
+        job = Job(filepath, context, include_timings, token_budget)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.logger.warning("Очередь задач заполнена (%s), задача отклонена", self._queue.maxsize)
+            raise JobQueueFullError("Очередь задач заполнена, повторите попытку позже")
+        
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+        self.logger.info("Задача %s поставлена в очередь: %s", job.job_id, filepath)
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+    
+    def file_in_use(self, filepath: str) -> bool:
+        """Файл нужен задаче в очереди или в работе"""
+        with self._jobs_lock:
+            return any(job.filepath == filepath and not job.finished for job in self._jobs.values())
+    
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+    
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+    
+    def _run(self, job: Job):
+        """Выполнение задачи в рабочем потоке"""
+        with log_context(job_id=job.job_id, doc_id=job.job_id):
+            self.logger.info("Задача %s запущена", job.job_id)
+            job.set_status('running')
+            try:
+                # Слайды задачи пишутся в отдельную папку с ее идентификатором
+                with collect_timings() as timings:
+                    job.timings = timings
+                    for event in self.pdf_processor.iter_slides(job.filepath, doc_id=job.job_id,
+                                                                context=job.context, token_budget=job.token_budget):
+                        job.apply_event(event)
+                job.set_status('done')
+                self.logger.info("Задача %s завершена", job.job_id)
+            except Exception as e:
+                self.logger.error("Ошибка при выполнении задачи %s: %s", job.job_id, e)
+                job.set_status('failed', str(e))
+    
+    def _prune(self):
+        """Удаление завершенных задач старше job_ttl"""
+        deadline = time.time() - self.job_ttl
+        with self._jobs_lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < deadline]
+            for job_id in expired:
+                del self._jobs[job_id]
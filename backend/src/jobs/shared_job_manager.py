@@ -0,0 +1,186 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+from backend.src.utils.config import config
+from backend.src.utils.logs import log_context
+from backend.src.utils.metrics import collect_timings
+from backend.src.jobs.job_manager import Job, JobQueueFullError
+
+__all__ = ['SharedJobManager', 'JobLeaseLostError']
+
+class JobLeaseLostError(Exception):
+    """Аренда задачи истекла и могла перейти к другому экземпляру"""
+
+class SharedJobManager:
+    """
+    Задачи анализа в общем хранилище (StateStore) для нескольких экземпляров
+    приложения за балансировщиком.
+
+    submit только ставит задачу в очередь хранилища. Рабочие потоки каждого
+    экземпляра берут задачи в аренду, поэтому задачу, принятую одним
+    экземпляром, выполняет любой, а ее статус отдает тоже любой. Прогресс
+    сохраняется не чаще save_interval, аренда продлевается фоновым потоком;
+    задачу остановившегося экземпляра после истечения аренды заново
+    выполнит другой. Интерфейс - как у JobManager.
+    """
+    def __init__(self, pdf_processor, store, workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 job_ttl: Optional[float] = None, lease_seconds: Optional[float] = None,
+                 poll_interval: Optional[float] = None, save_interval: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.pdf_processor = pdf_processor
+        self.store = store
+        self.workers = max(1, workers or config.JOB_WORKERS)
+        self.queue_size = max(1, queue_size or config.JOB_QUEUE_SIZE)
+        self.job_ttl = job_ttl if job_ttl is not None else config.JOB_TTL_SECONDS
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.poll_interval = poll_interval or config.JOB_POLL_INTERVAL
+        self.save_interval = save_interval if save_interval is not None else config.JOB_SAVE_INTERVAL
+        # Владелец аренды в хранилище: хост, процесс и случайный суффикс
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._running: Dict[str, Job] = {}
+        self._running_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Запуск рабочих потоков и продления аренды: экземпляр начинает брать задачи из хранилища"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._stop.clear()
+            targets = [(self._worker, f'shared-job-worker-{idx + 1}') for idx in range(self.workers)]
+            targets.append((self._renew_leases, 'job-lease-renewal'))
+            for target, name in targets:
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+        self.logger.info("Экземпляр %s берет задачи из общего хранилища", self.instance_id)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Остановка после текущих задач; невыполненные задачи остаются в очереди"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._start_lock:
+            self._threads = []
+            self._started = False
+
+    def submit(self, filepath: str, context: str = '', include_timings: bool = False,
+               token_budget: Optional[int] = None) -> Job:
+        """Постановка задачи в общую очередь"""
+        self.start()
+        self._prune()
+
+        job = Job(filepath, context, include_timings, token_budget)
+        if not self.store.create_job(job, self.queue_size):
+            self.logger.warning("Очередь задач заполнена (%s), задача отклонена", self.queue_size)
+            raise JobQueueFullError("Очередь задач заполнена, повторите попытку позже")
+
+        self._wakeup.set()
+        self.logger.info("Задача %s поставлена в общую очередь: %s", job.job_id, filepath)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get_job(job_id)
+
+    def file_in_use(self, filepath: str) -> bool:
+        """Файл нужен задаче в очереди или в работе на любом экземпляре"""
+        return self.store.file_in_use(filepath)
+
+    @property
+    def active(self) -> int:
+        """Задачи, выполняющиеся на этом экземпляре"""
+        with self._running_lock:
+            return len(self._running)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.store.queued_count()
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim_job(self.instance_id, self.lease_seconds)
+            except Exception as e:
+                self.logger.error("Ошибка при получении задачи из хранилища: %s", e)
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Job):
+        """Выполнение взятой в аренду задачи; прогресс сохраняется в хранилище"""
+        with log_context(job_id=job.job_id, doc_id=job.job_id):
+            self.logger.info("Задача %s запущена экземпляром %s", job.job_id, self.instance_id)
+            with self._running_lock:
+                self._running[job.job_id] = job
+            job.set_status('running')
+            try:
+                with collect_timings() as timings:
+                    job.timings = timings
+                    saved_at = time.monotonic()
+                    for event in self.pdf_processor.iter_slides(job.filepath, doc_id=job.job_id,
+                                                                context=job.context, token_budget=job.token_budget):
+                        job.apply_event(event)
+                        if time.monotonic() - saved_at >= self.save_interval:
+                            self._save(job)
+                            saved_at = time.monotonic()
+                job.set_status('done')
+                self.logger.info("Задача %s завершена", job.job_id)
+            except JobLeaseLostError:
+                self.logger.warning("Аренда задачи %s потеряна, выполнение прервано", job.job_id)
+                return
+            except Exception as e:
+                self.logger.error("Ошибка при выполнении задачи %s: %s", job.job_id, e)
+                job.set_status('failed', str(e))
+            finally:
+                with self._running_lock:
+                    self._running.pop(job.job_id, None)
+
+            try:
+                self._save(job)
+            except JobLeaseLostError:
+                self.logger.warning("Аренда задачи %s потеряна, результат не сохранен", job.job_id)
+
+    def _save(self, job: Job):
+        """Сохранение прогресса; JobLeaseLostError, если задачу уже ведет другой экземпляр"""
+        try:
+            saved = self.store.save_job(job, self.instance_id, self.lease_seconds)
+        except Exception as e:
+            # Временная ошибка хранилища: аренду продлевает фоновый поток, сохраним позже
+            self.logger.error("Ошибка при сохранении задачи %s: %s", job.job_id, e)
+            return
+        if not saved:
+            raise JobLeaseLostError(job.job_id)
+
+    def _renew_leases(self):
+        """Продление аренды выполняющихся задач, пока между событиями идут запросы к API"""
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._running_lock:
+                job_ids = list(self._running)
+            for job_id in job_ids:
+                try:
+                    if not self.store.renew_lease(job_id, self.instance_id, self.lease_seconds):
+                        self.logger.warning("Аренда задачи %s не продлена: задача у другого экземпляра", job_id)
+                except Exception as e:
+                    self.logger.error("Ошибка при продлении аренды задачи %s: %s", job_id, e)
+
+    def _prune(self):
+        """Удаление завершенных задач старше job_ttl"""
+        try:
+            self.store.prune_jobs(self.job_ttl)
+        except Exception as e:
+            self.logger.error("Ошибка при очистке задач в хранилище: %s", e)
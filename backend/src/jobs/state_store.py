@@ -0,0 +1,212 @@
+import abc
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional
+from backend.src.utils.config import config
+from backend.src.jobs.job_manager import Job
+
+__all__ = ['StateStore', 'SQLiteStateStore', 'get_state_store']
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+def get_state_store() -> Optional['StateStore']:
+    """
+    Общее хранилище состояния процесса по STATE_BACKEND.
+
+    None для local: задачи живут в памяти процесса, как в JobManager.
+    """
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None and config.STATE_BACKEND != 'local':
+            if config.STATE_BACKEND != 'sqlite':
+                raise ValueError(f"Неизвестный STATE_BACKEND: {config.STATE_BACKEND}")
+            _shared_store = SQLiteStateStore()
+        return _shared_store
+
+class StateStore(abc.ABC):
+    """
+    Состояние, общее для нескольких экземпляров приложения: загруженные
+    файлы, отрисованные слайды и задачи анализа с результатами.
+
+    Файлы лежат в uploads_dir и slides_dir, видимых всем экземплярам,
+    кэш анализа - в базе analysis_cache_path там же. Только через файловую
+    систему (без записей в хранилище) общими остаются сами загрузки и
+    слайды, а также кэш анализа: их видимость держится на общем томе.
+    Сконвертированные PDF (OFFICE_CACHE_DIR) остаются локальными для
+    экземпляра.
+    Задачу выполняет экземпляр, взявший ее в аренду (claim_job) и
+    продлевающий аренду, пока работает; задача с истекшей арендой
+    (экземпляр остановлен или завис) снова выдается claim_job.
+
+    Реализация без любого из абстрактных методов не создается (TypeError).
+    """
+    uploads_dir: Path
+    slides_dir: Path
+    analysis_cache_path: Path
+
+    @abc.abstractmethod
+    def create_job(self, job: Job, max_queued: int) -> bool:
+        """Постановка задачи в очередь; False - в очереди уже max_queued задач"""
+
+    @abc.abstractmethod
+    def claim_job(self, owner: str, lease_seconds: float) -> Optional[Job]:
+        """Аренда самой старой задачи из очереди или задачи с истекшей арендой"""
+
+    @abc.abstractmethod
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Продление аренды; False - аренда потеряна"""
+
+    @abc.abstractmethod
+    def save_job(self, job: Job, owner: str, lease_seconds: float) -> bool:
+        """Сохранение прогресса задачи с продлением аренды; False - аренда потеряна"""
+
+    @abc.abstractmethod
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Задача по идентификатору или None"""
+
+    @abc.abstractmethod
+    def file_in_use(self, filepath: str) -> bool:
+        """Есть ли задача в очереди или в работе с файлом filepath"""
+
+    @abc.abstractmethod
+    def queued_count(self) -> int:
+        """Число задач в очереди"""
+
+    @abc.abstractmethod
+    def prune_jobs(self, max_age_seconds: float) -> int:
+        """Удаление завершенных задач старше max_age_seconds"""
+
+class SQLiteStateStore(StateStore):
+    """
+    Общее состояние в каталоге на общем томе: задачи и аренды - в SQLite
+    (state.sqlite3), загрузки и слайды - файлами в uploads/ и slides/,
+    кэш анализа - в analysis_cache.sqlite3.
+
+    Содержимое файлов в базу не пишется: SQLite допускает одного писателя,
+    а слайды пишутся в фоне многими потоками. Аренда берется одним
+    оператором UPDATE, поэтому одну задачу не возьмут два экземпляра сразу.
+    """
+    def __init__(self, root: Optional[str | Path] = None, journal_mode: Optional[str] = None,
+                 max_attempts: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.root = Path(root or config.STATE_DIR)
+        self.db_path = self.root / 'state.sqlite3'
+        self.uploads_dir = self.root / 'uploads'
+        self.slides_dir = self.root / 'slides'
+        self.analysis_cache_path = self.root / 'analysis_cache.sqlite3'
+        self.max_attempts = max(1, max_attempts or config.JOB_MAX_ATTEMPTS)
+
+        self.uploads_dir.mkdir(parents=True, exist_ok=True)
+        self.slides_dir.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # WAL - для тома одного хоста; на сетевых томах (NFS) нужен DELETE
+            conn.execute(f"PRAGMA journal_mode={journal_mode or config.STATE_SQLITE_JOURNAL_MODE}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    finished_at REAL,
+                    state TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def create_job(self, job: Job, max_queued: int) -> bool:
+        state = json.dumps(job.to_state(), ensure_ascii=False)
+        with closing(self._connect()) as conn, conn:
+            # Проверка длины очереди и вставка - один оператор
+            return conn.execute("""
+                INSERT INTO jobs (job_id, status, created_at, state)
+                SELECT ?, 'queued', ?, ? WHERE (SELECT COUNT(*) FROM jobs WHERE status = 'queued') < ?
+            """, (job.job_id, job.created_at, state, max_queued)).rowcount == 1
+
+    def claim_job(self, owner: str, lease_seconds: float) -> Optional[Job]:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            # Задачи, чьи экземпляры терялись max_attempts раз, больше не выдаются
+            failed = conn.execute("""
+                UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, owner = NULL
+                WHERE status = 'running' AND lease_expires < ? AND attempts >= ?
+            """, ("Задача не завершена за допустимое число попыток", now, now, self.max_attempts)).rowcount
+            if failed:
+                self.logger.error("Задач без завершения после %s попыток: %s", self.max_attempts, failed)
+
+            row = conn.execute("""
+                UPDATE jobs SET status = 'running', owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE job_id = (
+                    SELECT job_id FROM jobs
+                    WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING state, attempts
+            """, (owner, now + lease_seconds, now)).fetchone()
+
+        if row is None:
+            return None
+        job = Job.from_state(json.loads(row[0]))
+        if row[1] > 1:
+            self.logger.warning("Задача %s взята повторно (попытка %s): аренда истекла", job.job_id, row[1])
+        return job
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, owner)
+            ).rowcount == 1
+
+    def save_job(self, job: Job, owner: str, lease_seconds: float) -> bool:
+        state = job.to_state()
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("""
+                UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires = ?, state = ?
+                WHERE job_id = ? AND owner = ? AND status = 'running'
+            """, (state['status'], state['error'], state['finished_at'], time.time() + lease_seconds,
+                  json.dumps(state, ensure_ascii=False), job.job_id, owner)).rowcount == 1
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT status, error, finished_at, state FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        # Статус - из столбцов: задачу могли взять или завершить, не обновив state
+        job = Job.from_state(json.loads(row[3]))
+        job.status = row[0]
+        job.error = row[1]
+        job.finished_at = row[2]
+        return job
+
+    def file_in_use(self, filepath: str) -> bool:
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT 1 FROM jobs WHERE status IN ('queued', 'running') AND json_extract(state, '$.filepath') = ? "
+                "LIMIT 1", (filepath,)
+            ).fetchone() is not None
+
+    def queued_count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def prune_jobs(self, max_age_seconds: float) -> int:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - max_age_seconds,)
+            ).rowcount
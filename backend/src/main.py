@@ -1,42 +1,70 @@
-import logging
-from pathlib import Path
-from analysis.pdf_processor import PDFProcessor
-from analysis.image_analyzer import ImageAnalyzer
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
-def main():
-    # Инициализация процессоров
+import argparse
+import sys
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.batch_runner import BatchRunner
+from backend.src.utils.logs import configure_logging
+
+# Настройка логирования: LOG_LEVEL и LOG_FORMAT
+configure_logging()
+
+def analyze(args):
+    """Интерактивный анализ одного PDF (или PPT/PPTX)"""
     pdf_processor = PDFProcessor()
-    image_analyzer = ImageAnalyzer()
-    
-    # Путь к тестовому PDF
-    test_pdf = "/Users/l-tune/APPS/DesignAnalyzer/IDENTITY TEST.pdf"
-    
     try:
-        # Конвертация PDF в изображения
-        print("Шаг 1: Конвертация PDF в изображения")
-        image_paths = pdf_processor.process_pdf(test_pdf)
-        print(f"Создано {len(image_paths)} изображений\n")
-        
-        # Анализ изображений
-        print("Шаг 2: Анализ изображений")
-        analysis_results = image_analyzer.analyze_slides(image_paths)
-        
-        # Вывод результатов
-        print("\nРезультаты анализа:")
-        for idx, result in enumerate(analysis_results['slides_analysis']):
-            print(f"\nСлайд {idx + 1}:")
-            print(result['raw_analysis'])
-            
-    except Exception as e:
-        print(f"Произошла ошибка: {str(e)}")
+        print("Анализ слайдов")
+        for result in pdf_processor.process_slides(args.pdf, token_budget=args.token_budget):
+            print(f"\nСлайд {result['slide_number']}:")
+            print(result['analysis'])
     finally:
         pdf_processor.cleanup()
 
+def batch_prepare(args):
+    manifest = BatchRunner(PDFProcessor()).prepare(args.input_dir, args.work_dir)
+    print(f"Подготовлено колод: {len(manifest['decks'])}, файлов запросов: {len(manifest['request_files'])}")
+
+def batch_submit(args):
+    for batch in BatchRunner(PDFProcessor()).submit(args.work_dir):
+        print(f"{batch['request_file']}: {batch['batch_id']} ({batch['status']})")
+
+def batch_fetch(args):
+    finished = BatchRunner(PDFProcessor()).fetch(args.work_dir)
+    print("Все пакеты завершены" if finished else "Пакеты еще обрабатываются")
+    return 0 if finished else 1
+
+def batch_ingest(args):
+    decks = BatchRunner(PDFProcessor()).ingest(args.work_dir)
+    print(f"Сохранены результаты колод: {len(decks)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Анализ дизайна презентаций")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('analyze', help="анализ одного PDF или PPT/PPTX через обычный API")
+    command.add_argument('pdf')
+    command.add_argument('--token-budget', type=int, help="бюджет токенов на колоду")
+    command.set_defaults(func=analyze)
+
+    # Офлайн-анализ архива через Batch API: prepare -> submit -> fetch -> ingest
+    command = commands.add_parser('batch-prepare', help="рендеринг PDF/PPT/PPTX и запись запросов Batch API")
+    command.add_argument('input_dir')
+    command.add_argument('work_dir')
+    command.set_defaults(func=batch_prepare)
+
+    for name, func, help_text in (
+        ('batch-submit', batch_submit, "загрузка запросов и создание пакетов"),
+        ('batch-fetch', batch_fetch, "проверка статуса и загрузка ответов"),
+        ('batch-ingest', batch_ingest, "сборка результатов по колодам"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('work_dir')
+        command.set_defaults(func=func)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args) or 0
+    except Exception as e:
+        print(f"Произошла ошибка: {str(e)}")
+        return 1
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,3 +1,4 @@
 from .config import config
+from .metrics import metrics
 
-__all__ = ['config']
+__all__ = ['config', 'metrics']
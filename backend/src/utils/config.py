@@ -12,8 +12,163 @@ class Config:
     max_file_size_bytes = int(os.getenv('MAX_FILE_SIZE_MB', 50)) * 1024 * 1024
     JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', 90))
     
+    # Рендеринг PDF
+    PDF_RENDER_DPI = int(os.getenv('PDF_RENDER_DPI', 200))
+    PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+    PDF_RENDER_CHUNK_PAGES = int(os.getenv('PDF_RENDER_CHUNK_PAGES', 4))
+    # Рендерить страницы сразу в целевом разрешении (DPI по размеру страницы)
+    PDF_RENDER_TARGET_SIZE = os.getenv('PDF_RENDER_TARGET_SIZE', 'true').lower() in ('1', 'true', 'yes')
+    # Уровень сжатия PNG слайда (0-9): PNG кодируется один раз в процессе
+    # рендеринга, быстрый уровень вместо optimize=True
+    PNG_COMPRESS_LEVEL = int(os.getenv('PNG_COMPRESS_LEVEL', 1))
+    # Потоков фоновой записи слайдов на диск (файлы нужны только для /slides)
+    SLIDE_WRITER_THREADS = int(os.getenv('SLIDE_WRITER_THREADS', 2))
+    
+    # Уменьшенные копии слайдов для страницы результатов: "имя:макс. сторона"
+    # через запятую, формат (webp/jpeg) и качество
+    SLIDE_VARIANTS = os.getenv('SLIDE_VARIANTS', 'thumb:320,preview:1024')
+    SLIDE_VARIANT_FORMAT = os.getenv('SLIDE_VARIANT_FORMAT', 'webp')
+    SLIDE_VARIANT_QUALITY = int(os.getenv('SLIDE_VARIANT_QUALITY', 80))
+    # Срок кэширования слайдов в браузере (имена содержат хэш документа)
+    SLIDES_CACHE_MAX_AGE = int(os.getenv('SLIDES_CACHE_MAX_AGE', 365 * 24 * 3600))
+    
+    # Конвертация PPT/PPTX в PDF пулом прогретых процессов LibreOffice:
+    # размер пула (одновременные конвертации), таймауты и кэш PDF по хэшу файла
+    SOFFICE_PATH = os.getenv('SOFFICE_PATH', 'soffice')
+    OFFICE_POOL_SIZE = int(os.getenv('OFFICE_POOL_SIZE', 2))
+    OFFICE_CONVERT_TIMEOUT = float(os.getenv('OFFICE_CONVERT_TIMEOUT', 120))
+    OFFICE_START_TIMEOUT = float(os.getenv('OFFICE_START_TIMEOUT', 30))
+    OFFICE_MAX_CONVERSIONS_PER_WORKER = int(os.getenv('OFFICE_MAX_CONVERSIONS_PER_WORKER', 200))
+    OFFICE_CACHE_DIR = Path(os.getenv('OFFICE_CACHE_DIR', str(OUTPUT_DIR / 'converted')))
+    OFFICE_CACHE_MAX_FILES = int(os.getenv('OFFICE_CACHE_MAX_FILES', 500))
+    # Запускать процессы LibreOffice в фоне сразу после старта приложения
+    OFFICE_POOL_PREWARM = os.getenv('OFFICE_POOL_PREWARM', 'false').lower() in ('1', 'true', 'yes')
+    
     # OpenAI settings
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
     MAX_TOKENS = int(os.getenv('MAX_TOKENS', 4096))
+    
+    # Пул HTTP-соединений общего клиента OpenAI: соединения переиспользуются
+    # между слайдами, чтобы не тратить время на TLS-рукопожатие
+    OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 32))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 16))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', 30))
+    # Создавать клиент в фоне сразу после запуска приложения
+    OPENAI_CLIENT_PREWARM = os.getenv('OPENAI_CLIENT_PREWARM', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Адаптивный лимит ответа: перцентиль длины ответов (completion_tokens)
+    # в скользящем окне с запасом; MAX_TOKENS остается потолком
+    OUTPUT_CAP_PERCENTILE = float(os.getenv('OUTPUT_CAP_PERCENTILE', 99))
+    OUTPUT_CAP_HEADROOM = float(os.getenv('OUTPUT_CAP_HEADROOM', 1.3))
+    OUTPUT_CAP_MIN_SAMPLES = int(os.getenv('OUTPUT_CAP_MIN_SAMPLES', 20))
+    OUTPUT_CAP_WINDOW = int(os.getenv('OUTPUT_CAP_WINDOW', 500))
+    OUTPUT_CAP_MIN = int(os.getenv('OUTPUT_CAP_MIN', 256))
+    
+    # Бюджет токенов на колоду (задается в запросе): после доли
+    # TOKEN_BUDGET_DEGRADE_AT слайды анализируются с detail=low и моделью
+    # DEGRADED_OPENAI_MODEL (пусто - та же модель)
+    TOKEN_BUDGET_DEGRADE_AT = float(os.getenv('TOKEN_BUDGET_DEGRADE_AT', 0.8))
+    DEGRADED_OPENAI_MODEL = os.getenv('DEGRADED_OPENAI_MODEL', '')
+    
+    # Ограничения и повторы запросов к OpenAI (0 в лимитах - без ограничения)
+    OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', 500))
+    OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', 200000))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 5))
+    OPENAI_RETRY_BASE_DELAY = float(os.getenv('OPENAI_RETRY_BASE_DELAY', 1.0))
+    OPENAI_RETRY_MAX_DELAY = float(os.getenv('OPENAI_RETRY_MAX_DELAY', 60))
+    OPENAI_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', 120))
+    OPENAI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('OPENAI_CIRCUIT_FAILURE_THRESHOLD', 5))
+    OPENAI_CIRCUIT_RESET_SECONDS = float(os.getenv('OPENAI_CIRCUIT_RESET_SECONDS', 30))
+    
+    # Лимиты одного входного файла Batch API
+    BATCH_MAX_FILE_BYTES = int(os.getenv('BATCH_MAX_FILE_BYTES', 190 * 1024 * 1024))
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 50000))
+    
+    # Изображение для vision API: формат (jpeg/webp/png), максимальная сторона
+    # и уровень детализации (low/high/auto); качество берется из JPEG_QUALITY
+    API_IMAGE_FORMAT = os.getenv('API_IMAGE_FORMAT', 'jpeg')
+    API_IMAGE_MAX_SIDE = int(os.getenv('API_IMAGE_MAX_SIDE', 1024))
+    API_IMAGE_DETAIL = os.getenv('API_IMAGE_DETAIL', 'high')
+    
+    # Максимальное число одновременных запросов на анализ слайдов
+    MAX_CONCURRENT_ANALYSES = int(os.getenv('MAX_CONCURRENT_ANALYSES', 4))
+    
+    # Число слайдов в одном запросе к API (1 - отдельный запрос на слайд)
+    # и предел max_tokens для такого запроса
+    ANALYSIS_BATCH_SIZE = int(os.getenv('ANALYSIS_BATCH_SIZE', 1))
+    ANALYSIS_BATCH_MAX_TOKENS = int(os.getenv('ANALYSIS_BATCH_MAX_TOKENS', 16384))
+    
+    # Сводка по колоде после анализа слайдов: один запрос по всем анализам
+    # (каждый обрезается до DECK_SUMMARY_SLIDE_CHARS), резюме - по флагу;
+    # несогласованные слайды (не больше DECK_REFINE_MAX_SLIDES) уточняются
+    DECK_SUMMARY_ENABLED = os.getenv('DECK_SUMMARY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    DECK_SUMMARY_TEXT = os.getenv('DECK_SUMMARY_TEXT', 'true').lower() in ('1', 'true', 'yes')
+    DECK_SUMMARY_MAX_TOKENS = int(os.getenv('DECK_SUMMARY_MAX_TOKENS', 1024))
+    DECK_SUMMARY_SLIDE_CHARS = int(os.getenv('DECK_SUMMARY_SLIDE_CHARS', 1500))
+    DECK_REFINE_ENABLED = os.getenv('DECK_REFINE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    DECK_REFINE_MAX_TOKENS = int(os.getenv('DECK_REFINE_MAX_TOKENS', 800))
+    DECK_REFINE_MAX_SLIDES = int(os.getenv('DECK_REFINE_MAX_SLIDES', 5))
+    
+    # Текстовый слой PDF (pdftotext): при достаточном числе слов слайд
+    # анализируется по тексту с изображением низкой детализации, а почти
+    # без графики (доля площади вне текста) - только по тексту
+    TEXT_LAYER_ENABLED = os.getenv('TEXT_LAYER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    TEXT_LAYER_MIN_WORDS = int(os.getenv('TEXT_LAYER_MIN_WORDS', 8))
+    TEXT_ONLY_MIN_WORDS = int(os.getenv('TEXT_ONLY_MIN_WORDS', 30))
+    TEXT_ONLY_MAX_GRAPHICS = float(os.getenv('TEXT_ONLY_MAX_GRAPHICS', 0.02))
+    TEXT_LAYER_INK_THRESHOLD = int(os.getenv('TEXT_LAYER_INK_THRESHOLD', 40))
+    TEXT_LAYER_MAX_CHARS = int(os.getenv('TEXT_LAYER_MAX_CHARS', 4000))
+    TEXT_LAYER_TIMEOUT = float(os.getenv('TEXT_LAYER_TIMEOUT', 60))
+    
+    # Дедупликация почти одинаковых слайдов: порог расстояния Хэмминга
+    # для dHash размера SLIDE_DEDUP_HASH_SIZE^2 бит и допуск по среднему цвету
+    SLIDE_DEDUP_ENABLED = os.getenv('SLIDE_DEDUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SLIDE_DEDUP_THRESHOLD = int(os.getenv('SLIDE_DEDUP_THRESHOLD', 6))
+    SLIDE_DEDUP_HASH_SIZE = int(os.getenv('SLIDE_DEDUP_HASH_SIZE', 16))
+    SLIDE_DEDUP_COLOR_TOLERANCE = float(os.getenv('SLIDE_DEDUP_COLOR_TOLERANCE', 8))
+    
+    # Кэш результатов анализа; при STATE_BACKEND=sqlite лежит в STATE_DIR
+    # (общий для экземпляров), ANALYSIS_CACHE_PATH тогда не используется
+    ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    ANALYSIS_CACHE_PATH = Path(os.getenv('ANALYSIS_CACHE_PATH', str(OUTPUT_DIR / 'analysis_cache.sqlite3')))
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 10000))
+    ANALYSIS_CACHE_MAX_AGE_DAYS = int(os.getenv('ANALYSIS_CACHE_MAX_AGE_DAYS', 30))
+    
+    # Асинхронный режим сервера (asgi_app.py): одновременные запросы к API
+    # на рабочий процесс и число колод, анализируемых одновременно
+    ASYNC_MAX_CONCURRENT_REQUESTS = int(os.getenv('ASYNC_MAX_CONCURRENT_REQUESTS', 32))
+    ASYNC_MAX_ACTIVE_DECKS = int(os.getenv('ASYNC_MAX_ACTIVE_DECKS', 64))
+    
+    # Фоновые задачи анализа
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 20))
+    JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', 3600))
+    
+    # Общее состояние нескольких экземпляров приложения: local - задачи в
+    # памяти процесса; sqlite - задачи в SQLite, загрузки, слайды и кэш
+    # анализа рядом с базой в STATE_DIR на общем томе (сконвертированные PDF
+    # в OFFICE_CACHE_DIR остаются у каждого экземпляра). Задачу выполняет
+    # экземпляр, взявший ее в аренду на JOB_LEASE_SECONDS (аренда продлевается во время работы);
+    # после JOB_MAX_ATTEMPTS потерянных аренд задача завершается ошибкой
+    STATE_BACKEND = os.getenv('STATE_BACKEND', 'local').lower()
+    STATE_DIR = Path(os.getenv('STATE_DIR', str(OUTPUT_DIR / 'state')))
+    # Журнал SQLite: WAL для тома одного хоста, DELETE для сетевых томов (NFS)
+    STATE_SQLITE_JOURNAL_MODE = os.getenv('STATE_SQLITE_JOURNAL_MODE', 'WAL').upper()
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', 30))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1))
+    JOB_SAVE_INTERVAL = float(os.getenv('JOB_SAVE_INTERVAL', 0.5))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    
+    # Срок хранения папок слайдов документов и период их очистки
+    SLIDES_TTL_SECONDS = int(os.getenv('SLIDES_TTL_SECONDS', 6 * 3600))
+    SLIDES_JANITOR_INTERVAL = int(os.getenv('SLIDES_JANITOR_INTERVAL', 600))
+    
+    # Логирование: уровень, формат (json - одна запись JSON на строку, text),
+    # предел длины сообщения и размер очереди к потоку записи (при
+    # переполнении записи отбрасываются, а не задерживают запрос)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+    LOG_MAX_MESSAGE_CHARS = int(os.getenv('LOG_MAX_MESSAGE_CHARS', 2000))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
 
 config = Config()
@@ -0,0 +1,38 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+from functools import lru_cache
+from typing import Any, Optional
+
+__all__ = ['sse_event', 'file_etag', 'new_upload_id', 'upload_path']
+
+# Идентификатор загрузки: случайное имя файла с исходным расширением
+_UPLOAD_ID = re.compile(r'[0-9a-f]{32}\.(pdf|ppt|pptx)')
+
+def sse_event(event: str, data: Any) -> str:
+    """Событие Server-Sent Events с данными в JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@lru_cache(maxsize=4096)
+def file_etag(path: str, mtime_ns: int, size: int) -> str:
+    """Сильный ETag по содержимому файла; mtime и размер в ключе сбрасывают кэш при перезаписи"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+def new_upload_id(filename: str) -> str:
+    """
+    Уникальное имя сохраняемой загрузки: одноименные файлы разных
+    пользователей не перезаписывают друг друга
+    """
+    return f"{uuid.uuid4().hex}{os.path.splitext(filename)[1].lower()}"
+
+def upload_path(uploads_dir: str, file_id: Optional[str]) -> Optional[str]:
+    """Путь загрузки по идентификатору из /upload или None для чужого формата (в том числе путей)"""
+    if not isinstance(file_id, str) or not _UPLOAD_ID.fullmatch(file_id):
+        return None
+    return os.path.join(uploads_dir, file_id)
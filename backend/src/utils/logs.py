@@ -0,0 +1,150 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, TextIO, Tuple
+from backend.src.utils.config import config
+from backend.src.utils.metrics import metrics
+
+__all__ = ['configure_logging', 'build_queue_logging', 'log_context', 'ContextFilter', 'JsonFormatter',
+           'BoundedQueueHandler']
+
+# Поля контекста в записях: задача, документ, слайд
+CONTEXT_FIELDS = ('job_id', 'doc_id', 'slide')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Поля текущего запроса (см. log_context)
+_log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar('log_context', default={})
+
+_listener = None
+_listener_lock = threading.Lock()
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """
+    Поля job_id, doc_id, slide для записей кода внутри блока.
+
+    Задачи в пулах потоков видят поля, если запущены с копией контекста
+    (budget_context, contextvars.copy_context().run).
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Поля log_context в записи; выполняется в потоке, который пишет в лог"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Запись одной строкой JSON: время, уровень, логгер, сообщение и поля контекста"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        # Трассировку BoundedQueueHandler передает уже отформатированной (exc_text)
+        exc_text = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exc_text:
+            entry['exc_info'] = exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Передача записей потоку QueueListener.
+
+    В потоке запроса только подставляются %-аргументы (и только для
+    записей проходящего уровня), сообщение обрезается до max_chars, а
+    трассировка исключения форматируется в exc_text отдельно от сообщения
+    и не обрезается; JSON и запись в поток вывода выполняются в потоке
+    QueueListener.
+    При переполнении очереди запись отбрасывается, а не блокирует запрос.
+    """
+    def __init__(self, log_queue: queue.Queue, max_chars: int = 0):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # QueueHandler.prepare дописывает трассировку в msg и сбрасывает exc_info:
+        # форматируем ее заранее и передаем без исключения
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        if exc_text:
+            record = copy.copy(record)
+            record.exc_info = None
+            record.exc_text = None
+
+        record = super().prepare(record)
+        if self.max_chars and len(record.msg) > self.max_chars:
+            record.msg = f"{record.msg[:self.max_chars]}... (+{len(record.msg) - self.max_chars} символов)"
+            record.message = record.msg
+        record.exc_text = exc_text
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc('log_records_dropped_total')
+
+def build_queue_logging(stream: Optional[TextIO] = None, log_format: Optional[str] = None,
+                        max_chars: Optional[int] = None,
+                        queue_size: Optional[int] = None) -> Tuple[BoundedQueueHandler, logging.handlers.QueueListener]:
+    """Обработчик для логгера и незапущенный QueueListener, пишущий в stream"""
+    output = logging.StreamHandler(stream or sys.stderr)
+    if (log_format or config.LOG_FORMAT) == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=max(1, queue_size or config.LOG_QUEUE_SIZE))
+    handler = BoundedQueueHandler(log_queue, config.LOG_MAX_MESSAGE_CHARS if max_chars is None else max_chars)
+    handler.addFilter(ContextFilter())
+    return handler, logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None,
+                      force: bool = False) -> Optional[logging.handlers.QueueListener]:
+    """
+    Корневой логгер процесса: записи через очередь пишет фоновый поток.
+
+    Уровень - LOG_LEVEL, формат - LOG_FORMAT. Как и logging.basicConfig,
+    ничего не делает, если у корневого логгера уже есть обработчики (тесты,
+    внешняя конфигурация), пока не задан force. Повторный вызов возвращает
+    уже запущенный QueueListener; поток останавливается при выходе.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+        root = logging.getLogger()
+        if root.handlers and not force:
+            return None
+
+        handler, _listener = build_queue_logging(log_format=log_format)
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level or config.LOG_LEVEL)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
@@ -0,0 +1,229 @@
+import contextvars
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Sequence, Iterator, Tuple
+
+__all__ = ['MetricsRegistry', 'StageTimings', 'metrics', 'collect_timings', 'current_timings']
+
+# Префикс имен метрик в формате Prometheus
+PROMETHEUS_PREFIX = 'designanalyzer_'
+PROMETHEUS_INVALID_CHARS = re.compile(r'[^a-zA-Z0-9_:]')
+
+# Сборщик этапов текущего запроса (см. collect_timings)
+_current_timings: contextvars.ContextVar[Optional['StageTimings']] = contextvars.ContextVar(
+    'stage_timings', default=None)
+
+# Границы корзин по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Ряд метрики: имя и отсортированные пары меток
+_SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def _series(name: str, labels: Optional[Dict[str, Any]]) -> _SeriesKey:
+    return name, tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """Метки в синтаксисе Prometheus: {mode="text"}; без меток - пустая строка"""
+    if not labels:
+        return ''
+    escaped = ((key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+def _series_name(series: _SeriesKey) -> str:
+    """Ключ ряда в snapshot и разбивке запроса: имя с метками, как в Prometheus"""
+    return series[0] + _format_labels(series[1])
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+    
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[idx] += 1
+                break
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max
+        }
+
+class StageTimings:
+    """
+    Разбивка времени одного запроса по этапам и его счетчики (токены, байты)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._counters: Dict[str, float] = {}
+    
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+    
+    def count(self, name: str, value: float):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + value
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'stages': {stage: {'count': entry['count'], 'seconds': round(entry['seconds'], 6)}
+                           for stage, entry in self._stages.items()},
+                'counters': dict(self._counters)
+            }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StageTimings':
+        """Восстановление разбивки из to_dict (задачи в общем хранилище)"""
+        timings = cls()
+        timings._stages = {stage: dict(entry) for stage, entry in data.get('stages', {}).items()}
+        timings._counters = dict(data.get('counters', {}))
+        return timings
+
+def current_timings() -> Optional[StageTimings]:
+    """Сборщик этапов текущего запроса или None"""
+    return _current_timings.get()
+
+@contextmanager
+def collect_timings() -> Iterator[StageTimings]:
+    """
+    Сбор разбивки по этапам для кода внутри блока.
+    
+    Задачи в пулах потоков видят сборщик, только если запущены через
+    contextvars.copy_context().run.
+    """
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+class MetricsRegistry:
+    """
+    Потокобезопасный реестр счетчиков и распределений внутри процесса.
+    
+    Счетчики и распределения принимают метки (labels): ряды одной метрики
+    с разными метками Prometheus видит как одну метрику и может их суммировать.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[_SeriesKey, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[_SeriesKey, _Histogram] = {}
+    
+    def inc(self, name: str, value: float = 1.0, labels: Optional[Dict[str, Any]] = None):
+        """Увеличение счетчика (учитывается и в разбивке текущего запроса)"""
+        series = _series(name, labels)
+        with self._lock:
+            self._counters[series] = self._counters.get(series, 0.0) + value
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.count(_series_name(series), value)
+    
+    def set_gauge(self, name: str, value: float):
+        """Установка текущего значения показателя"""
+        with self._lock:
+            self._gauges[name] = value
+    
+    def add_gauge(self, name: str, delta: float):
+        """Изменение текущего значения показателя на delta"""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0.0) + delta
+    
+    def observe(self, name: str, value: float, buckets: Optional[Sequence[float]] = None,
+                labels: Optional[Dict[str, Any]] = None):
+        """Добавление наблюдения в распределение (корзины задаются при первом вызове)"""
+        series = _series(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(series)
+            if histogram is None:
+                histogram = self._histograms[series] = _Histogram(buckets or DEFAULT_BUCKETS)
+            histogram.observe(value)
+    
+    def record_stage(self, stage: str, seconds: float, buckets: Optional[Sequence[float]] = None):
+        """Время этапа: распределение stage_seconds{stage="<имя>"} и разбивка текущего запроса"""
+        self.observe('stage_seconds', seconds, buckets, labels={'stage': stage})
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+    
+    @contextmanager
+    def span(self, stage: str, buckets: Optional[Sequence[float]] = None) -> Iterator[None]:
+        """Замер времени этапа внутри блока with"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - started, buckets)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения всех метрик; ряды с метками - под ключами вида name{mode="text"}"""
+        with self._lock:
+            return {
+                'counters': {_series_name(series): value for series, value in self._counters.items()},
+                'gauges': dict(self._gauges),
+                'histograms': {_series_name(series): histogram.to_dict()
+                               for series, histogram in self._histograms.items()}
+            }
+    
+    def prometheus(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4"""
+        def metric_name(name: str) -> str:
+            return PROMETHEUS_PREFIX + PROMETHEUS_INVALID_CHARS.sub('_', name)
+        
+        lines = []
+        typed = set()
+        
+        def declare(name: str, kind: str):
+            # Одна строка TYPE на метрику, сколько бы рядов с метками у нее ни было
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+        
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                name = metric_name(name)
+                declare(name, 'counter')
+                lines.append(f"{name}{_format_labels(labels)} {value!r}")
+            for name, value in sorted(self._gauges.items()):
+                name = metric_name(name)
+                lines += [f"# TYPE {name} gauge", f"{name} {value!r}"]
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                name = metric_name(name)
+                declare(name, 'histogram')
+                # Корзины хранятся по отдельности, в Prometheus они накопительные
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", repr(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+                lines += [f"{name}_sum{_format_labels(labels)} {histogram.sum!r}",
+                          f"{name}_count{_format_labels(labels)} {histogram.count}"]
+        return '\n'.join(lines) + '\n'
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+metrics = MetricsRegistry()
@@ -0,0 +1,7 @@
+import os
+
+# Клиент OpenAI создается лениво (get_openai_client): в тестах его фоновый
+# прогрев при импорте app.py не нужен. Ключ - на случай, если тест все же
+# создаст настоящий клиент; запросы к API в тестах не выполняются
+os.environ.setdefault('OPENAI_CLIENT_PREWARM', 'false')
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
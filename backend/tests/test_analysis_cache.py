@@ -0,0 +1,48 @@
+import time
+
+from PIL import Image
+
+from backend.benchmarks.fake_openai import FakeOpenAIClient, FAKE_ANALYSIS
+from backend.src.analysis.analysis_cache import AnalysisCache
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+
+
+def test_hit_miss_and_key_parts(tmp_path):
+    cache = AnalysisCache(tmp_path / 'cache.sqlite3')
+    key = cache.make_key(b'png', 'prompt', 'gpt-4o-mini', 4096)
+
+    assert cache.get(key) is None
+    cache.set(key, 'анализ')
+    assert cache.get(key) == 'анализ'
+    assert cache.make_key(b'png', 'prompt', 'gpt-4o', 4096) != key
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_eviction_by_size_and_age(tmp_path):
+    cache = AnalysisCache(tmp_path / 'cache.sqlite3', max_entries=2, max_age_seconds=3600)
+    for name in ('a', 'b'):
+        cache.set(name, name)
+        time.sleep(0.01)
+    cache.get('a')  # 'b' становится самым давно использованным
+    cache.set('c', 'c')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'a'
+    assert cache.stats()['entries'] == 2
+
+    cache.max_age_seconds = 0.01
+    time.sleep(0.02)
+    assert cache.get('c') is None
+
+
+def test_repeat_analysis_makes_no_api_calls(tmp_path):
+    image_path = tmp_path / 'slide_1.png'
+    Image.new('RGB', (64, 36), 'white').save(image_path)
+    client = FakeOpenAIClient()
+    analyzer = ImageAnalyzer(client=client, cache=AnalysisCache(tmp_path / 'cache.sqlite3'))
+
+    assert analyzer.analyze_image(str(image_path)) == FAKE_ANALYSIS
+    assert analyzer.analyze_image(str(image_path)) == FAKE_ANALYSIS
+    assert client.calls == 1
@@ -0,0 +1,132 @@
+import io
+import json
+
+import pytest
+
+import app as app_module
+from backend.tests.test_job_manager import FakeProcessor, wait_for
+from backend.src.jobs import JobManager
+
+DECK_ID = 'a' * 32 + '.pdf'
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    (tmp_path / DECK_ID).write_bytes(b'%PDF-1.4')
+    processor = FakeProcessor()
+    manager = JobManager(processor, workers=1, queue_size=1)
+    monkeypatch.setattr(app_module, 'job_manager', manager)
+    yield app_module.app.test_client(), processor
+
+
+def test_analyze_returns_job_and_status_is_polled(client):
+    http, processor = client
+    response = http.post('/analyze', json={'file_id': DECK_ID})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    processor.gate.set()
+    wait_for(lambda: http.get(f'/jobs/{job_id}').get_json()['status'] == 'done')
+    assert len(http.get(f'/jobs/{job_id}').get_json()['results']) == 3
+    assert http.get('/jobs/unknown').status_code == 404
+
+
+def test_analyze_returns_429_when_queue_is_full(client):
+    http, processor = client
+    first = http.post('/analyze', json={'file_id': DECK_ID}).get_json()['job_id']
+    wait_for(lambda: http.get(f'/jobs/{first}').get_json()['status'] == 'running')
+    assert http.post('/analyze', json={'file_id': DECK_ID}).status_code == 202
+
+    response = http.post('/analyze', json={'file_id': DECK_ID})
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+    processor.gate.set()
+
+
+def test_slides_are_served_per_document(client, tmp_path, monkeypatch):
+    http, _ = client
+    monkeypatch.setattr(app_module.pdf_processor, 'slides_dir', tmp_path / 'slides')
+    (tmp_path / 'slides' / 'doc1').mkdir(parents=True)
+    (tmp_path / 'slides' / 'doc1' / 'slide_1.png').write_bytes(b'png')
+
+    response = http.get('/slides/doc1/1')
+    assert response.status_code == 200
+    assert response.data == b'png'
+    assert http.get('/slides/doc2/1').status_code == 404
+    assert http.get('/slides/doc1/2').status_code == 404
+
+
+def test_slide_variants_and_conditional_requests(client, tmp_path, monkeypatch):
+    http, _ = client
+    monkeypatch.setattr(app_module.pdf_processor, 'slides_dir', tmp_path / 'slides')
+    doc_dir = tmp_path / 'slides' / 'doc1'
+    doc_dir.mkdir(parents=True)
+    (doc_dir / 'slide_1.png').write_bytes(b'png')
+    (doc_dir / 'slide_1.thumb.webp').write_bytes(b'thumb')
+
+    response = http.get('/slides/doc1/1?size=thumb')
+    assert response.data == b'thumb'
+    assert response.mimetype == 'image/webp'
+    assert 'immutable' in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+
+    assert http.get('/slides/doc1/1?size=thumb', headers={'If-None-Match': etag}).status_code == 304
+    # Копии preview нет: отдается полный PNG со своим ETag
+    preview = http.get('/slides/doc1/1?size=preview')
+    assert preview.data == b'png' and preview.headers['ETag'] != etag
+    assert http.get('/slides/doc1/1?size=huge').status_code == 404
+
+
+def test_metrics_endpoint_and_job_timings(client):
+    http, processor = client
+    response = http.post('/analyze', json={'file_id': DECK_ID, 'timings': True})
+    job_id = response.get_json()['job_id']
+    processor.gate.set()
+    wait_for(lambda: http.get(f'/jobs/{job_id}').get_json()['status'] == 'done')
+
+    assert http.get(f'/jobs/{job_id}').get_json()['timings'] == {'stages': {}, 'counters': {}}
+
+    app_module.metrics.inc('test_requests_total')
+    response = http.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE designanalyzer_test_requests_total counter' in response.get_data(as_text=True)
+
+
+def test_slide_analysis_streams_server_sent_events(client, tmp_path, monkeypatch):
+    http, _ = client
+    from backend.benchmarks.fake_openai import FakeOpenAIClient, FAKE_ANALYSIS
+    from backend.tests.test_image_analyzer import make_analyzer, make_slides
+
+    from backend.src.analysis.pdf_processor import TEXT_LAYER_FILENAME
+    from backend.src.analysis.text_layer import PageText
+
+    openai_client = FakeOpenAIClient()
+    monkeypatch.setattr(app_module.pdf_processor, 'slides_dir', tmp_path / 'slides')
+    monkeypatch.setattr(app_module.pdf_processor, 'image_analyzer', make_analyzer(openai_client))
+    (tmp_path / 'slides' / 'doc1').mkdir(parents=True)
+    make_slides(tmp_path / 'slides' / 'doc1', 1)
+    # Текстовый слой, сохраненный анализом колоды
+    page = PageText(1, ' '.join(['выручка'] * 60), 60, [(0.1, 0.1, 0.9, 0.2)])
+    (tmp_path / 'slides' / 'doc1' / TEXT_LAYER_FILENAME).write_text(json.dumps({1: page.to_dict()}))
+
+    response = http.get('/analyze/doc1/1/stream')
+    assert response.mimetype == 'text/event-stream'
+    events = [block.split('\n') for block in response.get_data(as_text=True).strip().split('\n\n')]
+    assert events[-1][0] == 'event: done'
+    assert ''.join(json.loads(data[6:])['text'] for kind, data in events if kind == 'event: delta') == FAKE_ANALYSIS
+    assert any(page.text in part.get('text', '') for part in openai_client.requests[0]['messages'][1]['content'])
+    assert http.get('/analyze/doc1/2/stream').status_code == 404
+
+
+def test_uploads_get_unique_ids(client, tmp_path):
+    http, _ = client
+    ids = [http.post('/upload', data={'file': (io.BytesIO(body), 'deck.pdf')}).get_json()['file_id']
+           for body in (b'%PDF-1', b'%PDF-2')]
+    assert ids[0] != ids[1]
+    assert [(tmp_path / file_id).read_bytes() for file_id in ids] == [b'%PDF-1', b'%PDF-2']
+
+    # Имя файла и пути вместо идентификатора не принимаются
+    for file_id in ('deck.pdf', '../' + DECK_ID, None):
+        assert http.post('/analyze', json={'file_id': file_id}).status_code == 404
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from backend.benchmarks.fake_openai import FakeAsyncOpenAIClient, FAKE_ANALYSIS
+from backend.src.analysis.analysis_cache import AnalysisCache
+from backend.src.analysis.async_image_analyzer import AsyncImageAnalyzer
+from backend.src.analysis.async_processor import AsyncPDFProcessor
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.request_scheduler import RequestScheduler
+from backend.tests.test_image_analyzer import DeckClient, make_slides
+
+
+class AsyncDeckClient(FakeAsyncOpenAIClient):
+    """Асинхронный DeckClient: сводка на запрос по колоде и исправленный текст на уточнение"""
+    def _response(self, kwargs, *args):
+        response = super()._response(kwargs, *args)
+        prompt = kwargs['messages'][-1]['content']
+        if isinstance(prompt, str):
+            response.choices[0].message.content = (
+                DeckClient.SUMMARY if 'НЕСОГЛАСОВАННЫЕ' in prompt else "исправленный анализ")
+        return response
+
+
+def make_async_analyzer(client, cache=False, max_concurrent_requests=None):
+    return AsyncImageAnalyzer(client=client, cache=cache, max_concurrent_requests=max_concurrent_requests,
+                              scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0))
+
+
+def make_processor(analyzer, image_paths, monkeypatch):
+    processor = PDFProcessor()
+    processor.dedup_enabled = False
+    processor.text_layer_enabled = False
+    monkeypatch.setattr(processor, 'ensure_pdf', lambda pdf_path: pdf_path)
+    monkeypatch.setattr(processor, 'get_page_count', lambda pdf_path: len(image_paths))
+    monkeypatch.setattr(processor, 'iter_pdf',
+                        lambda pdf_path, total_pages=None, doc_id=None: (page for page in enumerate(image_paths, 1)))
+    return AsyncPDFProcessor(processor, analyzer)
+
+
+async def collect(processor, *args, **kwargs):
+    return [event async for event in processor.iter_slides(*args, **kwargs)]
+
+
+def test_async_analyzer_overlaps_requests_and_uses_cache(tmp_path):
+    image_paths = make_slides(tmp_path, 6)
+    client = FakeAsyncOpenAIClient(latency=0.1)
+    analyzer = make_async_analyzer(client, cache=AnalysisCache(tmp_path / 'cache.sqlite3'), max_concurrent_requests=4)
+
+    async def analyze_all():
+        return await asyncio.gather(*(analyzer.analyze_image(str(path)) for path in image_paths))
+
+    assert asyncio.run(analyze_all()) == [FAKE_ANALYSIS] * 6
+    assert client.max_in_flight == 4
+    assert asyncio.run(analyze_all()) == [FAKE_ANALYSIS] * 6
+    assert client.calls == 6
+    # Синхронные методы ImageAnalyzer, вызывающие запросы, не наследуются
+    assert not hasattr(analyzer, 'analyze_slides')
+
+
+def test_async_processor_emits_same_events_as_sync(tmp_path, monkeypatch):
+    image_paths = make_slides(tmp_path, 4)
+    client = AsyncDeckClient()
+    processor = make_processor(make_async_analyzer(client), image_paths, monkeypatch)
+
+    events = asyncio.run(collect(processor, 'deck.pdf', doc_id='doc', context='инвесторы', token_budget=100000))
+
+    kinds = [event['event'] for event in events]
+    assert kinds[0] == 'started' and kinds.count('rendered') == 4 and kinds.count('analyzed') == 4
+    assert kinds[-4:] == ['deduplicated', 'summary', 'refined', 'budget']
+    assert sorted(e['slide_number'] for e in events if e['event'] == 'analyzed') == [1, 2, 3, 4]
+    assert all(e['analysis'] == FAKE_ANALYSIS for e in events if e['event'] == 'analyzed')
+    assert events[-2]['slide_number'] == 2 and events[-2]['analysis'] == "исправленный анализ"
+    # Бюджет колоды виден задачам анализа: учтены все шесть запросов
+    assert events[-1]['requests'] == 6 and events[-1]['spent'] > 0
+    assert client.calls == 6
+
+
+def test_async_processor_groups_slides(tmp_path, monkeypatch):
+    image_paths = make_slides(tmp_path, 5)
+    client = FakeAsyncOpenAIClient(omit_sections={2})
+    processor = make_processor(make_async_analyzer(client), image_paths, monkeypatch)
+    processor.pdf_processor.analysis_batch_size = 2
+    processor.pdf_processor.deck_summary_enabled = False
+
+    events = asyncio.run(collect(processor, 'deck.pdf', doc_id='doc'))
+
+    analyzed = [e for e in events if e['event'] == 'analyzed']
+    assert sorted(e['slide_number'] for e in analyzed) == [1, 2, 3, 4, 5]
+    assert all(e['analysis'] == FAKE_ANALYSIS for e in analyzed)
+    # Две групповые пары, у каждой повтор второго слайда отдельно, и одиночный пятый слайд
+    assert client.calls == 5
+    assert [sum(part['type'] == 'image_url' for part in request['messages'][1]['content'])
+            for request in client.requests].count(2) == 2
+
+
+@pytest.fixture
+def asgi(tmp_path, monkeypatch):
+    pytest.importorskip('httpx')
+    from starlette.testclient import TestClient
+    import asgi_app as asgi_module
+
+    image_paths = make_slides(tmp_path, 3)
+    processor = make_processor(make_async_analyzer(FakeAsyncOpenAIClient()), image_paths, monkeypatch)
+    processor.pdf_processor.deck_summary_enabled = False
+    processor.pdf_processor.slides_dir = tmp_path / 'slides'
+    manager = asgi_module.AsyncJobManager(processor, max_active=1)
+    monkeypatch.setattr(asgi_module, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(asgi_module, 'pdf_processor', processor.pdf_processor)
+    monkeypatch.setattr(asgi_module, 'async_processor', processor)
+    monkeypatch.setattr(asgi_module, 'job_manager', manager)
+    (tmp_path / 'uploads').mkdir()
+    with TestClient(asgi_module.app) as http:
+        yield http, tmp_path
+
+
+def test_asgi_upload_stream_and_cleanup(asgi):
+    http, tmp_path = asgi
+    assert http.post('/upload', files={'file': ('deck.txt', b'x')}).status_code == 400
+    response = http.post('/upload', files={'file': ('deck.pdf', b'%PDF-1.4')}, data={'context': 'инвесторы'})
+    assert response.status_code == 200 and response.json()['success']
+    file_id = response.json()['file_id']
+    assert file_id != http.post('/upload', files={'file': ('deck.pdf', b'%PDF-1.5')}).json()['file_id']
+
+    response = http.post('/analyze', json={'file_id': file_id, 'stream': True, 'timings': True})
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e['event'] for e in events].count('analyzed') == 3
+    assert events[-1]['event'] == 'done' and events[-1]['total_slides'] == 3
+    assert 'api_request' in events[-1]['timings']['stages']
+
+    assert http.post('/analyze', json={'file_id': file_id, 'token_budget': -1}).status_code == 400
+    assert http.post('/analyze', json={'file_id': 'deck.pdf'}).status_code == 404
+    assert http.post('/analyze', json={'file_id': 'b' * 32 + '.pdf'}).status_code == 404
+
+    # Без задач вызывающей стороны общая папка загрузок не очищается
+    assert http.post('/cleanup').json() == {'success': True, 'removed': 0}
+    assert (tmp_path / 'uploads' / file_id).exists()
+
+
+def test_asgi_upload_limit_does_not_trust_content_length(asgi, monkeypatch):
+    import asgi_app as asgi_module
+    http, tmp_path = asgi
+    monkeypatch.setattr(asgi_module, 'MAX_CONTENT_LENGTH', 1000)
+
+    def chunked_body():
+        yield b'--x\r\nContent-Disposition: form-data; name="file"; filename="big.pdf"\r\n\r\n'
+        for _ in range(10):
+            yield b'%' * 500
+        yield b'\r\n--x--\r\n'
+
+    # Без Content-Length (chunked) тело обрывается на лимите
+    response = http.post('/upload', content=chunked_body(), headers={'Content-Type': 'multipart/form-data; boundary=x'})
+    assert response.status_code == 413
+    assert not list((tmp_path / 'uploads').iterdir())
+    assert http.post('/upload', files={'file': ('small.pdf', b'%PDF-1.4')}).status_code == 200
+
+
+def test_asgi_jobs_and_slides(asgi):
+    http, tmp_path = asgi
+    file_id = http.post('/upload', files={'file': ('deck.pdf', b'%PDF-1.4')}).json()['file_id']
+
+    job_id = http.post('/analyze', json={'file_id': file_id}).json()['job_id']
+    for _ in range(100):
+        status = http.get(f'/jobs/{job_id}').json()
+        if status['status'] == 'done':
+            break
+        time.sleep(0.02)
+    assert status['status'] == 'done' and len(status['results']) == 3
+    assert http.get('/jobs/unknown').status_code == 404
+
+    (tmp_path / 'uploads' / 'other.pdf').write_bytes(b'%PDF-1.4')
+    assert http.post('/cleanup', json={'job_ids': 'x'}).status_code == 400
+    assert http.post('/cleanup', json={'job_ids': [job_id, 'unknown']}).json() == {'success': True, 'removed': 1}
+    assert not (tmp_path / 'uploads' / 'deck.pdf').exists()
+    assert (tmp_path / 'uploads' / 'other.pdf').exists()
+
+    doc_dir = tmp_path / 'slides' / 'doc1'
+    doc_dir.mkdir(parents=True)
+    (doc_dir / 'slide_1.png').write_bytes(b'png')
+    response = http.get('/slides/doc1/1')
+    assert response.content == b'png' and 'immutable' in response.headers['cache-control']
+    assert http.get('/slides/doc1/1', headers={'If-None-Match': response.headers['etag']}).status_code == 304
+    assert http.get('/slides/doc1/2').status_code == 404
+
+
+def test_asgi_slide_analysis_stream(asgi):
+    http, tmp_path = asgi
+    (tmp_path / 'slides' / 'doc1').mkdir(parents=True)
+    make_slides(tmp_path / 'slides' / 'doc1', 1)
+
+    response = http.get('/analyze/doc1/1/stream')
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = [block.split('\n') for block in response.text.strip().split('\n\n')]
+    assert ''.join(json.loads(data[6:])['text'] for kind, data in events if kind == 'event: delta') == FAKE_ANALYSIS
+    assert events[-1][0] == 'event: done' and json.loads(events[-1][1][6:])['analysis'] == FAKE_ANALYSIS
+    assert http.get('/analyze/doc1/2/stream').status_code == 404
+
+
+def test_asgi_uses_shared_state_store(tmp_path, monkeypatch):
+    import importlib
+    import asgi_app as asgi_module
+    from backend.src.jobs import SharedJobManager, state_store
+    from backend.src.utils.config import config
+
+    monkeypatch.setattr(config, 'STATE_BACKEND', 'sqlite')
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path / 'state'))
+    monkeypatch.setattr(state_store, '_shared_store', None)
+    try:
+        importlib.reload(asgi_module)
+        store = asgi_module.state_store
+        assert asgi_module.UPLOAD_FOLDER == str(store.uploads_dir)
+        assert asgi_module.pdf_processor.slides_dir == store.slides_dir
+        assert isinstance(asgi_module.job_manager, SharedJobManager) and asgi_module.job_manager.store is store
+        assert asgi_module.job_manager.active == 0
+    finally:
+        monkeypatch.undo()
+        importlib.reload(asgi_module)
@@ -0,0 +1,114 @@
+import json
+
+from PIL import Image
+
+from backend.benchmarks.fake_openai import FakeBatchClient, FAKE_ANALYSIS
+from backend.src.analysis.analysis_cache import AnalysisCache
+from backend.src.analysis.batch_runner import BatchRunner
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.pdf_processor import PDFProcessor
+
+
+def make_runner(tmp_path, client, pages):
+    """Раннер с заглушкой рендеринга: каждый «PDF» дает pages слайдов разного цвета"""
+    cache = AnalysisCache(tmp_path / 'cache.sqlite3')
+    analyzer = ImageAnalyzer(client=client, cache=cache)
+    processor = PDFProcessor(image_analyzer=analyzer)
+
+    def fake_process_pdf(pdf_path, doc_id=None):
+        slides_dir = tmp_path / 'slides' / doc_id
+        slides_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for number in range(1, pages + 1):
+            path = slides_dir / f"slide_{number}.png"
+            Image.new('RGB', (64, 48), (number * 40, len(pdf_path.name), 0)).save(path)
+            paths.append(path)
+        return paths
+
+    processor.process_pdf = fake_process_pdf
+    return BatchRunner(processor)
+
+
+def write_decks(input_dir, names):
+    input_dir.mkdir()
+    for name in names:
+        (input_dir / f"{name}.pdf").write_bytes(f"%PDF {name}".encode())
+
+
+def test_batch_round_trip(tmp_path):
+    client = FakeBatchClient()
+    runner = make_runner(tmp_path, client, pages=3)
+    write_decks(tmp_path / 'in', ['alpha', 'beta'])
+    work_dir = tmp_path / 'work'
+
+    manifest = runner.prepare(tmp_path / 'in', work_dir)
+    lines = (work_dir / 'requests_001.jsonl').read_text().splitlines()
+    assert len(lines) == 6
+    request = json.loads(lines[0])
+    assert request['method'] == 'POST' and request['url'] == '/v1/chat/completions'
+    assert request['custom_id'] == f"0:{manifest['decks'][0]['doc_id']}:1"
+    assert request['body']['messages'][1]['content'][1]['type'] == 'image_url'
+
+    # Вторая колода: слайд 2 завершается ошибкой
+    beta_id = manifest['decks'][1]['doc_id']
+    client.fail_ids = {f"1:{beta_id}:2"}
+    batches = runner.submit(work_dir)
+    assert [b['batch_id'] for b in batches] == ['batch-1']
+    assert runner.fetch(work_dir)
+
+    decks = runner.ingest(work_dir)
+    beta = json.loads((work_dir / 'results' / 'beta.pdf.json').read_text())
+    assert [r['slide_number'] for r in beta['results']] == [1, 2, 3]
+    assert beta['results'][0]['analysis'] == FAKE_ANALYSIS
+    assert beta['results'][1]['analysis'] == "Ошибка при анализе: Internal error"
+    assert beta['results'][2]['image_path'] == f"slides/{beta_id}/3"
+    assert len(decks) == 2
+
+    # Успешные ответы попали в кэш: повторная подготовка не создает запросов
+    manifest = runner.prepare(tmp_path / 'in', work_dir)
+    assert manifest['request_files'] == ['requests_001.jsonl']
+    assert len((work_dir / 'requests_001.jsonl').read_text().splitlines()) == 1
+
+
+def test_requests_split_by_limits_and_pending_batches(tmp_path):
+    client = FakeBatchClient(auto_complete=False)
+    runner = make_runner(tmp_path, client, pages=5)
+    runner.max_requests = 2
+    write_decks(tmp_path / 'in', ['deck'])
+    work_dir = tmp_path / 'work'
+
+    manifest = runner.prepare(tmp_path / 'in', work_dir)
+    assert manifest['request_files'] == ['requests_001.jsonl', 'requests_002.jsonl', 'requests_003.jsonl']
+
+    runner.submit(work_dir)
+    assert not runner.fetch(work_dir)
+    for batch_id in client.batches_by_id:
+        client.complete(batch_id)
+    assert runner.fetch(work_dir)
+
+    results = runner.ingest(work_dir)[manifest['decks'][0]['source']]['results']
+    assert [r['analysis'] for r in results] == [FAKE_ANALYSIS] * 5
+
+
+def test_identical_decks_and_same_stem_do_not_collide(tmp_path):
+    client = FakeBatchClient()
+    runner = make_runner(tmp_path, client, pages=2)
+    runner.pdf_processor.ensure_pdf = lambda path: path
+    input_dir = tmp_path / 'in'
+    input_dir.mkdir()
+    # Одинаковое содержимое - одинаковый doc_id; deck.pdf и deck.pptx - одинаковое имя без расширения
+    for name in ('deck.pdf', 'deck.pptx', 'copy.pdf'):
+        (input_dir / name).write_bytes(b"%PDF same")
+    work_dir = tmp_path / 'work'
+
+    manifest = runner.prepare(input_dir, work_dir)
+    assert len({deck['doc_id'] for deck in manifest['decks']}) == 1
+    custom_ids = [json.loads(line)['custom_id'] for line in (work_dir / 'requests_001.jsonl').read_text().splitlines()]
+    assert len(custom_ids) == len(set(custom_ids)) == 6
+
+    runner.submit(work_dir)
+    assert runner.fetch(work_dir)
+    decks = runner.ingest(work_dir)
+    assert sorted(path.name for path in (work_dir / 'results').iterdir()) == [
+        'copy.pdf.json', 'deck.pdf.json', 'deck.pptx.json']
+    assert all(r['analysis'] == FAKE_ANALYSIS for deck in decks.values() for r in deck['results'])
@@ -0,0 +1,49 @@
+import re
+
+import pytest
+from openai import OpenAI
+
+from backend.benchmarks.bench_suite import _flatten
+from backend.benchmarks.fake_openai_server import FakeOpenAIServer
+from backend.benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def test_fake_server_speaks_openai_protocol():
+    with FakeOpenAIServer(response_chars=1500) as server:
+        client = OpenAI(base_url=server.base_url, api_key='test', max_retries=0)
+        response = client.chat.completions.create(model='gpt-4o-mini', messages=[
+            {'role': 'user', 'content': [{'type': 'text', 'text': 'Слайд'},
+                                         {'type': 'image_url', 'image_url': {'url': 'data:image/jpeg;base64,AA=='}}]}
+        ])
+        assert len(response.choices[0].message.content) == 1500
+        assert response.usage.prompt_tokens > 0
+
+        server.error_rate = 1.0
+        with pytest.raises(Exception) as error:
+            client.chat.completions.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'hi'}])
+        assert getattr(error.value, 'status_code', None) in (429, 500)
+        assert server.requests == 2 and server.errors == 1
+
+
+def test_synthetic_pdf_structure(tmp_path):
+    path = write_synthetic_pdf(tmp_path / 'deck.pdf', 12)
+    data = path.read_bytes()
+
+    assert data.startswith(b'%PDF-1.4') and data.rstrip().endswith(b'%%EOF')
+    assert len(re.findall(rb'/Type /Page\b', data)) == 12
+    assert b'/Count 12' in data
+    # Смещения из таблицы xref указывают на начала объектов
+    xref_offset = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    entries = re.findall(rb'(\d{10}) 00000 n', data[xref_offset:])
+    for number, offset in enumerate(entries, 1):
+        assert data[int(offset):].startswith(f"{number} 0 obj".encode())
+    assert write_synthetic_pdf(tmp_path / 'again.pdf', 12).read_bytes() == data
+
+
+def test_flatten_results_for_comparison():
+    results = {'rasterization': [{'pages': 20, 'pages_per_second': 5.0}], 'analyze': {'stream_total_seconds': 2.5}}
+    assert dict(_flatten(results)) == {
+        'rasterization.20.pages': 20,
+        'rasterization.20.pages_per_second': 5.0,
+        'analyze.stream_total_seconds': 2.5
+    }
@@ -0,0 +1,149 @@
+from PIL import Image
+
+from backend.benchmarks.fake_openai import FakeOpenAIClient, FAKE_ANALYSIS
+from backend.src.analysis.analysis_cache import AnalysisCache
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.request_scheduler import RequestScheduler
+
+
+def make_slides(directory, count):
+    paths = []
+    for idx in range(1, count + 1):
+        path = directory / f"slide_{idx}.png"
+        Image.new('RGB', (64, 36), (idx * 30, 80, 160)).save(path)
+        paths.append(path)
+    return paths
+
+
+def make_analyzer(client, cache=False):
+    return ImageAnalyzer(client=client, cache=cache,
+                         scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0))
+
+
+def test_split_slide_sections():
+    content = "Вступление\n=== СЛАЙД 1 ===\nпервый\n\n== СЛАЙД 3 ==\nтретий\n=== СЛАЙД 9 ===\nлишний\n=== СЛАЙД 2 ===\n"
+    assert ImageAnalyzer.split_slide_sections(content, 3) == {1: "первый", 3: "третий"}
+
+
+def test_group_request_with_fallback_for_missing_section(tmp_path):
+    image_paths = make_slides(tmp_path, 4)
+    client = FakeOpenAIClient(omit_sections={3})
+    analyzer = make_analyzer(client, cache=AnalysisCache(tmp_path / 'cache.sqlite3'))
+
+    assert analyzer.analyze_image_group(image_paths) == [FAKE_ANALYSIS] * 4
+    # Один групповой запрос с четырьмя изображениями и отдельный повтор для слайда 3
+    assert client.calls == 2
+    assert sum(part['type'] == 'image_url' for part in client.requests[0]['messages'][1]['content']) == 4
+
+    # Все слайды теперь в кэше
+    assert analyzer.analyze_image_group(image_paths) == [FAKE_ANALYSIS] * 4
+    assert client.calls == 2
+
+
+def test_processor_batches_slides(tmp_path):
+    image_paths = make_slides(tmp_path, 5)
+    client = FakeOpenAIClient()
+    processor = PDFProcessor(image_analyzer=make_analyzer(client))
+    processor.analysis_batch_size = 2
+
+    results = processor.analyze_images(image_paths)
+
+    assert [r['slide_number'] for r in results] == [1, 2, 3, 4, 5]
+    assert all(r['analysis'] == FAKE_ANALYSIS for r in results)
+    assert client.calls == 3
+
+
+def test_analyzers_share_one_pooled_client(monkeypatch):
+    from backend.src.analysis import openai_client
+
+    monkeypatch.setattr(openai_client, '_shared_client', None)
+    first, second = ImageAnalyzer(cache=False), ImageAnalyzer(cache=False)
+    assert first._client is None  # клиент создается при первом обращении
+
+    assert first.client is second.client is openai_client.get_openai_client()
+    assert first.client.max_retries == 0
+
+
+class DeckClient(FakeOpenAIClient):
+    """Отвечает сводкой на запрос по колоде и исправленным текстом на уточнение"""
+    SUMMARY = "ТЕМЫ: рост, продукт\nКОНЦЕПЦИИ: выручка\nРЕЗЮМЕ: Колода о росте.\nНЕСОГЛАСОВАННЫЕ: 2, 9"
+
+    def _complete(self, kwargs):
+        response = super()._complete(kwargs)
+        prompt = kwargs['messages'][-1]['content']
+        if isinstance(prompt, str):
+            response.choices[0].message.content = (
+                self.SUMMARY if 'НЕСОГЛАСОВАННЫЕ' in prompt else "исправленный анализ")
+        return response
+
+
+def test_parse_deck_summary():
+    deck = ImageAnalyzer.parse_deck_summary(DeckClient.SUMMARY, {1: '', 2: ''})
+    assert deck == {'themes': ['рост', 'продукт'], 'concepts': ['выручка'],
+                    'summary': 'Колода о росте.', 'inconsistent': [2]}
+    assert ImageAnalyzer.parse_deck_summary("темы: а\nНЕСОГЛАСОВАННЫЕ: нет", {1: ''})['inconsistent'] == []
+
+
+def test_iter_slides_summarizes_deck_once_and_refines_flagged(tmp_path, monkeypatch):
+    image_paths = make_slides(tmp_path, 4)
+    client = DeckClient()
+    processor = PDFProcessor(image_analyzer=make_analyzer(client))
+    processor.dedup_enabled = False
+    monkeypatch.setattr(processor, 'get_page_count', lambda pdf_path: len(image_paths))
+    monkeypatch.setattr(processor, 'iter_pdf', lambda pdf_path, total_pages=None, doc_id=None: enumerate(image_paths, 1))
+
+    events = list(processor.iter_slides('deck.pdf', doc_id='doc', context='инвесторы'))
+
+    kinds = [event['event'] for event in events]
+    assert kinds[-2:] == ['summary', 'refined']
+    assert kinds.count('analyzed') == 4 and kinds.index('summary') > max(
+        idx for idx, kind in enumerate(kinds) if kind == 'analyzed')
+    assert events[-2]['themes'] == ['рост', 'продукт'] and events[-2]['inconsistent'] == [2]
+    analyzed = next(e for e in events if e['event'] == 'analyzed' and e['slide_number'] == 2)
+    assert events[-1] == {**analyzed, 'event': 'refined', 'analysis': "исправленный анализ", 'refined': True}
+
+    # Четыре запроса по слайдам, одна сводка и одно уточнение - без запросов после каждого слайда
+    assert client.calls == 6
+    summary_prompt = client.requests[4]['messages'][-1]['content']
+    assert 'инвесторы' in summary_prompt and summary_prompt.count('=== СЛАЙД') == 4
+
+
+def test_stream_image_matches_non_streaming_result(tmp_path):
+    from backend.src.utils.metrics import metrics
+
+    image_path = str(make_slides(tmp_path, 1)[0])
+    client = FakeOpenAIClient(latency=0.05, chunk_latency=0.01)
+    cache = AnalysisCache(tmp_path / 'cache.sqlite3')
+    metrics.reset()
+
+    events = list(make_analyzer(client, cache=cache).stream_image(image_path))
+    deltas = [event['text'] for event in events if event['event'] == 'delta']
+    done = events[-1]
+    assert len(deltas) > 1 and ''.join(deltas) == FAKE_ANALYSIS
+    assert done['event'] == 'done' and done['analysis'] == FAKE_ANALYSIS and not done['cached']
+    # Первый фрагмент приходит после задержки до первого токена, а не после всего ответа
+    assert 0.05 <= done['ttft'] < 0.05 + 0.01 * len(deltas)
+    assert metrics.snapshot()['histograms']['analyzer_ttft_seconds']['count'] == 1
+    assert client.in_flight == 0
+
+    # Итоговый текст сохранен под ключом непотокового анализа
+    assert make_analyzer(client, cache=cache).analyze_image(image_path) == FAKE_ANALYSIS
+    assert client.calls == 1
+    cached = list(make_analyzer(client, cache=cache).stream_image(image_path))
+    assert cached[-1]['cached'] and cached[0]['text'] == FAKE_ANALYSIS
+
+
+def test_analyzer_takes_slide_bytes_from_artifact(tmp_path):
+    from backend.src.analysis.slide_artifact import SlideArtifact
+
+    image_path = make_slides(tmp_path, 1)[0]
+    cache = AnalysisCache(tmp_path / 'cache.sqlite3')
+    client = FakeOpenAIClient()
+    # Файла по пути артефакта нет: анализ не должен обращаться к диску
+    artifact = SlideArtifact(1, tmp_path / 'missing' / 'slide_1.png', image_path.read_bytes(), (64, 36))
+
+    assert make_analyzer(client, cache=cache).analyze_image(artifact) == FAKE_ANALYSIS
+    # Ключ кэша тот же, что и для файла с теми же байтами
+    assert make_analyzer(client, cache=cache).analyze_image(str(image_path)) == FAKE_ANALYSIS
+    assert client.calls == 1
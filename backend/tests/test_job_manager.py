@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+import pytest
+
+from backend.src.jobs import JobManager, JobQueueFullError, remove_expired_uploads, remove_job_uploads
+
+
+class FakeProcessor:
+    """Процессор-заглушка: выдает события iter_slides, пока не открыт шлюз"""
+    def __init__(self, slides=3, fail=False):
+        self.slides = slides
+        self.fail = fail
+        self.gate = threading.Event()
+
+    def iter_slides(self, pdf_path, doc_id=None, context=None, token_budget=None):
+        yield {'event': 'started', 'doc_id': doc_id, 'total_slides': self.slides}
+        for number in range(1, self.slides + 1):
+            yield {'event': 'rendered', 'slide_number': number, 'image_path': f"slides/{doc_id}/{number}"}
+        self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("pdf поврежден")
+        for number in range(self.slides, 0, -1):
+            yield {'event': 'analyzed', 'slide_number': number, 'analysis': f"анализ {number}",
+                   'image_path': f"slides/{doc_id}/{number}"}
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "таймаут ожидания"
+        time.sleep(0.01)
+
+
+def test_job_reports_partial_then_final_results():
+    processor = FakeProcessor()
+    manager = JobManager(processor, workers=1, queue_size=2)
+    job = manager.submit('deck.pdf')
+
+    wait_for(lambda: job.to_dict()['progress']['rendered'] == 3)
+    state = job.to_dict()
+    assert state['status'] == 'running'
+    assert state['results'] == []
+
+    processor.gate.set()
+    wait_for(lambda: job.finished)
+    state = manager.get(job.job_id).to_dict()
+    assert state['status'] == 'done'
+    assert [r['slide_number'] for r in state['results']] == [1, 2, 3]
+    assert state['progress'] == {'total_slides': 3, 'rendered': 3, 'analyzed': 3}
+    assert state['doc_id'] == job.job_id
+    assert state['results'][0]['image_path'] == f"slides/{job.job_id}/1"
+
+
+def test_failed_job_keeps_error():
+    processor = FakeProcessor(fail=True)
+    processor.gate.set()
+    manager = JobManager(processor, workers=1, queue_size=1)
+    job = manager.submit('deck.pdf')
+
+    wait_for(lambda: job.finished)
+    assert job.to_dict()['status'] == 'failed'
+    assert job.to_dict()['error'] == "pdf поврежден"
+
+
+def test_queue_full_rejects_new_jobs():
+    processor = FakeProcessor()
+    manager = JobManager(processor, workers=1, queue_size=1)
+    running = manager.submit('a.pdf')
+    wait_for(lambda: running.status == 'running')
+    manager.submit('b.pdf')
+
+    with pytest.raises(JobQueueFullError):
+        manager.submit('c.pdf')
+    processor.gate.set()
+
+
+def test_cleanup_removes_only_finished_uploads_not_in_use(tmp_path):
+    processor = FakeProcessor()
+    manager = JobManager(processor, workers=1, queue_size=2)
+    deck, other = tmp_path / 'deck.pdf', tmp_path / 'other.pdf'
+    for path in (deck, other):
+        path.write_bytes(b'%PDF-1.4')
+
+    first = manager.submit(str(deck))
+    wait_for(lambda: first.status == 'running')
+    # Задача в работе: ни ее загрузка, ни устаревшие файлы, нужные задачам, не удаляются
+    assert manager.file_in_use(str(deck))
+    assert remove_job_uploads(manager, [first.job_id], tmp_path) == 0
+    os.utime(deck, (0, 0))
+    os.utime(other, (0, 0))
+    assert remove_expired_uploads(tmp_path, 60, manager) == 1
+    assert deck.exists() and not other.exists()
+
+    processor.gate.set()
+    wait_for(lambda: first.finished)
+    assert not manager.file_in_use(str(deck))
+    assert remove_job_uploads(manager, [first.job_id, 'unknown'], tmp_path) == 1
+    assert not deck.exists()
@@ -0,0 +1,133 @@
+import contextvars
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.src.utils.logs import build_queue_logging, log_context
+from backend.src.utils.metrics import metrics
+
+
+def make_logger(name, handler, level=logging.INFO):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def read_records(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_records_carry_context_from_worker_threads():
+    stream = io.StringIO()
+    handler, listener = build_queue_logging(stream, 'json', max_chars=0, queue_size=100)
+    logger = make_logger('test_logs.context', handler)
+
+    listener.start()
+    try:
+        with log_context(job_id='job1', doc_id='doc1'):
+            logger.info("Задача %s запущена", 'job1')
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                # Копия контекста, как у budget_context в процессоре
+                executor.submit(contextvars.copy_context().run, logger.info, "Слайд %s", 2).result()
+        logger.info("Вне задачи")
+    finally:
+        listener.stop()
+
+    records = read_records(stream)
+    assert [record['message'] for record in records] == ["Задача job1 запущена", "Слайд 2", "Вне задачи"]
+    assert records[0]['job_id'] == 'job1' and records[0]['doc_id'] == 'doc1'
+    assert records[1]['job_id'] == 'job1'
+    assert 'job_id' not in records[2]
+    assert records[0]['level'] == 'INFO' and records[0]['logger'] == 'test_logs.context'
+
+
+def test_long_messages_are_truncated():
+    stream = io.StringIO()
+    handler, listener = build_queue_logging(stream, 'json', max_chars=10, queue_size=100)
+    logger = make_logger('test_logs.truncate', handler)
+
+    listener.start()
+    try:
+        logger.info("Ответ: %s", 'x' * 100)
+    finally:
+        listener.stop()
+
+    message = read_records(stream)[0]['message']
+    assert message == "Ответ: xxx... (+97 символов)"
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    metrics.reset()
+    stream = io.StringIO()
+    handler, listener = build_queue_logging(stream, 'json', max_chars=0, queue_size=2)
+    logger = make_logger('test_logs.drop', handler)
+
+    # Поток записи не запущен: очередь заполняется, лишние записи отбрасываются
+    for number in range(5):
+        logger.info("Запись %s", number)
+    listener.start()
+    listener.stop()
+
+    assert [record['message'] for record in read_records(stream)] == ["Запись 0", "Запись 1"]
+    assert metrics.snapshot()['counters']['log_records_dropped_total'] == 3
+
+
+def test_filtered_records_are_not_formatted():
+    stream = io.StringIO()
+    handler, listener = build_queue_logging(stream, 'json', max_chars=0, queue_size=100)
+    logger = make_logger('test_logs.level', handler)
+    calls = []
+
+    class Payload:
+        def __str__(self):
+            calls.append(1)
+            return 'payload'
+
+    listener.start()
+    try:
+        logger.debug("Результаты: %s", Payload())
+    finally:
+        listener.stop()
+
+    assert calls == []
+    assert stream.getvalue() == ''
+
+
+def test_traceback_is_a_separate_field_and_not_truncated():
+    stream = io.StringIO()
+    handler, listener = build_queue_logging(stream, 'json', max_chars=10, queue_size=100)
+    logger = make_logger('test_logs.exc', handler)
+
+    listener.start()
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Ошибка: %s", 'x' * 100)
+    finally:
+        listener.stop()
+
+    record = read_records(stream)[0]
+    assert record['message'] == "Ошибка: xx... (+98 символов)"
+    assert record['exc_info'].startswith('Traceback') and record['exc_info'].endswith('ZeroDivisionError: division by zero')
+
+
+def test_text_format_keeps_traceback():
+    stream = io.StringIO()
+    handler, listener = build_queue_logging(stream, 'text', max_chars=0, queue_size=100)
+    logger = make_logger('test_logs.exc_text', handler)
+
+    listener.start()
+    try:
+        try:
+            raise ValueError("сбой")
+        except ValueError:
+            logger.exception("Ошибка")
+    finally:
+        listener.stop()
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0].endswith(" - ERROR - Ошибка") and lines[-1] == "ValueError: сбой"
@@ -0,0 +1,58 @@
+from backend.benchmarks.fake_openai import FakeOpenAIClient
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.request_scheduler import RequestScheduler
+from backend.src.utils.metrics import MetricsRegistry, collect_timings, metrics
+from backend.tests.test_image_analyzer import make_slides
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.inc('requests_total', 3)
+    registry.set_gauge('queue depth', 2)
+    for value in (0.05, 0.3, 100):
+        registry.observe('latency_seconds', value, buckets=(0.1, 1))
+
+    lines = registry.prometheus().splitlines()
+
+    assert '# TYPE designanalyzer_requests_total counter' in lines
+    assert 'designanalyzer_requests_total 3.0' in lines
+    assert 'designanalyzer_queue_depth 2' in lines
+    # Корзины накопительные, +Inf равна общему числу наблюдений
+    assert 'designanalyzer_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'designanalyzer_latency_seconds_bucket{le="1"} 2' in lines
+    assert 'designanalyzer_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'designanalyzer_latency_seconds_count 3' in lines
+
+
+def test_labeled_series_share_one_metric():
+    registry = MetricsRegistry()
+    registry.inc('slides_total', labels={'mode': 'text'})
+    registry.inc('slides_total', 2, labels={'mode': 'image'})
+    registry.observe('request_seconds', 0.05, buckets=(0.1,), labels={'mode': 'text'})
+
+    lines = registry.prometheus().splitlines()
+
+    assert lines.count('# TYPE designanalyzer_slides_total counter') == 1
+    assert 'designanalyzer_slides_total{mode="image"} 2.0' in lines
+    assert 'designanalyzer_slides_total{mode="text"} 1.0' in lines
+    assert 'designanalyzer_request_seconds_bucket{mode="text",le="0.1"} 1' in lines
+    assert 'designanalyzer_request_seconds_count{mode="text"} 1' in lines
+    assert registry.snapshot()['counters']['slides_total{mode="image"}'] == 2
+
+
+def test_stage_timings_follow_request_into_worker_threads(tmp_path):
+    analyzer = ImageAnalyzer(client=FakeOpenAIClient(), cache=False,
+                             scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0))
+    processor = PDFProcessor(image_analyzer=analyzer)
+    image_paths = make_slides(tmp_path, 3)
+
+    with collect_timings() as timings:
+        processor.analyze_images(image_paths)
+    processor.analyze_images(image_paths)  # вне блока в разбивку не попадает
+
+    breakdown = timings.to_dict()
+    assert breakdown['stages']['api_request']['count'] == 3
+    assert breakdown['stages']['payload_encode']['count'] == 3
+    assert breakdown['counters']['analyzer_prompt_tokens_total'] > 0
+    assert metrics.snapshot()['histograms']['stage_seconds{stage="api_request"}']['count'] >= 6
@@ -0,0 +1,126 @@
+import sys
+import threading
+
+import pytest
+
+from backend.src.analysis import pdf_processor as pdf_processor_module
+from backend.src.analysis.office_converter import OfficeConverter, OfficeConversionError
+from backend.src.analysis.pdf_processor import PDFProcessor
+
+# Заглушка soffice: с --accept изображает прогретый процесс, с --convert-to
+# пишет PDF в --outdir; содержимое "hang" зависает, "slow" конвертируется 0.3 с
+FAKE_SOFFICE = """#!{python}
+import os, sys, time
+from pathlib import Path
+
+args = sys.argv[1:]
+log = Path(os.environ['FAKE_SOFFICE_LOG'])
+if any(arg.startswith('--accept') for arg in args):
+    with log.open('a') as f:
+        f.write('start\\n')
+    time.sleep(3600)
+
+source = Path(args[-1])
+content = source.read_bytes()
+with log.open('a') as f:
+    f.write(f'begin {{time.monotonic()}}\\n')
+if b'hang' in content:
+    time.sleep(30)
+if b'slow' in content:
+    time.sleep(0.3)
+outdir = Path(args[args.index('--outdir') + 1])
+(outdir / (source.stem + '.pdf')).write_bytes(b'%PDF-1.4 ' + content)
+with log.open('a') as f:
+    f.write(f'end {{time.monotonic()}}\\n')
+"""
+
+
+@pytest.fixture
+def converter(tmp_path, monkeypatch):
+    soffice = tmp_path / 'soffice'
+    soffice.write_text(FAKE_SOFFICE.format(python=sys.executable))
+    soffice.chmod(0o755)
+    log = tmp_path / 'soffice.log'
+    log.touch()
+    monkeypatch.setenv('FAKE_SOFFICE_LOG', str(log))
+
+    created = []
+
+    def make(**kwargs):
+        converter = OfficeConverter(soffice=str(soffice), cache_dir=tmp_path / 'converted', **kwargs)
+        created.append(converter)
+        return converter, log
+
+    yield make
+    for converter in created:
+        converter.close()
+
+
+def log_lines(log, prefix):
+    return [line for line in log.read_text().splitlines() if line.startswith(prefix)]
+
+
+def test_conversion_is_cached_by_content(tmp_path, converter):
+    office, log = converter(size=1, timeout=10)
+    first = tmp_path / 'deck.pptx'
+    first.write_bytes(b'slides')
+    copy = tmp_path / 'copy.pptx'
+    copy.write_bytes(b'slides')
+
+    pdf = office.convert(first)
+    assert pdf.read_bytes() == b'%PDF-1.4 slides'
+    assert office.convert(copy) == pdf
+
+    assert len(log_lines(log, 'begin')) == 1
+    # Прогретый процесс запускается один раз
+    assert len(log_lines(log, 'start')) == 1
+    # Блокировки по хэшу файла не копятся после конвертации
+    assert office._key_locks == {}
+
+
+def test_pool_limits_concurrent_conversions(tmp_path, converter):
+    office, log = converter(size=1, timeout=10)
+    sources = []
+    for idx in range(3):
+        source = tmp_path / f"deck_{idx}.pptx"
+        source.write_bytes(b'slow %d' % idx)
+        sources.append(source)
+
+    threads = [threading.Thread(target=office.convert, args=(source,)) for source in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    begins = sorted(float(line.split()[1]) for line in log_lines(log, 'begin'))
+    ends = sorted(float(line.split()[1]) for line in log_lines(log, 'end'))
+    assert len(begins) == 3
+    assert all(begin >= end for begin, end in zip(begins[1:], ends))
+    assert office._key_locks == {}
+
+
+def test_timeout_restarts_worker(tmp_path, converter):
+    office, log = converter(size=1, timeout=0.5)
+    hung = tmp_path / 'hung.pptx'
+    hung.write_bytes(b'hang')
+    with pytest.raises(OfficeConversionError):
+        office.convert(hung)
+
+    fine = tmp_path / 'fine.ppt'
+    fine.write_bytes(b'ok')
+    assert office.convert(fine).read_bytes() == b'%PDF-1.4 ok'
+    assert len(log_lines(log, 'start')) == 2
+
+
+def test_processor_converts_office_files(tmp_path, monkeypatch):
+    converted = tmp_path / 'converted.pdf'
+
+    class StubConverter:
+        def convert(self, source):
+            return converted
+
+    monkeypatch.setattr(pdf_processor_module, 'get_office_converter', StubConverter)
+    processor = PDFProcessor()
+
+    assert processor.ensure_pdf(tmp_path / 'deck.PPTX') == converted
+    assert processor.ensure_pdf(tmp_path / 'deck.pdf') == tmp_path / 'deck.pdf'
@@ -0,0 +1,52 @@
+import io
+
+from PIL import Image
+
+from backend.benchmarks.fake_openai import FakeOpenAIClient
+from backend.src.analysis.image_analyzer import ImageAnalyzer
+from backend.src.analysis.payload_encoder import PayloadEncoder
+from backend.src.utils.metrics import metrics
+
+
+def png_bytes(size=(2000, 1125)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 40).convert('RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_encode_downscales_to_jpeg():
+    source = png_bytes()
+    payload = PayloadEncoder(max_side=1024, image_format='jpeg', quality=80, detail='low').encode(source)
+
+    assert payload.mime_type == 'image/jpeg'
+    assert payload.size == (1024, 576)
+    assert payload.source_bytes == len(source)
+    assert len(payload.data) < len(source)
+    assert payload.data_url().startswith('data:image/jpeg;base64,')
+    with Image.open(io.BytesIO(payload.data)) as image:
+        assert image.format == 'JPEG'
+
+
+def test_small_png_is_sent_unchanged():
+    source = png_bytes((300, 200))
+    payload = PayloadEncoder(max_side=1024, image_format='png').encode(source)
+    assert payload.data == source
+    assert payload.mime_type == 'image/png'
+
+
+def test_analyzer_sends_compact_payload_with_detail(tmp_path):
+    image_path = tmp_path / 'slide_1.png'
+    image_path.write_bytes(png_bytes())
+    client = FakeOpenAIClient()
+    analyzer = ImageAnalyzer(client=client, cache=False,
+                             payload_encoder=PayloadEncoder(max_side=512, image_format='webp', detail='low'))
+    metrics.reset()
+
+    assert analyzer.analyze_image(str(image_path))
+
+    image_url = client.requests[0]['messages'][1]['content'][1]['image_url']
+    assert image_url['url'].startswith('data:image/webp;base64,')
+    assert image_url['detail'] == 'low'
+    snapshot = metrics.snapshot()
+    assert snapshot['counters']['analyzer_payload_bytes_total'] == len(image_url['url'])
+    assert snapshot['histograms']['analyzer_request_seconds']['count'] == 1
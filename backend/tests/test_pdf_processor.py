@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+
+import pytest
+
+from backend.src.analysis.pdf_processor import PDFProcessor
+
+
+class FakeAnalyzer:
+    """Анализатор-заглушка: задержка убывает с номером слайда, чтобы ответы приходили не по порядку"""
+    def __init__(self, total, fail=(), empty=()):
+        self.total = total
+        self.fail = set(fail)
+        self.empty = set(empty)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def analyze_image(self, image_path):
+        number = int(image_path.rsplit('_', 1)[1].split('.')[0])
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01 * (self.total - number))
+            if number in self.fail:
+                raise RuntimeError("сбой API")
+            if number in self.empty:
+                return None
+            return f"анализ {number}"
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def image_paths(tmp_path):
+    return [tmp_path / f"slide_{idx}.png" for idx in range(1, 7)]
+
+
+def test_analyze_images_keeps_order_and_placeholders(image_paths):
+    analyzer = FakeAnalyzer(len(image_paths), fail={2}, empty={5})
+    processor = PDFProcessor(image_analyzer=analyzer)
+    processor.max_concurrent_analyses = 3
+
+    results = processor.analyze_images(image_paths)
+
+    assert [r['slide_number'] for r in results] == [1, 2, 3, 4, 5, 6]
+    assert results[0]['analysis'] == "анализ 1"
+    assert results[1]['analysis'] == "Ошибка при анализе: сбой API"
+    assert results[4]['analysis'] == "Не удалось проанализировать слайд"
+    assert results[5]['image_path'] == f"slides/{image_paths[0].parent.name}/6"
+    assert 1 < analyzer.max_in_flight <= 3
+
+
+def test_iter_slides_streams_rendered_then_analyzed(image_paths, monkeypatch):
+    analyzer = FakeAnalyzer(len(image_paths))
+    processor = PDFProcessor(image_analyzer=analyzer)
+    processor.deck_summary_enabled = False
+    monkeypatch.setattr(processor, 'get_page_count', lambda pdf_path: len(image_paths))
+    monkeypatch.setattr(processor, 'iter_pdf', lambda pdf_path, total_pages=None, doc_id=None: enumerate(image_paths, 1))
+
+    events = list(processor.iter_slides('deck.pdf', doc_id='job1'))
+
+    assert events[0] == {'event': 'started', 'doc_id': 'job1', 'total_slides': 6}
+    for number in range(1, 7):
+        rendered = events.index({'event': 'rendered', 'slide_number': number, 'image_path': f"slides/job1/{number}"})
+        analyzed = next(i for i, e in enumerate(events) if e['event'] == 'analyzed' and e['slide_number'] == number)
+        assert rendered < analyzed
+
+    monkeypatch.setattr(processor, 'document_id', lambda pdf_path: 'hash')
+    results = processor.process_slides('deck.pdf')
+    assert [r['analysis'] for r in results] == [f"анализ {n}" for n in range(1, 7)]
+
+
+def test_rendering_waits_for_analysis_on_long_decks(tmp_path, monkeypatch):
+    total = 60
+
+    class SlowAnalyzer:
+        def analyze_image(self, image_path):
+            time.sleep(0.005)
+            return "анализ"
+
+    processor = PDFProcessor(image_analyzer=SlowAnalyzer())
+    processor.max_concurrent_analyses = 2
+    processor.dedup_enabled = processor.deck_summary_enabled = processor.text_layer_enabled = False
+    monkeypatch.setattr(processor, 'get_page_count', lambda pdf_path: total)
+
+    # Страницы в памяти, еще не получившие анализ: рендеринг идет намного быстрее API
+    produced, analyzed, peak = [0], [0], [0]
+
+    def iter_pdf(pdf_path, total_pages=None, doc_id=None):
+        for number in range(1, total + 1):
+            peak[0] = max(peak[0], produced[0] - analyzed[0])
+            produced[0] += 1
+            yield number, str(tmp_path / f"slide_{number}.png")
+
+    monkeypatch.setattr(processor, 'iter_pdf', iter_pdf)
+    for event in processor.iter_slides('deck.pdf', doc_id='doc'):
+        if event['event'] == 'analyzed':
+            analyzed[0] += 1
+
+    assert analyzed[0] == total
+    assert peak[0] <= 2 * processor.max_concurrent_analyses
+
+
+def test_document_dirs_are_isolated_and_expire(tmp_path):
+    processor = PDFProcessor(image_analyzer=FakeAnalyzer(1))
+    processor.slides_dir = tmp_path
+    for doc_id in ('doc_a', 'doc_b'):
+        processor.document_dir(doc_id).mkdir()
+        (processor.document_dir(doc_id) / 'slide_1.png').write_bytes(doc_id.encode())
+
+    assert processor.get_slide_path('doc_a', 1).read_bytes() == b'doc_a'
+    assert processor.get_slide_path('doc_b', 1).read_bytes() == b'doc_b'
+    assert processor.get_slide_path('doc_a', 2) is None
+    assert processor.get_slide_path('..', 1) is None
+    with pytest.raises(ValueError):
+        processor.document_dir('../etc')
+
+    os.utime(processor.document_dir('doc_a'), (time.time() - 100, time.time() - 100))
+    assert processor.cleanup_expired_slides(50) == 1
+    assert not processor.document_dir('doc_a').exists()
+    assert processor.document_dir('doc_b').exists()
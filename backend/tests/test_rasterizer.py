@@ -0,0 +1,146 @@
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from backend.src.analysis import rasterizer
+from backend.src.analysis.rasterizer import PDFRasterizer, parse_page_sizes
+from backend.src.analysis.slide_artifact import SlideArtifact, SlideWriter
+
+
+def fake_convert_from_path(calls):
+    """Подмена pdf2image: пишет страницы в output_folder, как pdftoppm"""
+    def convert(pdf_path, dpi, first_page, last_page, output_folder, paths_only):
+        calls.append((first_page, last_page, dpi))
+        paths = []
+        for page in range(first_page, last_page + 1):
+            path = Path(output_folder) / f"render-{page:03d}.ppm"
+            Image.new('RGB', (3000, 1500), (page, 0, 0)).save(path)
+            paths.append(str(path))
+        return paths
+    return convert
+
+
+def test_page_ranges_split_by_chunk_and_dpi():
+    pdf_rasterizer = PDFRasterizer(dpi=200, workers=1, chunk_pages=4)
+    assert pdf_rasterizer.page_ranges(10) == [(1, 4, 200.0), (5, 8, 200.0), (9, 10, 200.0)]
+    assert pdf_rasterizer.page_ranges(0) == []
+    assert pdf_rasterizer.page_ranges(4, [150.0, 150.0, 100.0, 150.0]) == [
+        (1, 2, 150.0), (3, 3, 100.0), (4, 4, 150.0)
+    ]
+
+
+def test_target_dpi_from_page_box():
+    info = {
+        'Pages': 3,
+        'Page    1 size': '960 x 540 pts',
+        'Page    1 rot': '0',
+        'Page    2 size': '612 x 792 pts (letter)',
+        'Page    2 rot': '90',
+        'Page    3 size': '100 x 100 pts',
+    }
+    sizes = parse_page_sizes(info)
+    assert sizes == {1: (960.0, 540.0), 2: (792.0, 612.0), 3: (100.0, 100.0)}
+
+    pdf_rasterizer = PDFRasterizer(dpi=200, workers=1, target_size=True)
+    # 16:9 слайд в 960 пт шириной: 2000 px по ширине соответствуют 150 DPI
+    assert pdf_rasterizer.target_dpi(sizes[1]) == 150.0
+    # Маленькая страница не превышает лимит и при базовом DPI
+    assert pdf_rasterizer.target_dpi(sizes[3]) == 200.0
+    assert round(sizes[2][0] * pdf_rasterizer.target_dpi(sizes[2]) / 72) <= 2000
+
+
+def test_iter_pages_renders_in_chunks_and_resizes(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(rasterizer.pdf2image, 'convert_from_path', fake_convert_from_path(calls))
+    pdf_rasterizer = PDFRasterizer(dpi=150, workers=1, chunk_pages=2, target_size=False)
+
+    pages = list(pdf_rasterizer.iter_pages(tmp_path / 'deck.pdf', 5, tmp_path))
+
+    assert calls == [(1, 2, 150), (3, 4, 150), (5, 5, 150)]
+    assert [number for number, _ in pages] == [1, 2, 3, 4, 5]
+    with Image.open(pages[2][1]) as image:
+        assert image.size == (2000, 1000)
+        assert image.getpixel((0, 0))[0] == 3
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_pool_renders_next_range_only_when_consumer_takes_pages(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(rasterizer.pdf2image, 'convert_from_path', fake_convert_from_path(calls))
+    pdf_rasterizer = PDFRasterizer(dpi=50, workers=2, chunk_pages=1, target_size=False, variants=())
+    # Пул потоков вместо процессов: подмена pdf2image видна рендерингу
+    pdf_rasterizer._executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        pages = pdf_rasterizer.iter_pages(tmp_path / 'deck.pdf', 6, tmp_path)
+        assert next(pages)[0] == 1
+        time.sleep(0.2)
+        # В работе не больше workers диапазонов, а не все 6 страниц
+        assert len(calls) == 3
+        assert [number for number, _ in pages] == list(range(2, 7))
+        assert len(calls) == 6
+    finally:
+        pdf_rasterizer.close(wait=True)
+
+
+def test_iter_pages_uses_per_page_dpi(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(rasterizer.pdf2image, 'convert_from_path', fake_convert_from_path(calls))
+    monkeypatch.setattr(rasterizer.pdf2image, 'pdfinfo_from_path', lambda pdf_path, first_page, last_page: {
+        'Pages': 3,
+        'Page    1 size': '960 x 540 pts',
+        'Page    2 size': '960 x 540 pts',
+        'Page    3 size': '100 x 100 pts',
+    })
+    pdf_rasterizer = PDFRasterizer(dpi=200, workers=1, chunk_pages=4, target_size=True)
+
+    list(pdf_rasterizer.iter_pages(tmp_path / 'deck.pdf', 3, tmp_path))
+
+    assert calls == [(1, 2, 150.0), (3, 3, 200.0)]
+
+
+def test_render_writes_variants(tmp_path, monkeypatch):
+    monkeypatch.setattr(rasterizer.pdf2image, 'convert_from_path', fake_convert_from_path([]))
+    pdf_rasterizer = PDFRasterizer(dpi=150, workers=1, target_size=False,
+                                   variants=(('thumb', 320), ('preview', 1024)), variant_format='webp')
+
+    list(pdf_rasterizer.iter_pages(tmp_path / 'deck.pdf', 1, tmp_path))
+
+    with Image.open(tmp_path / 'slide_1.preview.webp') as preview, Image.open(tmp_path / 'slide_1.thumb.webp') as thumb:
+        assert (preview.format, preview.size) == ('WEBP', (1024, 512))
+        assert thumb.size == (320, 160)
+    assert pdf_rasterizer.variant_filename(1, 'thumb') == 'slide_1.thumb.webp'
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_iter_pages_yields_in_memory_artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(rasterizer.pdf2image, 'convert_from_path', fake_convert_from_path([]))
+    pdf_rasterizer = PDFRasterizer(dpi=150, workers=1, target_size=False, variants=(('thumb', 320),))
+
+    pages = pdf_rasterizer.iter_pages(tmp_path / 'deck.pdf', 2, tmp_path)
+    number, artifact = next(pages)
+    # Байты PNG доступны сразу, файл пишется в фоне
+    assert isinstance(artifact, SlideArtifact) and artifact.size == (2000, 1000)
+    assert os.fspath(artifact) == str(tmp_path / 'slide_1.png')
+    assert list(artifact.variants) == ['slide_1.thumb.webp']
+    artifact.saved.result()
+    assert (tmp_path / 'slide_1.png').read_bytes() == artifact.data
+    assert len(list(pages)) == 1 and (tmp_path / 'slide_2.thumb.webp').exists()
+
+    # Из процесса пула артефакт передается без Future записи
+    copy = pickle.loads(pickle.dumps(artifact))
+    assert copy.data == artifact.data and copy.path == artifact.path and copy.saved is None
+
+
+def test_concurrent_writes_of_same_slide_do_not_collide(tmp_path):
+    # Одну колоду (тот же doc_id) рендерят две задачи одновременно
+    artifacts = [SlideArtifact(1, tmp_path / 'slide_1.png', bytes([idx]) * 200000, (10, 10),
+                               {'slide_1.thumb.webp': bytes([idx]) * 1000}) for idx in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(SlideWriter.write, artifacts))
+
+    assert (tmp_path / 'slide_1.png').read_bytes() in {artifact.data for artifact in artifacts}
+    assert not list(tmp_path.glob('*.tmp'))
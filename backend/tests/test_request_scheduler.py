@@ -0,0 +1,141 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.src.analysis.request_scheduler import RequestScheduler, TokenBucket, CircuitOpenError
+from backend.src.utils.metrics import metrics
+
+
+class FakeClock:
+    """Управляемое время: sleep сдвигает часы вместо ожидания"""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class APIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def flaky(errors, result='ok'):
+    """Функция, которая сначала выбрасывает ошибки из списка, затем возвращает result"""
+    calls = []
+    def func(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    func.calls = calls
+    return func
+
+
+def make_scheduler(clock, **kwargs):
+    options = dict(requests_per_minute=0, tokens_per_minute=0, max_retries=3, base_delay=1, max_delay=30,
+                   request_timeout=10, failure_threshold=2, reset_timeout=60)
+    options.update(kwargs)
+    return RequestScheduler(clock=clock, sleep=clock.sleep, **options)
+
+
+def test_token_bucket_reports_wait_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)  # 1 токен в секунду
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(2) == pytest.approx(2)
+    clock.now += 2
+    assert bucket.reserve(1) == pytest.approx(1)
+
+
+def test_retries_transient_errors_and_honors_retry_after():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    func = flaky([APIError(429, retry_after=7), APIError(503)])
+
+    assert scheduler.call(func, model='m') == 'ok'
+    assert len(func.calls) == 3
+    assert func.calls[0] == {'model': 'm', 'timeout': 10}
+    assert clock.sleeps[0] >= 7
+    assert 0 <= clock.sleeps[1] <= 2
+
+
+def test_client_errors_are_not_retried():
+    clock = FakeClock()
+    func = flaky([APIError(400)])
+    with pytest.raises(APIError):
+        make_scheduler(clock).call(func)
+    assert len(func.calls) == 1
+
+
+def test_rate_limit_throttles_and_reports_metrics():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_minute=60, tokens_per_minute=600)
+    metrics.reset()
+
+    for _ in range(3):
+        scheduler.call(flaky([]), estimated_tokens=300)
+
+    # Третий запрос ждет пополнения квоты токенов: 300 токенов при 10 в секунду
+    assert clock.sleeps == [pytest.approx(30)]
+    snapshot = metrics.snapshot()
+    assert snapshot['counters']['scheduler_throttled_total'] == 1
+    assert snapshot['gauges']['scheduler_queue_depth'] == 0
+
+
+def test_circuit_opens_and_recovers_after_probe():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_retries=0)
+
+    for _ in range(2):
+        with pytest.raises(APIError):
+            scheduler.call(flaky([APIError(500)]))
+    assert scheduler.circuit_state == 'open'
+
+    untouched = flaky([])
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(untouched)
+    assert untouched.calls == []
+
+    clock.now += 61
+    assert scheduler.circuit_state == 'half_open'
+    assert scheduler.call(flaky([])) == 'ok'
+    assert scheduler.circuit_state == 'closed'
+
+
+def async_flaky(errors, result='ok'):
+    """Асинхронный вариант flaky"""
+    func = flaky(errors, result)
+    async def afunc(**kwargs):
+        return func(**kwargs)
+    afunc.calls = func.calls
+    return afunc
+
+
+def test_async_call_shares_retries_and_circuit():
+    clock = FakeClock()
+
+    async def sleep(seconds):
+        clock.sleep(seconds)
+
+    scheduler = make_scheduler(clock, max_retries=1, failure_threshold=1, async_sleep=sleep)
+    func = async_flaky([APIError(429, retry_after=3)])
+
+    assert asyncio.run(scheduler.acall(func, model='m')) == 'ok'
+    assert func.calls == [{'model': 'm', 'timeout': 10}] * 2
+    assert clock.sleeps[0] >= 3
+
+    with pytest.raises(APIError):
+        asyncio.run(scheduler.acall(async_flaky([APIError(500)] * 2)))
+    # Выключатель общий с синхронными вызовами
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(flaky([]))
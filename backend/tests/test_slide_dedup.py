@@ -0,0 +1,99 @@
+from PIL import Image, ImageDraw
+
+from backend.src.analysis.deck_events import ANALYSIS_EMPTY_PLACEHOLDER, DeckEvents
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.slide_dedup import SlideDeduplicator
+
+
+def draw_slide(path, background='white', bullets=3, title_x=40):
+    """Слайд с заголовком и пунктами; bullets - число показанных шагов анимации"""
+    image = Image.new('RGB', (800, 450), background)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((title_x, 30, title_x + 500, 90), fill='navy')
+    for idx in range(bullets):
+        draw.rectangle((60, 140 + idx * 80, 700, 180 + idx * 80), fill='gray')
+    image.save(path)
+    return path
+
+
+def test_groups_near_identical_slides(tmp_path):
+    deduplicator = SlideDeduplicator(threshold=6)
+    slides = [
+        draw_slide(tmp_path / 'slide_1.png'),
+        draw_slide(tmp_path / 'slide_2.png'),                       # точная копия
+        draw_slide(tmp_path / 'slide_3.png', title_x=250),           # другая компоновка
+        draw_slide(tmp_path / 'slide_4.png', background='#fff5f5'),  # почти тот же фон
+        draw_slide(tmp_path / 'slide_5.png', background='black'),    # другой цвет
+    ]
+    Image.new('RGB', (800, 450), 'red').save(tmp_path / 'slide_6.png')
+    Image.new('RGB', (800, 450), 'blue').save(tmp_path / 'slide_7.png')
+    slides += [tmp_path / 'slide_6.png', tmp_path / 'slide_7.png']
+
+    representatives = [deduplicator.add(number, path) for number, path in enumerate(slides, 1)]
+
+    assert representatives == [None, 1, None, 1, None, None, None]
+    assert deduplicator.shared == 2
+
+
+def test_iter_slides_fans_out_shared_analysis(tmp_path, monkeypatch):
+    class CountingAnalyzer:
+        calls = []
+
+        def analyze_image(self, image_path):
+            self.calls.append(image_path)
+            return f"анализ {image_path.rsplit('_', 1)[1].split('.')[0]}"
+
+    slides_dir = tmp_path / 'doc1'
+    slides_dir.mkdir()
+    image_paths = [
+        draw_slide(slides_dir / 'slide_1.png', bullets=1),
+        draw_slide(slides_dir / 'slide_2.png', title_x=300),
+        draw_slide(slides_dir / 'slide_3.png', bullets=1),
+        draw_slide(slides_dir / 'slide_4.png', title_x=300),
+    ]
+    analyzer = CountingAnalyzer()
+    processor = PDFProcessor(image_analyzer=analyzer)
+    processor.deck_summary_enabled = False
+    monkeypatch.setattr(processor, 'get_page_count', lambda pdf_path: len(image_paths))
+    monkeypatch.setattr(processor, 'iter_pdf', lambda pdf_path, total_pages=None, doc_id=None: enumerate(image_paths, 1))
+
+    events = list(processor.iter_slides('deck.pdf', doc_id='doc1'))
+
+    analyzed = {e['slide_number']: e for e in events if e['event'] == 'analyzed'}
+    assert len(analyzer.calls) == 2
+    assert analyzed[3]['analysis'] == "анализ 1" and analyzed[3]['shared_with'] == 1
+    assert analyzed[4]['image_path'] == "slides/doc1/4" and analyzed[4]['shared_with'] == 2
+    assert 'shared_with' not in analyzed[1]
+    assert events[-1] == {'event': 'deduplicated', 'total_slides': 4, 'unique_slides': 2,
+                          'shared_slides': 2, 'saved_calls': 2}
+
+
+def test_deck_events_order_for_duplicates_summary_and_refine(tmp_path):
+    slides_dir = tmp_path / 'doc1'
+    slides_dir.mkdir()
+    first, second, copy = (draw_slide(slides_dir / 'slide_1.png'), draw_slide(slides_dir / 'slide_2.png', title_x=300),
+                           draw_slide(slides_dir / 'slide_3.png'))
+    events = DeckEvents('doc1', 3, batch_size=2, dedup=True, summary=True, refine=True)
+
+    events.add_slide(1, first)
+    assert events.take_group() is None
+    events.add_slide(2, second)
+    group = events.take_group()
+    assert [number for number, _ in group] == [1, 2]
+    assert [e['event'] for e in events.rendered(1)] == ['rendered']
+
+    results = [{'slide_number': 1, 'analysis': 'анализ 1', 'image_path': 'slides/doc1/1'},
+               {'slide_number': 2, 'analysis': ANALYSIS_EMPTY_PLACEHOLDER, 'image_path': 'slides/doc1/2'}]
+    assert [e['slide_number'] for e in events.analyzed(results)] == [1, 2]
+    # Дубликат готового слайда получает анализ вместе с rendered
+    events.add_slide(3, copy)
+    assert events.take_group(final=True) is None
+    rendered = list(events.rendered(3))
+    assert [e['event'] for e in rendered] == ['rendered', 'analyzed'] and rendered[1]['shared_with'] == 1
+
+    # Заглушки в сводку не попадают, уточнение доходит до дубликатов
+    assert events.summary_request() == {1: 'анализ 1'}
+    events.summary({'themes': [], 'concepts': [], 'summary': None, 'inconsistent': [1]})
+    assert events.refine_requests(max_slides=3) == [(1, 'анализ 1')]
+    refined = list(events.refined('уточнено', 1))
+    assert [(e['slide_number'], e['analysis']) for e in refined] == [(1, 'уточнено'), (3, 'уточнено')]
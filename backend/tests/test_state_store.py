@@ -0,0 +1,187 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from backend.src.jobs import Job, SharedJobManager, SQLiteStateStore, StateStore
+from backend.tests.test_job_manager import FakeProcessor, wait_for
+
+
+class InstanceProcessor:
+    """Процессор экземпляра: каждый запуск задачи дописывается в runs.log, анализ - с pid процесса"""
+    def __init__(self, runs_log, delay=0.05):
+        self.runs_log = runs_log
+        self.delay = delay
+
+    def iter_slides(self, pdf_path, doc_id=None, context=None, token_budget=None):
+        with open(self.runs_log, 'a') as log:
+            log.write(f"{doc_id} {os.getpid()}\n")
+        yield {'event': 'started', 'doc_id': doc_id, 'total_slides': 2}
+        for number in (1, 2):
+            yield {'event': 'rendered', 'slide_number': number, 'image_path': f"slides/{doc_id}/{number}"}
+            time.sleep(self.delay)
+            yield {'event': 'analyzed', 'slide_number': number, 'analysis': f"pid {os.getpid()}",
+                   'image_path': f"slides/{doc_id}/{number}"}
+
+
+def run_instance(state_dir, stop, delay, lease_seconds):
+    """Отдельный экземпляр приложения: свой процесс, общее хранилище"""
+    store = SQLiteStateStore(state_dir)
+    manager = SharedJobManager(InstanceProcessor(os.path.join(state_dir, 'runs.log'), delay), store,
+                               workers=2, lease_seconds=lease_seconds, poll_interval=0.05, save_interval=0)
+    manager.start()
+    stop.wait(30)
+    manager.stop(timeout=5)
+
+
+def read_runs(state_dir):
+    with open(os.path.join(state_dir, 'runs.log')) as log:
+        return [line.split() for line in log.read().splitlines()]
+
+
+def start_instances(ctx, state_dir, count, delay, lease_seconds):
+    stop = ctx.Event()
+    processes = [ctx.Process(target=run_instance, args=(str(state_dir), stop, delay, lease_seconds))
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    return stop, processes
+
+
+def test_job_state_roundtrip_and_leases(tmp_path):
+    store = SQLiteStateStore(tmp_path)
+    job = Job('deck.pdf', 'инвесторы', include_timings=True, token_budget=1000)
+    assert store.create_job(job, max_queued=1)
+    assert not store.create_job(Job('other.pdf'), max_queued=1)
+
+    claimed = store.claim_job('a', lease_seconds=60)
+    assert claimed.job_id == job.job_id and claimed.context == 'инвесторы'
+    assert store.file_in_use('deck.pdf') and not store.file_in_use('other.pdf')
+    assert store.claim_job('b', lease_seconds=60) is None
+    assert store.get_job(job.job_id).status == 'running'
+
+    claimed.set_status('running')
+    claimed.apply_event({'event': 'analyzed', 'slide_number': 2, 'analysis': 'анализ'})
+    assert store.save_job(claimed, 'a', lease_seconds=60)
+    assert not store.save_job(claimed, 'b', lease_seconds=60)
+
+    state = store.get_job(job.job_id).to_dict()
+    assert state['results'] == [{'slide_number': 2, 'analysis': 'анализ'}]
+    assert state['timings'] is None
+
+    claimed.set_status('done')
+    assert store.save_job(claimed, 'a', lease_seconds=60)
+    assert not store.file_in_use('deck.pdf')
+
+
+def test_incomplete_store_fails_at_construction():
+    class NoPruneStore(StateStore):
+        create_job = claim_job = renew_lease = save_job = get_job = file_in_use = queued_count = lambda self, *args: None
+
+    with pytest.raises(TypeError, match='prune_jobs'):
+        NoPruneStore()
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(tmp_path):
+    store = SQLiteStateStore(tmp_path, max_attempts=2)
+    job = Job('deck.pdf')
+    store.create_job(job, max_queued=10)
+
+    assert store.claim_job('a', lease_seconds=0).job_id == job.job_id
+    time.sleep(0.01)
+    assert store.claim_job('b', lease_seconds=0).job_id == job.job_id
+    assert not store.renew_lease(job.job_id, 'a', lease_seconds=60)
+    time.sleep(0.01)
+
+    assert store.claim_job('c', lease_seconds=60) is None
+    assert store.get_job(job.job_id).status == 'failed'
+
+
+def test_job_submitted_on_one_instance_is_visible_on_another(tmp_path):
+    processor = FakeProcessor()
+    store = SQLiteStateStore(tmp_path)
+    first = SharedJobManager(processor, store, workers=1, queue_size=1, poll_interval=0.05, save_interval=0)
+    second = SharedJobManager(processor, SQLiteStateStore(tmp_path), workers=1, poll_interval=0.05)
+    try:
+        job = first.submit('deck.pdf')
+        wait_for(lambda: second.get(job.job_id).to_dict()['progress']['rendered'] == 3)
+        assert second.get(job.job_id).status == 'running'
+
+        processor.gate.set()
+        wait_for(lambda: second.get(job.job_id).finished)
+        state = second.get(job.job_id).to_dict()
+        assert state['status'] == 'done'
+        assert [r['slide_number'] for r in state['results']] == [1, 2, 3]
+        assert second.get('unknown') is None
+    finally:
+        processor.gate.set()
+        first.stop(timeout=5)
+        second.stop(timeout=5)
+
+
+def test_instances_in_separate_processes_share_one_store(tmp_path):
+    ctx = multiprocessing.get_context('spawn')
+    store = SQLiteStateStore(tmp_path)
+    jobs = [Job(f"deck_{idx}.pdf") for idx in range(8)]
+    for job in jobs:
+        assert store.create_job(job, max_queued=100)
+
+    stop, processes = start_instances(ctx, tmp_path, 3, delay=0.05, lease_seconds=30)
+    try:
+        wait_for(lambda: all(store.get_job(job.job_id).finished for job in jobs), timeout=30)
+    finally:
+        stop.set()
+        for process in processes:
+            process.join(10)
+
+    # Каждая задача выполнена ровно один раз, и не одним экземпляром
+    runs = read_runs(tmp_path)
+    assert sorted(doc_id for doc_id, _ in runs) == sorted(job.job_id for job in jobs)
+    assert len({pid for _, pid in runs}) > 1
+    pids = dict(runs)
+    for job in jobs:
+        state = store.get_job(job.job_id).to_dict()
+        assert state['status'] == 'done'
+        assert {r['analysis'] for r in state['results']} == {f"pid {pids[job.job_id]}"}
+
+
+def test_job_of_killed_instance_is_finished_by_another(tmp_path):
+    ctx = multiprocessing.get_context('spawn')
+    store = SQLiteStateStore(tmp_path)
+    job = Job('deck.pdf')
+    store.create_job(job, max_queued=1)
+
+    # Первый экземпляр зависает на задаче и останавливается без завершения
+    _, (stalled,) = start_instances(ctx, tmp_path, 1, delay=30, lease_seconds=1)
+    wait_for(lambda: store.get_job(job.job_id).to_dict()['progress']['rendered'] == 1, timeout=30)
+    stalled.kill()
+    stalled.join(10)
+
+    stop, (survivor,) = start_instances(ctx, tmp_path, 1, delay=0.01, lease_seconds=1)
+    try:
+        wait_for(lambda: store.get_job(job.job_id).finished, timeout=30)
+    finally:
+        stop.set()
+        survivor.join(10)
+
+    runs = read_runs(tmp_path)
+    assert [doc_id for doc_id, _ in runs] == [job.job_id, job.job_id]
+    state = store.get_job(job.job_id).to_dict()
+    assert state['status'] == 'done'
+    assert {r['analysis'] for r in state['results']} == {f"pid {runs[1][1]}"}
+
+
+def test_analysis_cache_lives_in_state_dir(tmp_path, monkeypatch):
+    from backend.src.analysis import analysis_cache
+    from backend.src.jobs import state_store
+    from backend.src.utils.config import config
+
+    monkeypatch.setattr(config, 'STATE_BACKEND', 'sqlite')
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path / 'state'))
+    monkeypatch.setattr(state_store, '_shared_store', None)
+    monkeypatch.setattr(analysis_cache, '_shared_cache', None)
+
+    cache = analysis_cache.get_analysis_cache()
+    assert cache.db_path == tmp_path / 'state' / 'analysis_cache.sqlite3'
+    assert cache.db_path == state_store.get_state_store().analysis_cache_path
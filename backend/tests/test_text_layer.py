@@ -0,0 +1,101 @@
+from backend.benchmarks.bench_text_layer import make_synthetic_slides
+from backend.benchmarks.fake_openai import FakeOpenAIClient, FAKE_ANALYSIS
+from backend.src.analysis import pdf_processor as pdf_processor_module
+from backend.src.analysis.pdf_processor import PDFProcessor
+from backend.src.analysis.text_layer import parse_bbox_layout, choose_mode, MODE_IMAGE, MODE_TEXT, MODE_TEXT_LOW
+from backend.src.utils.metrics import metrics
+from backend.tests.test_image_analyzer import make_analyzer
+
+BBOX_LAYOUT = """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title></title></head>
+<body>
+<doc>
+  <page width="960.000000" height="540.000000">
+    <flow><block xMin="48" yMin="40" xMax="400" yMax="90">
+      <line xMin="48" yMin="40" xMax="400" yMax="60">
+        <word xMin="48" yMin="40" xMax="150" yMax="60">Выручка</word>
+        <word xMin="160" yMin="40" xMax="240" yMax="60">R&amp;D</word>
+      </line>
+      <line xMin="48" yMin="70" xMax="400" yMax="90">
+        <word xMin="48" yMin="70" xMax="120" yMax="90">+15%</word>
+      </line>
+    </block></flow>
+    <flow><block xMin="48" yMin="200" xMax="300" yMax="220">
+      <line xMin="48" yMin="200" xMax="300" yMax="220">
+        <word xMin="48" yMin="200" xMax="300" yMax="220">Итоги</word>
+      </line>
+    </block></flow>
+  </page>
+  <page width="960.000000" height="540.000000"></page>
+</doc>
+</body>
+</html>
+"""
+
+
+def test_parse_bbox_layout():
+    pages = parse_bbox_layout(BBOX_LAYOUT)
+
+    assert sorted(pages) == [1, 2]
+    assert pages[1].text == "Выручка R&D\n+15%\n\nИтоги"
+    assert pages[1].word_count == 4
+    assert pages[1].boxes[0] == (48 / 960, 40 / 540, 150 / 960, 60 / 540)
+    assert pages[2].word_count == 0 and pages[2].text == ''
+
+
+def test_choose_mode_by_words_and_graphics(tmp_path):
+    text, mixed, image = make_synthetic_slides(tmp_path, 3)
+
+    assert choose_mode(text[2], text[1].read_bytes()) == MODE_TEXT
+    assert choose_mode(mixed[2], mixed[1].read_bytes()) == MODE_TEXT_LOW
+    assert choose_mode(image[2], image[1].read_bytes()) == MODE_IMAGE
+    assert choose_mode(None, text[1].read_bytes()) == MODE_IMAGE
+
+
+def test_analyzer_text_modes_cut_vision_tokens(tmp_path):
+    metrics.reset()
+    (_, text_path, text_page), (_, mixed_path, mixed_page) = make_synthetic_slides(tmp_path, 2)
+    client = FakeOpenAIClient()
+    analyzer = make_analyzer(client)
+
+    assert analyzer.analyze_image(str(text_path), text_page) == FAKE_ANALYSIS
+    assert analyzer.analyze_image(str(mixed_path), mixed_page) == FAKE_ANALYSIS
+
+    text_only, text_low = (request['messages'][1]['content'] for request in client.requests)
+    assert not any(part['type'] == 'image_url' for part in text_only)
+    assert text_page.text in text_only[1]['text']
+    assert [part['image_url']['detail'] for part in text_low if part['type'] == 'image_url'] == ['low']
+
+    counters = metrics.snapshot()['counters']
+    assert counters['analyzer_slides_total{mode="text"}'] == 1
+    assert counters['analyzer_slides_total{mode="text_low"}'] == 1
+    assert counters['analyzer_vision_tokens_total'] == 85
+    assert counters['analyzer_vision_tokens_saved_total'] > 0
+    assert 'analyzer_slide_request_seconds{mode="text"}' in metrics.snapshot()['histograms']
+
+
+def test_processor_passes_text_layer(tmp_path, monkeypatch):
+    slides = make_synthetic_slides(tmp_path, 3)
+    monkeypatch.setattr(pdf_processor_module, 'extract_text_layer',
+                        lambda pdf_path: {number: page for number, _, page in slides})
+    monkeypatch.setattr(PDFProcessor, 'get_page_count', lambda self, pdf_path: len(slides))
+    monkeypatch.setattr(PDFProcessor, 'iter_pdf',
+                        lambda self, pdf_path, total_pages=None, doc_id=None: ((n, p) for n, p, _ in slides))
+    client = FakeOpenAIClient()
+    processor = PDFProcessor(image_analyzer=make_analyzer(client), slides_dir=tmp_path / 'slides')
+    processor.dedup_enabled = False
+    processor.deck_summary_enabled = False
+
+    pdf_path = tmp_path / 'deck.pdf'
+    pdf_path.write_bytes(b'%PDF-1.4')
+    results = processor.process_slides(pdf_path)
+
+    # Текстовый слой сохранен для анализа отдельного слайда
+    stored = processor.get_page_text(processor.document_id(pdf_path), 2)
+    assert (stored.text, stored.word_count, stored.boxes) == (slides[1][2].text, slides[1][2].word_count, slides[1][2].boxes)
+
+    assert [r['analysis'] for r in results] == [FAKE_ANALYSIS] * 3
+    images = [sum(part['type'] == 'image_url' for part in request['messages'][1]['content'])
+              for request in client.requests]
+    assert sorted(images) == [0, 1, 1]
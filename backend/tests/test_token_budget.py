@@ -0,0 +1,127 @@
+import pytest
+
+from backend.benchmarks.fake_openai import FakeOpenAIClient, FAKE_ANALYSIS
+from backend.src.analysis.analysis_cache import AnalysisCache
+from backend.src.analysis.pdf_processor import ANALYSIS_SKIPPED_PLACEHOLDER, PDFProcessor
+from backend.src.analysis.token_budget import (OutputTokenStats, TokenBudget, TokenBudgetExhaustedError, budget_context,
+                                               current_budget)
+from backend.tests.test_image_analyzer import make_analyzer, make_slides
+
+
+def test_output_cap_follows_percentile():
+    stats = OutputTokenStats(window=100, percentile=90, headroom=1.5, min_samples=10, floor=50)
+    assert stats.cap('slide', 4096) == 4096  # образцов пока мало
+
+    for tokens in range(1, 101):
+        stats.record('slide', tokens * 2)
+    assert stats.observed('slide') == 180
+    assert stats.cap('slide', 4096) == 270
+    assert stats.cap('slide', 200) == 200
+    stats.record('group', 1)
+    assert stats.cap('group', 4096) == 4096
+
+
+def test_analyzer_caps_output_and_retries_truncated(tmp_path):
+    image_paths = make_slides(tmp_path, 5)
+    client = FakeOpenAIClient()
+    analyzer = make_analyzer(client)
+    analyzer.output_stats = OutputTokenStats(min_samples=3, headroom=1.0, floor=1)
+
+    for image_path in image_paths[:4]:
+        assert analyzer.analyze_image(str(image_path)) == FAKE_ANALYSIS
+    limits = [request['max_tokens'] for request in client.requests]
+    assert limits[:3] == [analyzer.max_tokens] * 3
+    assert limits[3] == len(FAKE_ANALYSIS) // 4
+
+    # Лимит ниже реальной длины ответа: обрезанный ответ повторяется с потолком
+    for _ in range(400):
+        analyzer.output_stats.record('slide', 5)
+    assert analyzer.analyze_image(str(image_paths[4])) == FAKE_ANALYSIS
+    assert [request['max_tokens'] for request in client.requests[-2:]] == [5, analyzer.max_tokens]
+
+
+def test_budget_degrades_remaining_slides(tmp_path, monkeypatch):
+    image_paths = make_slides(tmp_path, 6)
+    client = FakeOpenAIClient()
+    analyzer = make_analyzer(client)
+    analyzer.max_tokens = 300
+    processor = PDFProcessor(image_analyzer=analyzer)
+    processor.max_concurrent_analyses = 1
+    processor.dedup_enabled = processor.deck_summary_enabled = False
+    monkeypatch.setattr(processor, 'get_page_count', lambda pdf_path: len(image_paths))
+    monkeypatch.setattr(processor, 'iter_pdf', lambda pdf_path, total_pages=None, doc_id=None: enumerate(image_paths, 1))
+
+    events = list(processor.iter_slides('deck.pdf', doc_id='doc', token_budget=2500))
+
+    details = [part['image_url']['detail'] for request in client.requests
+               for part in request['messages'][1]['content'] if part['type'] == 'image_url']
+    assert details[0] == 'high' and details[-1] == 'low'
+    budget = events[-1]
+    assert budget['event'] == 'budget' and budget['limit'] == 2500
+    assert budget['requests'] == 6 and budget['degraded_requests'] == details.count('low')
+    assert budget['saved_tokens'] > 0
+
+
+def test_budget_reservations_across_threads():
+    budget = TokenBudget(1000, degrade_at=0.5)
+    assert budget.reserve(400, 100) == (False, 400)
+    assert budget.reserve(400, 100) == (True, 100)
+    budget.settle(400, 350)
+    assert budget_context(budget).run(current_budget) is budget and current_budget() is None
+    assert budget.to_dict()['spent'] == 350 and budget.to_dict()['saved_tokens'] == 300
+
+    budget.settle(100, 700)
+    with pytest.raises(TokenBudgetExhaustedError):
+        budget.reserve(400, 100)
+    assert budget.to_dict()['skipped_requests'] == 1
+    assert budget.to_dict()['requests'] == 2
+
+
+def test_released_reservation_is_not_a_request():
+    budget = TokenBudget(1000)
+    _, reserved = budget.reserve(400)
+    budget.release(reserved)
+    assert budget.reserved == 0
+    assert budget.to_dict()['requests'] == 0 and budget.to_dict()['spent'] == 0
+
+
+def test_encoding_failure_releases_reservation(tmp_path, monkeypatch):
+    analyzer = make_analyzer(FakeOpenAIClient())
+    monkeypatch.setattr(analyzer.payload_encoder, 'encode', lambda image_bytes: 1 / 0)
+
+    budget = TokenBudget(10 ** 6)
+    assert budget_context(budget).run(analyzer.analyze_image, make_slides(tmp_path, 1)[0]) is None
+    assert budget.reserved == 0 and budget.to_dict()['requests'] == 0
+
+
+def test_degraded_group_is_cached_under_degraded_key(tmp_path):
+    image_paths = make_slides(tmp_path, 3)
+    analyzer = make_analyzer(FakeOpenAIClient(), cache=AnalysisCache(tmp_path / 'cache.sqlite3'))
+
+    budget = TokenBudget(10 ** 6, degrade_at=0)
+    assert budget_context(budget).run(analyzer.analyze_image_group, image_paths) == [FAKE_ANALYSIS] * 3
+
+    image_bytes = image_paths[0].read_bytes()
+    assert analyzer.cache.get(analyzer.slide_cache_key(image_bytes)) is None
+    assert analyzer.cache.get(analyzer.slide_cache_key(image_bytes, 'degraded', analyzer.degraded_model)) == FAKE_ANALYSIS
+
+
+def test_exhausted_budget_skips_remaining_slides(tmp_path, monkeypatch):
+    image_paths = make_slides(tmp_path, 4)
+    client = FakeOpenAIClient()
+    processor = PDFProcessor(image_analyzer=make_analyzer(client))
+    processor.max_concurrent_analyses = 1
+    processor.dedup_enabled = False
+    monkeypatch.setattr(processor, 'get_page_count', lambda pdf_path: len(image_paths))
+    monkeypatch.setattr(processor, 'iter_pdf', lambda pdf_path, total_pages=None, doc_id=None: enumerate(image_paths, 1))
+
+    events = list(processor.iter_slides('deck.pdf', doc_id='doc', token_budget=100))
+
+    # Первый слайд потратил весь бюджет: остальные и сводка не отправляются
+    assert client.calls == 1
+    analyzed = sorted((e for e in events if e['event'] == 'analyzed'), key=lambda e: e['slide_number'])
+    assert analyzed[0]['analysis'] == FAKE_ANALYSIS and 'skipped' not in analyzed[0]
+    assert all(e['skipped'] and e['analysis'] == ANALYSIS_SKIPPED_PLACEHOLDER for e in analyzed[1:])
+    assert not any(e['event'] == 'summary' for e in events)
+    budget = events[-1]
+    assert budget['event'] == 'budget' and budget['exhausted'] and budget['skipped_requests'] == 3